@@ -0,0 +1,54 @@
+import importlib
+import threading
+from typing import Dict, Tuple
+
+# (LLMType, conversation mode) -> "module:Class". Modules are only imported when a
+# backend is first resolved, so picking one backend never loads the others' clients.
+_backends: Dict[Tuple[str, bool], str] = {
+    ("Ollama", False): "Ollama.OllamaModel:OllamaLLMModel",
+    ("Ollama", True): "Ollama.OllamaConversationModel:OllamaConversationLLMModel",
+    ("ChatGPT", False): "ChatGPT.ChatGPTModel:ChatGPTModel",
+}
+_resolved = {}
+_lock = threading.Lock()
+
+
+def registerBackend(LLMType: str, target, conversation: bool = False):
+    """
+    Makes LLMType available to LLMModelManager.
+
+    :param target: The model class, or "module:Class" to import on first use.
+    :param conversation: Whether the class is the conversation mode model of LLMType.
+    """
+    key = (LLMType, conversation)
+    with _lock:
+        _resolved.pop(key, None)
+        if isinstance(target, str):
+            _backends[key] = target
+        else:
+            _backends[key] = f"{target.__module__}:{target.__qualname__}"
+            _resolved[key] = target
+
+
+def resolveBackend(LLMType: str, conversation: bool = False):
+    """:return: The model class registered for LLMType, importing its module the first time."""
+    key = (LLMType, conversation)
+    with _lock:
+        cls = _resolved.get(key)
+        target = _backends.get(key)
+    if cls is not None:
+        return cls
+    if target is None:
+        mode = "conversation mode " if conversation else ""
+        raise ValueError(f"No {mode}backend registered for LLMType {LLMType!r}")
+    moduleName, _, className = target.partition(":")
+    cls = getattr(importlib.import_module(moduleName), className)
+    with _lock:
+        _resolved[key] = cls
+    return cls
+
+
+def availableBackends():
+    """:return: The registered (LLMType, conversation) pairs."""
+    with _lock:
+        return sorted(_backends)
@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Awaitable, Callable, Iterable, List
+
+
+class BatchItemError(Exception):
+    """
+    Stored in the slot of a batch result list when that single item failed,
+    so one bad item doesn't abort the whole batch.
+    """
+    def __init__(self, index: int, item: Any, error: BaseException):
+        super().__init__(f"Batch item {index} failed: {error}")
+        self.index = index
+        self.item = item
+        self.error = error
+
+
+def runBatch(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    maxConcurrency: int = 1,
+    onProgress: Callable[[int, int], None] = None
+) -> List[Any]:
+    """
+    Calls func on every item with at most maxConcurrency calls in flight.
+
+    :param func: Function applied to each item.
+    :param items: Items to process.
+    :param maxConcurrency: Maximum number of simultaneous calls (1 runs sequentially).
+    :param onProgress: (Optional) Called as onProgress(completed, total) in the caller's thread
+                       every time an item finishes.
+    :return: Results in input order. Failed items hold a BatchItemError instead of a result.
+    """
+    items = list(items)
+    total = len(items)
+    results = [None] * total
+
+    def run(index):
+        try:
+            return func(items[index])
+        except Exception as e:
+            return BatchItemError(index, items[index], e)
+
+    if maxConcurrency is None or maxConcurrency <= 1 or total <= 1:
+        for index in range(total):
+            results[index] = run(index)
+            if onProgress:
+                onProgress(index + 1, total)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(maxConcurrency, total)) as executor:
+        # Each item runs in a copy of the caller's context, so context variables (like the
+        # fields of Auxiliars.Metrics.callContext) reach the worker threads.
+        futures = {executor.submit(contextvars.copy_context().run, run, index): index for index in range(total)}
+        completed = 0
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            completed += 1
+            if onProgress:
+                onProgress(completed, total)
+    return results
+
+
+async def runBatchAsync(
+    func: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    maxConcurrency: int = 1,
+    onProgress: Callable[[int, int], None] = None
+) -> List[Any]:
+    """
+    Async counterpart of runBatch: awaits func(item) for every item with at most
+    maxConcurrency coroutines in flight on the running event loop.
+
+    :return: Results in input order. Failed items hold a BatchItemError instead of a result.
+    """
+    items = list(items)
+    total = len(items)
+    results = [None] * total
+    semaphore = asyncio.Semaphore(max(1, maxConcurrency or 1))
+    completed = 0
+
+    async def run(index):
+        nonlocal completed
+        async with semaphore:
+            try:
+                results[index] = await func(items[index])
+            except Exception as e:
+                results[index] = BatchItemError(index, items[index], e)
+        completed += 1
+        if onProgress:
+            onProgress(completed, total)
+
+    await asyncio.gather(*(run(index) for index in range(total)))
+    return results
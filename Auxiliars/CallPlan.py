@@ -0,0 +1,189 @@
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from functools import cached_property, lru_cache
+from typing import Callable, Dict, List
+
+# pydantic is only imported once a plan needs a model or a schema, so importing the
+# backends stays cheap for callers that never use outputDefinition or tools.
+
+
+@lru_cache(maxsize=None)
+def _toolModels():
+    from pydantic import BaseModel
+
+    class FunctionCall(BaseModel):
+        """Structured reply the Ollama models ask for when tools are available."""
+        function: str
+        arguments: dict
+
+    class AgentStep(BaseModel):
+        """One round of the conversation tool loop: tool calls to run, or the final answer."""
+        tool_calls: List[FunctionCall] = []
+        answer: str = ""
+
+    FunctionCall.__module__ = AgentStep.__module__ = __name__
+    return {"FunctionCall": FunctionCall, "AgentStep": AgentStep}
+
+
+def __getattr__(name):
+    # FunctionCall and AgentStep stay importable from here, built on first access.
+    if name in ("FunctionCall", "AgentStep"):
+        return _toolModels()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def createOutputModel(outputDefinition: Dict):
+    """Builds the pydantic model of an outputDefinition {"name": (type, default)}."""
+    from pydantic import create_model
+    fields = {}
+    for key, (type_, default) in outputDefinition.items():
+        fields[key] = (type_, Ellipsis if default is Ellipsis else default)
+    return create_model('DynamicModel', **fields)
+
+
+def generateToolSchema(func: Callable) -> Dict:
+    """Describes a tool function from its signature and docstring."""
+    sig = inspect.signature(func)
+    params = {
+        'type': 'object',
+        'properties': {},
+        'required': []
+    }
+    for name, param in sig.parameters.items():
+        param_type = param.annotation if param.annotation != inspect.Parameter.empty else str
+        params['properties'][name] = {'type': param_type.__name__}
+        if param.default == inspect.Parameter.empty:
+            params['required'].append(name)
+    return {
+        'name': func.__name__,
+        'description': func.__doc__.strip() if func.__doc__ else "",
+        'parameters': params
+    }
+
+
+def buildToolSystemMessage(systemMessage: str, toolSchemas: List[Dict]) -> str:
+    base_msg = systemMessage or "You are a helpful assistant."
+    tools_desc = "\n".join(
+        [f"{tool['name']}: {tool['description']}\nParameters: {json.dumps(tool['parameters'])}"
+         for tool in toolSchemas]
+    )
+    return f"{base_msg}\n\nAvailable tools:\n{tools_desc}\n\nRespond with JSON containing 'function' and 'arguments'."
+
+
+def buildAgentSystemMessage(systemMessage: str, toolSchemas: List[Dict]) -> str:
+    base_msg = systemMessage or "You are a helpful assistant."
+    tools_desc = "\n".join(
+        [f"{tool['name']}: {tool['description']}\nParameters: {json.dumps(tool['parameters'])}"
+         for tool in toolSchemas]
+    )
+    return (f"{base_msg}\n\nAvailable tools:\n{tools_desc}\n\n"
+            "Respond with JSON containing 'tool_calls' and 'answer'. To use tools, list every call you "
+            "need now in 'tool_calls' as {'function': name, 'arguments': {...}}; independent calls "
+            "run together and their results come back in the next message. When you can answer, "
+            "leave 'tool_calls' empty and put the answer in 'answer'.")
+
+
+class CallPlan:
+    """
+    Everything a call derives from (outputDefinition, tools, systemMessage): the pydantic
+    output model and its JSON schema, the tool schemas for Ollama and OpenAI, the tool
+    system prompt and the name -> callable dispatch table.
+
+    Each artifact is built on first use and then reused, so a plan shared by every item of
+    a batch (and every later call, through compileCallPlan) pays for them once.
+    """
+    def __init__(self, outputDefinition: Dict = None, tools: List[Callable] = None, systemMessage: str = None):
+        self.outputDefinition = outputDefinition
+        self.tools = list(tools) if tools else []
+        self.systemMessage = systemMessage
+
+    @cached_property
+    def outputModel(self):
+        return createOutputModel(self.outputDefinition) if self.outputDefinition else None
+
+    @cached_property
+    def outputSchema(self):
+        return self.outputModel.model_json_schema() if self.outputModel is not None else None
+
+    @cached_property
+    def listOutputSchema(self):
+        """Schema of {"items": [outputModel, ...]}, used to stream records one by one."""
+        if self.outputModel is None:
+            return None
+        from pydantic import create_model
+        return create_model('DynamicModelList', items=(List[self.outputModel], ...)).model_json_schema()
+
+    @cached_property
+    def toolSchemas(self):
+        return [generateToolSchema(func) for func in self.tools]
+
+    @cached_property
+    def toolSystemMessage(self):
+        return buildToolSystemMessage(self.systemMessage, self.toolSchemas) if self.tools else None
+
+    @cached_property
+    def agentSystemMessage(self):
+        return buildAgentSystemMessage(self.systemMessage, self.toolSchemas) if self.tools else None
+
+    @cached_property
+    def openaiToolSchemas(self):
+        from function_schema import get_function_schema
+        return [{"type": "function", "function": get_function_schema(tool)} for tool in self.tools]
+
+    @cached_property
+    def dispatch(self):
+        return {tool.__name__: tool for tool in self.tools}
+
+    @property
+    def functionCallModel(self):
+        return _toolModels()["FunctionCall"]
+
+    @cached_property
+    def functionCallSchema(self):
+        return self.functionCallModel.model_json_schema()
+
+    @property
+    def agentStepModel(self):
+        return _toolModels()["AgentStep"]
+
+    @cached_property
+    def agentStepSchema(self):
+        return self.agentStepModel.model_json_schema()
+
+
+def _freeze(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+_plans = OrderedDict()
+_plansLock = threading.Lock()
+MAX_CACHED_PLANS = 256
+
+
+def compileCallPlan(outputDefinition: Dict = None, tools: List[Callable] = None, systemMessage: str = None) -> CallPlan:
+    """
+    Returns the CallPlan for these arguments, reusing a cached one when an identical
+    outputDefinition, the same tool functions and the same systemMessage were compiled before.
+    """
+    key = (
+        tuple((name, _freeze(type_), repr(default)) for name, (type_, default) in outputDefinition.items())
+        if outputDefinition else None,
+        tuple(tools) if tools else (),
+        systemMessage,
+    )
+    with _plansLock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+        plan = CallPlan(outputDefinition, tools, systemMessage)
+        _plans[key] = plan
+        while len(_plans) > MAX_CACHED_PLANS:
+            _plans.popitem(last=False)
+        return plan
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import weakref
+
+
+class ClientPool:
+    """
+    Process-wide registry of API clients, so model instances talking to the same endpoint
+    with the same credentials share one httpx connection pool (and its keep-alive
+    connections) instead of paying for TCP/TLS setup per instance.
+
+    Clients are keyed by (kind, endpoint, credentials). Async clients are additionally
+    keyed by the running event loop, since an httpx.AsyncClient can't be shared across loops.
+    Call configure() before the first client is built to change the pool settings.
+    """
+    def __init__(self, maxConnections: int = 100, maxKeepAliveConnections: int = 20,
+                 keepAliveExpiry: float = 30.0, timeout: float = None, http2: bool = False):
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.asyncClients = weakref.WeakKeyDictionary()
+        self.configure(maxConnections, maxKeepAliveConnections, keepAliveExpiry, timeout, http2)
+
+    def configure(self, maxConnections: int = 100, maxKeepAliveConnections: int = 20,
+                  keepAliveExpiry: float = 30.0, timeout: float = None, http2: bool = False):
+        """
+        Sets the httpx pool settings used by clients built from now on.
+
+        :param maxConnections: Connections open at once per client.
+        :param maxKeepAliveConnections: Idle connections kept open for reuse.
+        :param keepAliveExpiry: Seconds an idle connection is kept.
+        :param timeout: (Optional) Request timeout in seconds; None keeps each library's default.
+        :param http2: Negotiate HTTP/2 (needs the h2 package, `pip install httpx[http2]`).
+        """
+        with self.lock:
+            self.maxConnections = maxConnections
+            self.maxKeepAliveConnections = maxKeepAliveConnections
+            self.keepAliveExpiry = keepAliveExpiry
+            self.timeout = timeout
+            self.http2 = http2
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(max_connections=self.maxConnections,
+                            max_keepalive_connections=self.maxKeepAliveConnections,
+                            keepalive_expiry=self.keepAliveExpiry)
+
+    def _get(self, key, build, isAsync):
+        with self.lock:
+            if isAsync:
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    loop = None
+                clients = self.clients if loop is None else self.asyncClients.setdefault(loop, {})
+            else:
+                clients = self.clients
+            client = clients.get(key)
+            if client is None:
+                client = clients[key] = build()
+            return client
+
+    def ollamaClient(self, host: str = None):
+        """Shared ollama.Client for host (None lets ollama read OLLAMA_HOST)."""
+        def build():
+            from ollama import Client
+            return Client(host=host, timeout=self.timeout, limits=self._limits(), http2=self.http2)
+        return self._get(("ollama", host), build, False)
+
+    def ollamaAsyncClient(self, host: str = None):
+        """Shared ollama.AsyncClient for host and the running event loop."""
+        def build():
+            from ollama import AsyncClient
+            return AsyncClient(host=host, timeout=self.timeout, limits=self._limits(), http2=self.http2)
+        return self._get(("ollama-async", host), build, True)
+
+    def openaiClient(self, apiKey: str, baseUrl: str = None):
+        """Shared openai.OpenAI for the api key and base url."""
+        def build():
+            from openai import OpenAI, DefaultHttpxClient
+            return OpenAI(api_key=apiKey, base_url=baseUrl, **self._openaiTimeout(),
+                          http_client=DefaultHttpxClient(limits=self._limits(), http2=self.http2))
+        return self._get(("openai", baseUrl, apiKey), build, False)
+
+    def openaiAsyncClient(self, apiKey: str, baseUrl: str = None):
+        """Shared openai.AsyncOpenAI for the api key, base url and the running event loop."""
+        def build():
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            return AsyncOpenAI(api_key=apiKey, base_url=baseUrl, **self._openaiTimeout(),
+                               http_client=DefaultAsyncHttpxClient(limits=self._limits(), http2=self.http2))
+        return self._get(("openai-async", baseUrl, apiKey), build, True)
+
+    def _openaiTimeout(self):
+        # Passing timeout=None to OpenAI would disable its default timeout.
+        return {} if self.timeout is None else {"timeout": self.timeout}
+
+    def close(self):
+        """Closes and forgets the sync clients. Async clients are dropped with their event loop."""
+        with self.lock:
+            clients, self.clients = self.clients, {}
+            self.asyncClients = weakref.WeakKeyDictionary()
+        for client in clients.values():
+            # ollama clients keep their httpx.Client in _client, openai ones expose close().
+            close = getattr(client, "close", None) or getattr(getattr(client, "_client", None), "close", None)
+            if close is not None and not asyncio.iscoroutinefunction(close):
+                close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "async_clients": sum(len(clients) for clients in self.asyncClients.values()),
+            }
+
+
+# Default registry used by every backend class.
+clientPool = ClientPool()
@@ -0,0 +1,121 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache stored in a single SQLite file.
+
+    Entries are keyed by (embedding model, BLAKE2b hash of the text) and vectors are
+    stored as packed float32 blobs. When the cache grows past maxEntries the least
+    recently used entries are evicted.
+    """
+    def __init__(self, path: str, maxEntries: int = 100_000):
+        self.path = path
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Shared by the ingestion worker threads, every access goes through self.lock.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash BLOB NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " UNIQUE (model, text_hash))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def hashText(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def getMany(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Looks up several texts at once.
+
+        Returns:
+            list: The cached vector for each text, or None where it is not cached.
+        """
+        hashes = [self.hashText(text) for text in texts]
+        found = {}
+        with self.lock:
+            # Stay below SQLite's default limit of bound variables per statement.
+            for start in range(0, len(hashes), 900):
+                chunk = hashes[start:start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    self.connection.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash IN ({','.join('?' * len(rows))})",
+                        [time.time(), model, *(row[0] for row in rows)]
+                    )
+            self.connection.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return [array("f", found[h]).tolist() if h in found else None for h in hashes]
+
+    def putMany(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """Stores the vectors of several texts, evicting LRU entries beyond maxEntries."""
+        now = time.time()
+        rows = [(model, self.hashText(text), array("f", vector).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            # Replaced rows are counted as new here, so recount before evicting.
+            self.entries += len(rows)
+            if self.entries > self.maxEntries:
+                self.entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self.entries > self.maxEntries:
+                # Evict down to 90% of the cap so the next writes don't evict again straight away.
+                target = int(self.maxEntries * 0.9)
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (self.entries - target,)
+                )
+                self.entries = target
+            self.connection.commit()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.getMany(model, [text])[0]
+
+    def put(self, model: str, text: str, vector: List[float]):
+        self.putMany(model, [text], [vector])
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": self.entries,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM embeddings")
+            self.connection.commit()
+            self.entries = 0
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,296 @@
+import random
+import threading
+import time
+from typing import List, Union, Tuple
+from Auxiliars.ClientPool import clientPool
+
+
+class Endpoint:
+    """One Ollama server of an EndpointPool and its routing state."""
+    def __init__(self, url: str, weight: float = 1.0):
+        self.url = url
+        self.weight = weight
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.ejectedUntil = 0.0
+        # Models the server reported as loaded (or just served), for model affinity.
+        self.loadedModels = set()
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejectedUntil
+
+    def hasModel(self, model: str) -> bool:
+        return model in self.loadedModels or f"{model}:latest" in self.loadedModels
+
+    def __repr__(self):
+        return f"Endpoint({self.url!r}, outstanding={self.outstanding}, healthy={self.healthy})"
+
+
+class EndpointPool:
+    """
+    Routes Ollama requests over several servers.
+
+    Each request goes to a healthy endpoint picked by strategy: "least_outstanding" (fewest
+    requests in flight relative to the endpoint weight) or "weighted" (random, proportional
+    to weight). Endpoints that already have the requested model loaded are preferred, so
+    requests don't trigger a model load elsewhere. A request failing on a node (connection
+    error or 5xx) is retried on another endpoint, and a node failing failureThreshold times
+    in a row is ejected for ejectSeconds. A background thread polls /api/ps every
+    healthCheckInterval seconds to bring ejected nodes back and refresh the loaded models.
+
+    Plug it into a model through `model.endpointPool = pool` (OllamaLLMModel and
+    OllamaConversationLLMModel) or `OllamaEmbeddingModel(..., endpoint_pool=pool)`.
+    """
+    def __init__(self, endpoints: List[Union[str, Tuple[str, float]]], strategy: str = "least_outstanding",
+                 failureThreshold: int = 2, ejectSeconds: float = 30.0, healthCheckInterval: float = 15.0,
+                 maxAttempts: int = None, affinitySlack: float = 2):
+        """
+        :param endpoints: Server URLs, or (url, weight) pairs.
+        :param strategy: "least_outstanding" or "weighted".
+        :param failureThreshold: Consecutive failures before a node is ejected.
+        :param ejectSeconds: How long an ejected node is skipped (unless a health check revives it).
+        :param healthCheckInterval: Seconds between health checks; None disables the checker thread.
+        :param maxAttempts: Endpoints tried per request; defaults to all of them.
+        :param affinitySlack: With least_outstanding, extra in-flight requests (per unit of weight)
+                              accepted on a node holding the model before spilling over to others.
+        """
+        if strategy not in ("least_outstanding", "weighted"):
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint.")
+        self.endpoints = [Endpoint(*e) if isinstance(e, tuple) else Endpoint(e) for e in endpoints]
+        self.strategy = strategy
+        self.failureThreshold = failureThreshold
+        self.ejectSeconds = ejectSeconds
+        self.healthCheckInterval = healthCheckInterval
+        self.maxAttempts = maxAttempts or len(self.endpoints)
+        self.affinitySlack = affinitySlack
+        self.lock = threading.Lock()
+        self.client = PooledOllamaClient(self)
+        self.asyncClient = AsyncPooledOllamaClient(self)
+
+        self.stopEvent = threading.Event()
+        self.healthThread = None
+        if healthCheckInterval:
+            self.healthThread = threading.Thread(target=self._healthLoop, daemon=True)
+            self.healthThread.start()
+
+    def acquire(self, model: str = None, exclude=()) -> Endpoint:
+        """Picks an endpoint for a request on model and counts it as in flight."""
+        with self.lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                raise RuntimeError("No Ollama endpoint left to try.")
+            healthy = [e for e in candidates if e.healthy]
+            if healthy:
+                candidates = healthy
+            else:
+                # Everything is ejected: try the node that is closest to coming back.
+                candidates = [min(candidates, key=lambda e: e.ejectedUntil)]
+            withModel = [e for e in candidates if e.hasModel(model)] if model else []
+
+            if self.strategy == "weighted":
+                candidates = withModel or candidates
+                endpoint = random.choices(candidates, weights=[e.weight for e in candidates])[0]
+            else:
+                load = lambda e: (e.outstanding / e.weight, e.served / e.weight)
+                endpoint = min(candidates, key=load)
+                if withModel:
+                    affine = min(withModel, key=load)
+                    if load(affine)[0] - load(endpoint)[0] <= self.affinitySlack:
+                        endpoint = affine
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, model: str = None, error: Exception = None) -> bool:
+        """
+        Records the outcome of a request.
+
+        :return: True when the request may be retried on another endpoint.
+        """
+        kind = None if error is None else classifyError(error)
+        with self.lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                endpoint.served += 1
+                endpoint.failures = 0
+                if model:
+                    endpoint.loadedModels.add(model)
+            elif kind == "node":
+                endpoint.failures += 1
+                if endpoint.failures >= self.failureThreshold:
+                    endpoint.ejectedUntil = time.monotonic() + self.ejectSeconds
+        return kind in ("node", "retry")
+
+    def checkHealth(self):
+        """Polls every endpoint once, reviving reachable ones and refreshing their loaded models."""
+        for endpoint in self.endpoints:
+            try:
+                running = clientPool.ollamaClient(endpoint.url).ps()
+            except Exception:
+                with self.lock:
+                    endpoint.failures += 1
+                    if endpoint.failures >= self.failureThreshold:
+                        endpoint.ejectedUntil = time.monotonic() + self.ejectSeconds
+                continue
+            with self.lock:
+                endpoint.failures = 0
+                endpoint.ejectedUntil = 0.0
+                endpoint.loadedModels = {m.model for m in running.models}
+
+    def _healthLoop(self):
+        while not self.stopEvent.wait(self.healthCheckInterval):
+            self.checkHealth()
+
+    def stop(self):
+        """Stops the health checker thread."""
+        self.stopEvent.set()
+        if self.healthThread is not None:
+            self.healthThread.join()
+            self.healthThread = None
+
+    def stats(self) -> list:
+        with self.lock:
+            return [{
+                "url": e.url,
+                "weight": e.weight,
+                "healthy": e.healthy,
+                "outstanding": e.outstanding,
+                "served": e.served,
+                "failures": e.failures,
+                "loaded_models": sorted(e.loadedModels),
+            } for e in self.endpoints]
+
+
+def classifyError(error: Exception) -> str:
+    """
+    "node" for failures of the server itself (unreachable, timeout, 5xx), "retry" for errors
+    another node may not have (model not found), "fatal" for errors of the request.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return "node"
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError):
+            return "node"
+    except ImportError:
+        pass
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        if status >= 500:
+            return "node"
+        if status == 404:
+            return "retry"
+    return "fatal"
+
+
+class PooledOllamaClient:
+    """
+    Stands in for ollama.Client: every method call (chat, embed, generate, ...) is sent to an
+    endpoint of the pool, picked with affinity to the model= argument, and retried elsewhere on
+    node failures. Streams are retried only while nothing has been yielded yet.
+    """
+    def __init__(self, pool: EndpointPool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            if kwargs.get("stream"):
+                return self._stream(name, args, kwargs)
+            return self._call(name, args, kwargs)
+        return call
+
+    def _call(self, name, args, kwargs):
+        model = kwargs.get("model")
+        tried = []
+        while True:
+            endpoint = self.pool.acquire(model, tried)
+            tried.append(endpoint)
+            try:
+                result = getattr(clientPool.ollamaClient(endpoint.url), name)(*args, **kwargs)
+            except Exception as e:
+                if not self.pool.release(endpoint, model, e) or len(tried) >= self.pool.maxAttempts:
+                    raise
+                continue
+            except BaseException:
+                self.pool.release(endpoint, model)
+                raise
+            self.pool.release(endpoint, model)
+            return result
+
+    def _stream(self, name, args, kwargs):
+        model = kwargs.get("model")
+        tried = []
+        while True:
+            endpoint = self.pool.acquire(model, tried)
+            tried.append(endpoint)
+            started = False
+            try:
+                for part in getattr(clientPool.ollamaClient(endpoint.url), name)(*args, **kwargs):
+                    started = True
+                    yield part
+            except Exception as e:
+                if not self.pool.release(endpoint, model, e) or started or len(tried) >= self.pool.maxAttempts:
+                    raise
+                continue
+            except BaseException:
+                # Closed early by the consumer or cancelled.
+                self.pool.release(endpoint, model)
+                raise
+            self.pool.release(endpoint, model)
+            return
+
+
+class AsyncPooledOllamaClient:
+    """Async counterpart of PooledOllamaClient, standing in for ollama.AsyncClient."""
+    def __init__(self, pool: EndpointPool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        async def call(*args, **kwargs):
+            if kwargs.get("stream"):
+                return self._stream(name, args, kwargs)
+            return await self._call(name, args, kwargs)
+        return call
+
+    async def _call(self, name, args, kwargs):
+        model = kwargs.get("model")
+        tried = []
+        while True:
+            endpoint = self.pool.acquire(model, tried)
+            tried.append(endpoint)
+            try:
+                result = await getattr(clientPool.ollamaAsyncClient(endpoint.url), name)(*args, **kwargs)
+            except Exception as e:
+                if not self.pool.release(endpoint, model, e) or len(tried) >= self.pool.maxAttempts:
+                    raise
+                continue
+            except BaseException:
+                self.pool.release(endpoint, model)
+                raise
+            self.pool.release(endpoint, model)
+            return result
+
+    async def _stream(self, name, args, kwargs):
+        model = kwargs.get("model")
+        tried = []
+        while True:
+            endpoint = self.pool.acquire(model, tried)
+            tried.append(endpoint)
+            started = False
+            try:
+                async for part in await getattr(clientPool.ollamaAsyncClient(endpoint.url), name)(*args, **kwargs):
+                    started = True
+                    yield part
+            except Exception as e:
+                if not self.pool.release(endpoint, model, e) or started or len(tried) >= self.pool.maxAttempts:
+                    raise
+                continue
+            except BaseException:
+                # Closed early by the consumer or cancelled.
+                self.pool.release(endpoint, model)
+                raise
+            self.pool.release(endpoint, model)
+            return
@@ -0,0 +1,212 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+
+def estimateTokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) used when no tokenizer is given."""
+    return (len(text) + 3) // 4
+
+
+class HistoryPolicy:
+    """
+    Decides which messages of a conversation are kept and sent.
+
+    apply(history) is called before every turn and returns the history to keep. Policies
+    trim with hysteresis: nothing changes until a high watermark is crossed, then enough
+    old turns go at once to land on a low watermark. Between trims the kept messages are
+    an unchanged prefix of every request, so the server can reuse its KV cache for them.
+
+    A leading system message is always kept, and so is the latest turn. A turn is a user
+    message plus the assistant and tool messages that follow it, and is dropped as a whole.
+    """
+    def __init__(self, tokenCounter: Callable[[str], int] = None):
+        """
+        :param tokenCounter: (Optional) text -> token count, e.g. from the model's tokenizer.
+                             Defaults to estimateTokens.
+        """
+        self.tokenCounter = tokenCounter or estimateTokens
+        self.trims = 0
+
+    def apply(self, history: List[Dict]) -> List[Dict]:
+        return history
+
+    def messageTokens(self, message: Dict) -> int:
+        # Plus a few tokens of chat template around each message.
+        return self.tokenCounter(str(message.get('content') or "")) + 4
+
+    def countTokens(self, messages: List[Dict]) -> int:
+        return sum(self.messageTokens(message) for message in messages)
+
+    @staticmethod
+    def pinnedCount(history: List[Dict]) -> int:
+        # Only the system prompt is pinned; a summary left by SummarizingPolicy is not.
+        if history and history[0]['role'] == 'system' \
+                and not str(history[0].get('content') or "").startswith(SummarizingPolicy.SUMMARY_PREFIX):
+            return 1
+        return 0
+
+    @classmethod
+    def split(cls, history: List[Dict]):
+        """Splits a history into (pinned system messages, list of turns)."""
+        pinned = history[:cls.pinnedCount(history)]
+        turns = []
+        for message in history[len(pinned):]:
+            if message['role'] == 'user' or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return pinned, turns
+
+    @staticmethod
+    def join(pinned, turns) -> List[Dict]:
+        return pinned + [message for turn in turns for message in turn]
+
+
+class SlidingWindowPolicy(HistoryPolicy):
+    """
+    Keeps the system message and as many recent turns as fit in a token budget.
+
+    When the history grows past maxTokens the oldest turns are dropped until it is below
+    lowWatermark * maxTokens.
+    """
+    def __init__(self, maxTokens: int, lowWatermark: float = 0.6, tokenCounter: Callable[[str], int] = None):
+        """
+        :param maxTokens: Budget for the whole history; keep it below the model's num_ctx
+                          minus room for the reply.
+        :param lowWatermark: Fraction of maxTokens the history is trimmed down to.
+        """
+        super().__init__(tokenCounter)
+        self.maxTokens = maxTokens
+        self.lowWatermark = lowWatermark
+
+    def apply(self, history):
+        total = self.countTokens(history)
+        if total <= self.maxTokens:
+            return history
+        pinned, turns = self.split(history)
+        target = int(self.maxTokens * self.lowWatermark)
+        while len(turns) > 1 and total > target:
+            total -= self.countTokens(turns.pop(0))
+        self.trims += 1
+        return self.join(pinned, turns)
+
+
+class LastTurnsPolicy(HistoryPolicy):
+    """
+    Keeps the system message and the last `turns` turns.
+
+    Old turns are dropped only once there are more than turns + slack of them, so the
+    request prefix changes once every `slack` turns instead of on every turn.
+    """
+    def __init__(self, turns: int, slack: int = None, tokenCounter: Callable[[str], int] = None):
+        """
+        :param turns: Turns kept after a trim.
+        :param slack: (Optional) Extra turns allowed before trimming; defaults to turns.
+        """
+        super().__init__(tokenCounter)
+        self.turns = max(1, turns)
+        self.slack = self.turns if slack is None else slack
+
+    def apply(self, history):
+        pinned, turns = self.split(history)
+        if len(turns) <= self.turns + self.slack:
+            return history
+        self.trims += 1
+        return self.join(pinned, turns[-self.turns:])
+
+
+class SummarizingPolicy(HistoryPolicy):
+    """
+    Replaces old turns with a compact summary instead of forgetting them.
+
+    When the history passes maxTokens, the oldest turns (down to lowWatermark * maxTokens)
+    are handed to summarize(messages) -> str in a background thread while the conversation
+    goes on. Once the summary is ready it takes their place as a system message right after
+    the pinned one; the previous summary is part of the next summarized block, so the memory
+    is rolled forward. If the history reaches hardMaxTokens before the summary is done, the
+    turn waits for it. A failed summary is raised by the turn that collects it, unless an
+    onError callback takes it, in which case the history is kept as it was.
+    """
+    SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+    def __init__(
+        self,
+        summarize: Callable[[List[Dict]], str],
+        maxTokens: int,
+        lowWatermark: float = 0.5,
+        hardMaxTokens: int = None,
+        background: bool = True,
+        tokenCounter: Callable[[str], int] = None,
+        onError: Callable[[Exception], None] = None
+    ):
+        """
+        :param summarize: messages -> summary text, e.g. OllamaConversationLLMModel.summarizeMessages.
+        :param maxTokens: History size that starts a summarization.
+        :param lowWatermark: Fraction of maxTokens left unsummarized.
+        :param hardMaxTokens: (Optional) Size at which a turn blocks on the pending summary.
+                              Defaults to 1.5 * maxTokens.
+        :param background: Summarize in a worker thread instead of during the turn.
+        :param onError: (Optional) Called with the error of a failed background summary
+                        instead of raising it; the next trim tries again.
+        """
+        super().__init__(tokenCounter)
+        self.summarize = summarize
+        self.maxTokens = maxTokens
+        self.lowWatermark = lowWatermark
+        self.hardMaxTokens = hardMaxTokens or int(maxTokens * 1.5)
+        self.background = background
+        self.onError = onError
+        self.executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self.lock = threading.Lock()
+        # (summarized messages, future of the summary text) while a summary is in progress.
+        self.pending = None
+
+    def apply(self, history):
+        with self.lock:
+            if self.pending is not None:
+                history = self._applyPending(history)
+            total = self.countTokens(history)
+            if self.pending is not None or total <= self.maxTokens:
+                return history
+
+            pinned, turns = self.split(history)
+            target = int(self.maxTokens * self.lowWatermark)
+            block = []
+            while len(turns) > 1 and total > target:
+                turn = turns.pop(0)
+                total -= self.countTokens(turn)
+                block.extend(turn)
+            if not block:
+                return history
+            if self.background:
+                self.pending = (block, self.executor.submit(self.summarize, block))
+                return history
+            return self._replace(history, block, self.summarize(block))
+
+    def _applyPending(self, history):
+        block, future = self.pending
+        if not future.done() and self.countTokens(history) < self.hardMaxTokens:
+            return history
+        self.pending = None
+        try:
+            summary = future.result()
+        except Exception as e:
+            if self.onError is None:
+                raise
+            self.onError(e)
+            return history
+        return self._replace(history, block, summary)
+
+    def _replace(self, history, block, summary):
+        start = self.pinnedCount(history)
+        # The history may have been cleared or edited since the block was taken.
+        if len(history) - start < len(block) or any(a is not b for a, b in zip(history[start:], block)):
+            return history
+        self.trims += 1
+        memory = {'role': 'system', 'content': self.SUMMARY_PREFIX + summary}
+        return history[:start] + [memory] + history[start + len(block):]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
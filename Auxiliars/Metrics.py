@@ -0,0 +1,265 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Fields set by the caller of a model (e.g. the manager's queue wait), added to its events.
+_callContext = ContextVar("callMetricsContext", default=None)
+
+
+@contextmanager
+def callContext(**fields):
+    """Adds fields (queueWait=...) to every CallEvent emitted inside the block, in this thread or task."""
+    token = _callContext.set({**(_callContext.get() or {}), **fields})
+    try:
+        yield
+    finally:
+        _callContext.reset(token)
+
+
+class CallEvent:
+    """
+    What one backend call cost. Times are in seconds; timeToFirstToken is only set for streams,
+    loadDuration only when Ollama had to load the model. tokensPerSecond is the generation speed
+    reported by the server when available, otherwise completion tokens over latency.
+    """
+    def __init__(self, backend: str, model: str, operation: str, latency: float,
+                 timeToFirstToken: float = None, promptTokens: int = 0, completionTokens: int = 0,
+                 tokensPerSecond: float = None, cacheHit: bool = False, retries: int = 0,
+                 queueWait: float = None, loadDuration: float = None, error: str = None):
+        context = _callContext.get() or {}
+        self.timestamp = time.time()
+        self.backend = backend
+        self.model = model
+        self.operation = operation
+        self.queueWait = queueWait if queueWait is not None else context.get("queueWait")
+        self.timeToFirstToken = timeToFirstToken
+        self.latency = latency
+        self.promptTokens = promptTokens
+        self.completionTokens = completionTokens
+        if tokensPerSecond is None and completionTokens and latency > 0:
+            tokensPerSecond = completionTokens / latency
+        self.tokensPerSecond = tokensPerSecond
+        self.cacheHit = cacheHit
+        self.retries = retries
+        self.loadDuration = loadDuration
+        self.error = error
+
+    def toDict(self) -> dict:
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return f"CallEvent({self.backend}/{self.model} {self.operation}, latency={self.latency:.3f}s)"
+
+
+def usageEvent(backend: str, model: str, operation: str, started: float, usage: dict = None,
+               firstTokenAt: float = None, **fields) -> CallEvent:
+    """
+    Builds the CallEvent of a call started at time.perf_counter() value started, from the usage
+    dict of Auxiliars.Streaming.ollamaUsage/openaiUsage.
+    """
+    usage = usage or {}
+    tokensPerSecond = None
+    if usage.get("eval_duration"):
+        tokensPerSecond = usage.get("completion_tokens", 0) / (usage["eval_duration"] / 1e9)
+    return CallEvent(
+        backend, model, operation,
+        latency=time.perf_counter() - started,
+        timeToFirstToken=firstTokenAt - started if firstTokenAt is not None else None,
+        promptTokens=usage.get("prompt_tokens", 0),
+        completionTokens=usage.get("completion_tokens", 0),
+        tokensPerSecond=tokensPerSecond,
+        loadDuration=usage["load_duration"] / 1e9 if usage.get("load_duration") else None,
+        **fields)
+
+
+class MetricsHub:
+    """
+    Fans the CallEvents of the models out to sinks. A sink is any callable taking the event:
+    HistogramSink, JsonlSink, PrometheusSink or a plain function. A failing sink never breaks
+    the call that emitted the event.
+    """
+    def __init__(self, sinks: List[Callable[[CallEvent], None]] = None):
+        self.sinks = list(sinks or [])
+
+    def addSink(self, sink: Callable[[CallEvent], None]):
+        self.sinks.append(sink)
+        return sink
+
+    def emit(self, event: CallEvent):
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception:
+                logger.exception("Metrics sink %r failed", sink)
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram plus a bounded sample of recent values for percentiles."""
+    def __init__(self, buckets=LATENCY_BUCKETS, reservoir: int = 2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=reservoir)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentile(self, q: float):
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class SeriesStats:
+    """Counters and histograms of the events of one (backend, model, operation)."""
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cacheHits = 0
+        self.retries = 0
+        self.promptTokens = 0
+        self.completionTokens = 0
+        self.latency = Histogram()
+        self.timeToFirstToken = Histogram()
+        self.queueWait = Histogram()
+        self.tokensPerSecond = Histogram(buckets=(1, 5, 10, 20, 50, 100, 200, 500, 1000))
+
+
+class HistogramSink:
+    """In-memory aggregation of the events, by backend, model and operation."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series: Dict[tuple, SeriesStats] = {}
+
+    def __call__(self, event: CallEvent):
+        key = (event.backend, event.model or "", event.operation)
+        with self.lock:
+            stats = self.series.get(key)
+            if stats is None:
+                stats = self.series[key] = SeriesStats()
+            stats.calls += 1
+            stats.errors += event.error is not None
+            stats.cacheHits += bool(event.cacheHit)
+            stats.retries += event.retries
+            stats.promptTokens += event.promptTokens
+            stats.completionTokens += event.completionTokens
+            stats.latency.observe(event.latency)
+            if event.timeToFirstToken is not None:
+                stats.timeToFirstToken.observe(event.timeToFirstToken)
+            if event.queueWait is not None:
+                stats.queueWait.observe(event.queueWait)
+            if event.tokensPerSecond is not None:
+                stats.tokensPerSecond.observe(event.tokensPerSecond)
+
+    def summary(self) -> List[dict]:
+        """One dict per series with the counters and the latency percentiles."""
+        with self.lock:
+            return [{
+                "backend": backend,
+                "model": model,
+                "operation": operation,
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "cache_hits": stats.cacheHits,
+                "retries": stats.retries,
+                "prompt_tokens": stats.promptTokens,
+                "completion_tokens": stats.completionTokens,
+                "latency": stats.latency.summary(),
+                "time_to_first_token": stats.timeToFirstToken.summary(),
+                "queue_wait": stats.queueWait.summary(),
+                "tokens_per_second": stats.tokensPerSecond.summary(),
+            } for (backend, model, operation), stats in self.series.items()]
+
+
+class PrometheusSink(HistogramSink):
+    """HistogramSink that renders its series in the Prometheus text exposition format."""
+    def __init__(self, prefix: str = "jvas_llm"):
+        super().__init__()
+        self.prefix = prefix
+
+    @staticmethod
+    def _labels(key, extra=""):
+        escape = lambda v: str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        labels = ",".join(f'{name}="{escape(value)}"' for name, value in zip(("backend", "model", "operation"), key))
+        return "{" + labels + extra + "}"
+
+    def render(self) -> str:
+        """The metrics page, e.g. to serve on /metrics."""
+        counters = [
+            ("calls_total", "Backend calls.", "calls"),
+            ("errors_total", "Backend calls that raised.", "errors"),
+            ("cache_hits_total", "Calls answered by the response cache.", "cacheHits"),
+            ("retries_total", "Retries of backend calls.", "retries"),
+            ("prompt_tokens_total", "Prompt tokens.", "promptTokens"),
+            ("completion_tokens_total", "Completion tokens.", "completionTokens"),
+        ]
+        histograms = [
+            ("latency_seconds", "Total latency of a call.", "latency"),
+            ("time_to_first_token_seconds", "Time to the first streamed token.", "timeToFirstToken"),
+            ("queue_wait_seconds", "Time spent queued before the call started.", "queueWait"),
+        ]
+        lines = []
+        with self.lock:
+            for name, help_, attribute in counters:
+                lines.append(f"# HELP {self.prefix}_{name} {help_}")
+                lines.append(f"# TYPE {self.prefix}_{name} counter")
+                for key, stats in self.series.items():
+                    lines.append(f"{self.prefix}_{name}{self._labels(key)} {getattr(stats, attribute)}")
+            for name, help_, attribute in histograms:
+                lines.append(f"# HELP {self.prefix}_{name} {help_}")
+                lines.append(f"# TYPE {self.prefix}_{name} histogram")
+                for key, stats in self.series.items():
+                    histogram = getattr(stats, attribute)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        labels = self._labels(key, f',le="{bound}"')
+                        lines.append(f"{self.prefix}_{name}_bucket{labels} {cumulative}")
+                    labels = self._labels(key, ',le="+Inf"')
+                    lines.append(f"{self.prefix}_{name}_bucket{labels} {histogram.count}")
+                    lines.append(f"{self.prefix}_{name}_sum{self._labels(key)} {histogram.sum}")
+                    lines.append(f"{self.prefix}_{name}_count{self._labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonlSink:
+    """Appends every event as one JSON line to path."""
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, event: CallEvent):
+        line = json.dumps(event.toDict(), ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -1,82 +1,219 @@
-from Levenshtein import distance as levenshtein_distance
+from collections import OrderedDict
+import unicodedata
+import threading
 import ast
 import json
 
-class JsonOutputParser:
-    def parseOutput(self, structuredResponse, outputDefinition): 
-        try:
-            structuredResponse = ast.literal_eval(structuredResponse)
-        except:
-            try:
-                structuredResponse = json.loads(structuredResponse)
-            except:
-                print(f"Erro no formato: {structuredResponse}")
-                return {}
 
-        if outputDefinition is None:
-            return structuredResponse
+_levenshteinDistance = None
 
-        isDict = False
-        if isinstance(structuredResponse, dict):
-            structuredResponse = [structuredResponse]
-            isDict = True
-
-        def get_most_similar_option(key, validOptionsList):
-            min_distance = float('inf')  # Start with a large number for comparison
-            best_option = None
-            for option in validOptionsList:
-                distance = levenshtein_distance(key, option)
-                if distance <= 3 and distance < min_distance:
+
+def _levenshtein():
+    # Levenshtein is only needed when a name doesn't match exactly or once normalized,
+    # so it is imported on the first fuzzy lookup instead of with the module.
+    global _levenshteinDistance
+    if _levenshteinDistance is None:
+        from Levenshtein import distance
+        _levenshteinDistance = distance
+    return _levenshteinDistance
+
+
+def normalizeName(text):
+    """Case-, accent- and separator-insensitive form of a key or option ("Opção 1" -> "opcao1")."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return "".join(c for c in folded if not c.isspace() and c not in "_-")
+
+
+class CompiledJsonOutputParser:
+    """
+    JsonOutputParser specialised for one outputDefinition.
+
+    The key and option tables are built once: a name is matched exactly first, then by its
+    normalized form (case and accent folding), and only then by Levenshtein distance with a
+    cutoff of maxDistance. Corrections already resolved are memoized, so repeated misspellings
+    across items and responses cost a dict lookup.
+    """
+    MAX_MEMO = 4096
+
+    def __init__(self, outputDefinition, maxDistance=3):
+        self.outputDefinition = outputDefinition
+        self.maxDistance = maxDistance
+        self.keys = list(outputDefinition.keys())
+        self.keySet = set(self.keys)
+        self.keyTable = self._buildTable(self.keys)
+        self.keyMemo = {}
+        # Per key: (default, options list, options table, memo) or (default, type, None, None).
+        self.fields = []
+        for key in self.keys:
+            type_, default = outputDefinition[key]
+            if isinstance(type_, list) and len(type_) > 0 and type(type_[0]) == str:
+                self.fields.append((key, default, type_, self._buildTable(type_), {}))
+            elif isinstance(type_, list):
+                # Options that aren't strings are not checked.
+                self.fields.append((key, default, None, None, None))
+            else:
+                self.fields.append((key, default, type_, None, None))
+
+    @staticmethod
+    def _buildTable(names):
+        exact = set(names)
+        normalized = {}
+        for name in names:
+            normalized.setdefault(normalizeName(name), name)
+        return exact, normalized, list(names)
+
+    def _closest(self, value, table, memo):
+        """Best match of value in table, or None when nothing is within maxDistance."""
+        if value in memo:
+            return memo[value]
+        _, normalized, names = table
+        best = normalized.get(normalizeName(value))
+        if best is None:
+            min_distance = self.maxDistance + 1
+            levenshtein_distance = _levenshtein()
+            for name in names:
+                distance = levenshtein_distance(value, name, score_cutoff=self.maxDistance)
+                if distance < min_distance:
                     min_distance = distance
-                    best_option = option
-            return min_distance, best_option
+                    best = name
+                    if distance == 0:
+                        break
+        if len(memo) < self.MAX_MEMO:
+            memo[value] = best
+        return best
+
+    def repairItem(self, item):
+        """Renames misspelled keys, fixes values and fills defaults of one item dict, in place."""
+        keySet = self.keySet
+        for key in [key for key in item if key not in keySet]:
+            best = self._closest(key, self.keyTable, self.keyMemo)
+            if best is not None:
+                item[best] = item.pop(key)
+
+        for key, default, valid, table, memo in self.fields:
+            # If a key is missing, add it with the default value
+            if key not in item:
+                item[key] = default
+                continue
+            if valid is None:
+                continue
+            value = item[key]
+            if table is not None:
+                # Check if the value is in the valid options list, and correct it if needed
+                try:
+                    isValid = value in table[0]
+                except TypeError:
+                    isValid = False
+                if not isValid:
+                    best = self._closest(str(value), table, memo)
+                    item[key] = best if best is not None else default
+            # if type is wrong, set to default
+            elif not isinstance(value, valid):
+                item[key] = default
 
-        # Check and correct format to the valid names
-        correctKeyNames = outputDefinition.keys()
+        #Remove keys that are not in the correctKeyNames
+        if len(item) > len(keySet):
+            for key in [key for key in item if key not in keySet]:
+                item.pop(key)
+        return item
+
+    def parseOutput(self, structuredResponse):
+        structuredResponse = parseJson(structuredResponse)
+        if structuredResponse is None:
+            return {}
+        if isinstance(structuredResponse, dict):
+            return self.repairItem(structuredResponse)
         if isinstance(structuredResponse, list):
             for item in structuredResponse:
                 if isinstance(item, dict):
-                    keys_to_modify = []
-                    # First collect the keys that need modification
-                    for key in list(item.keys()):
-                        if key not in correctKeyNames:
-                            min_distance, best_option = get_most_similar_option(key, correctKeyNames)
-                            if min_distance <= 3:
-                                keys_to_modify.append((key, best_option))
-                    
-                    # Now modify the keys after iteration
-                    for old_key, new_key in keys_to_modify:
-                        item[new_key] = item.pop(old_key)
-
-                    for correctKey in correctKeyNames:
-                        # If a key is missing, add it with the default value
-                        if correctKey not in item:
-                            item[correctKey] = outputDefinition[correctKey][1]
-
-                        #deal with the options type
-                        validOptionsList = outputDefinition[correctKey][0]
-                        if isinstance(validOptionsList, list) and len(validOptionsList) > 0:
-                            if type(validOptionsList[0]) == str:
-                                # Check if the key's value is in the valid options list, and correct it if needed
-                                if item[correctKey] not in validOptionsList:
-                                    #tries to correct it
-                                    min_distance, best_option = get_most_similar_option(str(item[correctKey]), validOptionsList)
-                                    if min_distance <= 3:
-                                        item[correctKey] = best_option
-                                    else:
-                                        #set default
-                                        item[correctKey] = outputDefinition[correctKey][1]
-                        # if type is wrong, set to default
-                        elif not isinstance(item[correctKey], outputDefinition[correctKey][0]):
-                            item[correctKey] = outputDefinition[correctKey][1]
-                        
-                    #Remove keys that are not in the correctKeyNames
-                    for key in list(item.keys()):
-                        if key not in correctKeyNames:
-                            item.pop(key)
-        if isDict:
-            structuredResponse = structuredResponse[0]
+                    self.repairItem(item)
+        return structuredResponse
+
+
+def parseJson(structuredResponse):
+    """Decodes a response as JSON, falling back to a Python literal; None when neither works."""
+    if not isinstance(structuredResponse, str):
         return structuredResponse
+    try:
+        return json.loads(structuredResponse)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(structuredResponse)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        print(f"Erro no formato: {structuredResponse}")
+        return None
+
+
+def _definitionKey(outputDefinition):
+    key = []
+    for name, (type_, default) in outputDefinition.items():
+        try:
+            hash(type_)
+        except TypeError:
+            type_ = repr(type_)
+        key.append((name, type_, repr(default)))
+    return tuple(key)
+
+
+_compiled = OrderedDict()
+_compiledLock = threading.Lock()
+
+
+def compileParser(outputDefinition):
+    """Returns the CompiledJsonOutputParser of an outputDefinition, cached across calls."""
+    key = _definitionKey(outputDefinition)
+    with _compiledLock:
+        parser = _compiled.get(key)
+        if parser is None:
+            parser = _compiled[key] = CompiledJsonOutputParser(outputDefinition)
+            while len(_compiled) > 128:
+                _compiled.popitem(last=False)
+        else:
+            _compiled.move_to_end(key)
+        return parser
+
+
+_workerParser = None
+
+
+def _initWorker(outputDefinition):
+    global _workerParser
+    _workerParser = CompiledJsonOutputParser(outputDefinition) if outputDefinition is not None else None
+
+
+def _parseInWorker(structuredResponse):
+    if _workerParser is None:
+        parsed = parseJson(structuredResponse)
+        return {} if parsed is None else parsed
+    return _workerParser.parseOutput(structuredResponse)
+
+
+class JsonOutputParser:
+    def parseOutput(self, structuredResponse, outputDefinition): 
+        if outputDefinition is None:
+            parsed = parseJson(structuredResponse)
+            return {} if parsed is None else parsed
+        return compileParser(outputDefinition).parseOutput(structuredResponse)
+
+    def parseMany(self, structuredResponses, outputDefinition, processes=None, chunksize=64):
+        """
+        Parses a list of responses with the same outputDefinition.
+
+        :param processes: (Optional) Number of worker processes. Worth it only for large
+                          response sets, since each worker compiles the parser once and
+                          responses are pickled to it.
+        :param chunksize: Responses sent to a worker at a time.
+        :return: The parsed responses, in input order.
+        """
+        structuredResponses = list(structuredResponses)
+        if not processes or processes <= 1 or len(structuredResponses) < chunksize:
+            return [self.parseOutput(response, outputDefinition) for response in structuredResponses]
+        # multiprocessing is only loaded when worker processes are actually used.
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=processes, initializer=_initWorker, initargs=(outputDefinition,)) as executor:
+            return list(executor.map(_parseInWorker, structuredResponses, chunksize=chunksize))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict
+from Auxiliars.HistoryPolicy import estimateTokens
+
+
+class TokenBucket:
+    """
+    Refills perMinute units per minute, up to perMinute. reserve() takes the units right away,
+    possibly going into debt, and returns how long the caller must wait before using them, so
+    concurrent callers are served in arrival order without polling.
+    """
+    def __init__(self, perMinute: float):
+        self.capacity = perMinute
+        self.rate = perMinute / 60.0
+        self.tokens = perMinute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        # A request larger than the bucket could never fit, it only waits for a full bucket.
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def classifyOpenAIError(error: Exception) -> str:
+    """
+    "rate_limit" for 429s, "retryable" for connection errors, timeouts, 408/409 and 5xx,
+    "fatal" for everything else (bad request, auth, exhausted quota...).
+    """
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        # An exhausted quota is reported as a 429 too, but waiting won't fix it.
+        if getattr(error, "code", None) == "insufficient_quota":
+            return "fatal"
+        return "rate_limit"
+    if status is not None:
+        return "retryable" if status in (408, 409) or status >= 500 else "fatal"
+    try:
+        import openai
+        if isinstance(error, openai.APIConnectionError):
+            return "retryable"
+    except ImportError:
+        pass
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return "retryable"
+    return "fatal"
+
+
+def retryAfterSeconds(error: Exception):
+    """Delay asked by the server in the Retry-After(-ms) headers of an error, or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """
+    Client-side scheduler for OpenAI calls.
+
+    Every call first reserves one request and its estimated tokens (prompt plus expected
+    completion) from requests/min and tokens/min buckets and waits as long as needed, so a
+    large batch runs at the rate the account allows instead of bursting into 429s. After the
+    call, the estimate is corrected with the reported usage. Rate limits, timeouts, connection
+    errors and 5xx replies are retried with jittered exponential backoff that honours
+    Retry-After; a 429 also pauses every other call of the scheduler. Fatal errors are raised
+    at once, and retryable ones once maxRetries is exhausted.
+    """
+    def __init__(self, requestsPerMinute: float = None, tokensPerMinute: float = None,
+                 maxRetries: int = 6, baseDelay: float = 1.0, maxDelay: float = 60.0,
+                 expectedCompletionTokens: int = 256, tokenCounter: Callable[[str], int] = None):
+        """
+        :param requestsPerMinute: (Optional) RPM limit of the account; None leaves requests unlimited.
+        :param tokensPerMinute: (Optional) TPM limit of the account; None leaves tokens unlimited.
+        :param maxRetries: Retries of a retryable error before it is raised.
+        :param baseDelay: First backoff delay in seconds, doubled on every retry.
+        :param maxDelay: Upper bound of a backoff delay.
+        :param expectedCompletionTokens: Completion tokens assumed when the request sets no max_tokens.
+        :param tokenCounter: (Optional) text -> token count; defaults to about 4 characters per token.
+        """
+        self.requestBucket = TokenBucket(requestsPerMinute) if requestsPerMinute else None
+        self.tokenBucket = TokenBucket(tokensPerMinute) if tokensPerMinute else None
+        self.maxRetries = maxRetries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.expectedCompletionTokens = expectedCompletionTokens
+        self.tokenCounter = tokenCounter or estimateTokens
+        self.lock = threading.Lock()
+        self.pausedUntil = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.rateLimited = 0
+        self.waited = 0.0
+
+    def estimateTokens(self, params: Dict) -> int:
+        """Prompt tokens of the messages plus the completion budget of a chat.completions request."""
+        prompt = sum(self.tokenCounter(str(m.get("content") or "")) + 4 for m in params.get("messages", []))
+        completion = params.get("max_completion_tokens") or params.get("max_tokens") or self.expectedCompletionTokens
+        return prompt + completion
+
+    def _reserve(self, tokens):
+        with self.lock:
+            delay = max(0.0, self.pausedUntil - time.monotonic())
+            if self.requestBucket is not None:
+                delay = max(delay, self.requestBucket.reserve(1))
+            if self.tokenBucket is not None:
+                delay = max(delay, self.tokenBucket.reserve(tokens))
+            self.requests += 1
+            self.waited += delay
+            return delay
+
+    def _settle(self, estimated, response):
+        usage = getattr(response, "usage", None)
+        if self.tokenBucket is None or usage is None:
+            return
+        with self.lock:
+            self.tokenBucket.refund(estimated - usage.total_tokens)
+
+    def _cancel(self, estimated):
+        # A failed attempt used no tokens, the retry reserves them again.
+        if self.tokenBucket is not None:
+            with self.lock:
+                self.tokenBucket.refund(estimated)
+
+    def _retryDelay(self, error, attempt):
+        """Backoff before the next attempt; raises the error when it must not be retried."""
+        kind = classifyOpenAIError(error)
+        if kind == "fatal" or attempt >= self.maxRetries:
+            raise error
+        delay = min(self.maxDelay, self.baseDelay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        retryAfter = retryAfterSeconds(error)
+        if retryAfter is not None:
+            delay = max(delay, retryAfter)
+        with self.lock:
+            self.retries += 1
+            if kind == "rate_limit":
+                self.rateLimited += 1
+                self.pausedUntil = max(self.pausedUntil, time.monotonic() + delay)
+        return delay
+
+    def call(self, send: Callable[[Dict], object], params: Dict, record: Dict = None):
+        """
+        Runs send(params) within the limits, retrying retryable errors.
+        When a record dict is given, its "retries" entry is kept up to date.
+        """
+        estimated = self.estimateTokens(params)
+        attempt = 0
+        while True:
+            if record is not None:
+                record["retries"] = attempt
+            time.sleep(self._reserve(estimated))
+            try:
+                response = send(params)
+            except Exception as e:
+                self._cancel(estimated)
+                time.sleep(self._retryDelay(e, attempt))
+                attempt += 1
+                continue
+            self._settle(estimated, response)
+            return response
+
+    async def acall(self, send, params: Dict, record: Dict = None):
+        """Async version of call; send(params) must return an awaitable."""
+        estimated = self.estimateTokens(params)
+        attempt = 0
+        while True:
+            if record is not None:
+                record["retries"] = attempt
+            await asyncio.sleep(self._reserve(estimated))
+            try:
+                response = await send(params)
+            except Exception as e:
+                self._cancel(estimated)
+                await asyncio.sleep(self._retryDelay(e, attempt))
+                attempt += 1
+                continue
+            self._settle(estimated, response)
+            return response
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rateLimited,
+                "waited_seconds": self.waited,
+            }
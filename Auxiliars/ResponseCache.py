@@ -0,0 +1,118 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Opt-in cache of LLM responses for deterministic calls.
+
+    Keys are a SHA-256 of the canonical JSON of the whole request (backend, model, messages,
+    format schema / response_format and tool schemas), so any change to the request is a miss.
+    Lookups go to an in-memory LRU first and then, when a path is given, to a SQLite file that
+    survives restarts. Entries older than ttl seconds are treated as misses.
+    """
+    def __init__(self, maxMemoryEntries: int = 1024, path: str = None, ttl: float = None):
+        """
+        :param maxMemoryEntries: Responses kept in the in-memory LRU tier.
+        :param path: (Optional) SQLite file for the on-disk tier.
+        :param ttl: (Optional) Lifetime of an entry in seconds; None keeps entries forever.
+        """
+        self.maxMemoryEntries = maxMemoryEntries
+        self.path = path
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memoryHits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.connection = None
+        if path:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+            self.connection.commit()
+
+    @staticmethod
+    def makeKey(request: dict) -> str:
+        """Hashes a request into a cache key; dict order and whitespace don't matter."""
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=repr)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str):
+        """Returns the cached response, or None on a miss."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self.memory.move_to_end(key)
+                    self.memoryHits += 1
+                    return entry[0]
+                del self.memory[key]
+
+            if self.connection is not None:
+                row = self.connection.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.diskHits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value):
+        """Stores a JSON-serializable response."""
+        created = time.time()
+        with self.lock:
+            self._remember(key, value, created)
+            if self.connection is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), created))
+                self.connection.commit()
+
+    def _remember(self, key, value, created):
+        self.memory[key] = (value, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxMemoryEntries:
+            self.memory.popitem(last=False)
+
+    def purgeExpired(self):
+        """Deletes expired entries from both tiers."""
+        if self.ttl is None:
+            return
+        limit = time.time() - self.ttl
+        with self.lock:
+            for key in [key for key, (_, created) in self.memory.items() if created < limit]:
+                del self.memory[key]
+            if self.connection is not None:
+                self.connection.execute("DELETE FROM responses WHERE created < ?", (limit,))
+                self.connection.commit()
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.connection is not None:
+                self.connection.execute("DELETE FROM responses")
+                self.connection.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            hits = self.memoryHits + self.diskHits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memoryHits,
+                "disk_hits": self.diskHits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+            }
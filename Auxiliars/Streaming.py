@@ -0,0 +1,46 @@
+class StreamChunk:
+    """
+    One event of a streamed reply.
+
+    Intermediate events carry the new piece of text in `text`. The last event has
+    done=True, the assembled reply in `fullText`, the parsed answer in `result`
+    (the dict for structured outputs, otherwise the text) and the backend's token
+    counts and timings in `usage`.
+    """
+    def __init__(self, text: str = "", done: bool = False, fullText: str = None, result=None, usage: dict = None):
+        self.text = text
+        self.done = done
+        self.fullText = fullText
+        self.result = result
+        self.usage = usage or {}
+
+    def __repr__(self):
+        if self.done:
+            return f"StreamChunk(done=True, fullText={self.fullText!r}, usage={self.usage!r})"
+        return f"StreamChunk(text={self.text!r})"
+
+
+def ollamaUsage(response) -> dict:
+    """Token counts and timings (nanoseconds) from the final part of an Ollama response."""
+    prompt_tokens = getattr(response, "prompt_eval_count", None) or 0
+    completion_tokens = getattr(response, "eval_count", None) or 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "total_duration": getattr(response, "total_duration", None),
+        "load_duration": getattr(response, "load_duration", None),
+        "prompt_eval_duration": getattr(response, "prompt_eval_duration", None),
+        "eval_duration": getattr(response, "eval_duration", None),
+    }
+
+
+def openaiUsage(usage) -> dict:
+    """Token counts from an OpenAI usage object (None when the server didn't report it)."""
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
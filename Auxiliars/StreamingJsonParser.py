@@ -0,0 +1,110 @@
+import re
+from typing import Dict, List
+from Auxiliars.OutputParser import compileParser, normalizeName, parseJson
+
+_SPECIAL = re.compile(r'["\\\[\]{}]')
+_LAST_KEY = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+# Keys models commonly wrap a record list in ({"items": [...]}), normalized.
+_WRAPPER_KEYS = {"items", "records", "results", "data", "list", "rows", "entries"}
+
+
+class StreamingJsonListParser:
+    """
+    Incremental parser for list-shaped structured replies.
+
+    Text is fed as it streams in and every object that is a direct element of the record
+    array (a bare list, or the list under a wrapper key like {"items": [...]}) is returned
+    as soon as its closing brace arrives, repaired with the same key correction, type
+    checks and defaults as JsonOutputParser. Each character is scanned once and only
+    the record being read is buffered.
+    """
+    def __init__(self, outputDefinition: Dict = None):
+        self.parser = compileParser(outputDefinition) if outputDefinition else None
+        self.stack = []
+        self.inString = False
+        self.escape = False
+        # Depth of the record array once it has been opened.
+        self.recordDepth = None
+        self.pending = None
+        # Text seen before the array opens, parsed by close() if no array ever comes.
+        self.head = []
+        self.count = 0
+
+    def feed(self, text: str) -> List[Dict]:
+        """Consumes a chunk of the reply and returns the records it completed."""
+        records = []
+        start = 0 if self.pending is not None else None
+        skip = 0
+        if self.escape:
+            self.escape = False
+            skip = 1
+        for match in _SPECIAL.finditer(text):
+            i = match.start()
+            if i < skip:
+                continue
+            char = match.group()
+            if self.inString:
+                if char == "\\":
+                    skip = i + 2
+                    if skip > len(text):
+                        self.escape = True
+                elif char == '"':
+                    self.inString = False
+                continue
+            if char == '"':
+                self.inString = True
+            elif char == "[" or char == "{":
+                if char == "{" and self.recordDepth is not None and len(self.stack) == self.recordDepth:
+                    self.pending = []
+                    start = i
+                if char == "[" and self.recordDepth is None and self._isRecordArray(text[:i]):
+                    self.recordDepth = len(self.stack) + 1
+                    self.head = None
+                self.stack.append(char)
+            elif char == "]" or char == "}":
+                if self.stack:
+                    self.stack.pop()
+                if char == "}" and self.pending is not None and len(self.stack) == self.recordDepth:
+                    self.pending.append(text[start:i + 1])
+                    record = self._finishRecord("".join(self.pending))
+                    if record is not None:
+                        records.append(record)
+                    self.pending = None
+                    start = None
+        if self.pending is not None:
+            self.pending.append(text[start:])
+        elif self.head is not None:
+            self.head.append(text)
+        return records
+
+    def _isRecordArray(self, before):
+        if not self.stack:
+            return True
+        if self.stack != ["{"]:
+            return False
+        # An array inside a top-level object is the record list only under a wrapper key
+        # ({"items": [...]}) that is not a field of the record itself. Any other array is a
+        # field, so the reply is a single object and close() parses it whole.
+        key = _LAST_KEY.search("".join(self.head) + before)
+        if key is None:
+            return False
+        name = normalizeName(key.group(1))
+        return name in _WRAPPER_KEYS and (self.parser is None or name not in self.parser.keyTable[1])
+
+    def _finishRecord(self, text):
+        record = parseJson(text)
+        if not isinstance(record, dict):
+            return None
+        self.count += 1
+        return self.parser.repairItem(record) if self.parser else record
+
+    def close(self) -> List[Dict]:
+        """
+        Ends the stream. When the reply held a single object instead of a list, it is
+        returned here as the only record.
+        """
+        if self.recordDepth is not None or self.head is None:
+            return []
+        record = self._finishRecord("".join(self.head).strip() or "{}")
+        self.head = None
+        return [record] if record is not None else []
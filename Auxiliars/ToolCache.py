@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+
+class ToolCache:
+    """
+    LRU of one tool's results keyed on its canonicalized arguments: positional and keyword
+    forms of the same call, and omitted defaults, give the same key. Entries older than ttl
+    seconds are misses. Exceptions are not cached.
+    """
+    def __init__(self, func: Callable, maxEntries: int = 256, ttl: float = None):
+        self.signature = inspect.signature(func)
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def makeKey(self, args, kwargs) -> str:
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return json.dumps(bound.arguments, sort_keys=True, separators=(",", ":"), default=repr)
+
+    def get(self, key):
+        """Returns (True, result) on a hit, (False, None) on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] <= self.ttl):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def countShared(self):
+        """A miss that got the result of an identical call already running counts as a hit."""
+        with self.lock:
+            self.misses -= 1
+            self.hits += 1
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+            }
+
+
+def cacheableTool(func: Callable = None, maxEntries: int = 256, ttl: float = None):
+    """
+    Marks a tool as pure so repeated calls with the same arguments, within a tool loop or
+    across batch items, reuse the first result. Use as @cacheableTool or
+    @cacheableTool(maxEntries=..., ttl=...), or wrap an existing function: cacheableTool(f).
+
+    Name, docstring and signature are kept, so tool schemas don't change. Concurrent calls
+    with the same arguments share one execution. The wrapper exposes cacheStats() and clearCache().
+    """
+    if func is None:
+        return lambda f: cacheableTool(f, maxEntries=maxEntries, ttl=ttl)
+
+    cache = ToolCache(func, maxEntries=maxEntries, ttl=ttl)
+    inflight = {}
+    inflightLock = threading.Lock()
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = cache.makeKey(args, kwargs)
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            loop = asyncio.get_running_loop()
+            with inflightLock:
+                future = inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = inflight[key] = loop.create_future()
+            if not owner:
+                if future.get_loop() is loop:
+                    cache.countShared()
+                    return await asyncio.shield(future)
+                # Running on another event loop (e.g. a worker thread): just compute it.
+                value = await func(*args, **kwargs)
+                cache.put(key, value)
+                return value
+            try:
+                value = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # Nobody may be waiting on it; keep asyncio from warning about it.
+                future.exception()
+                raise
+            else:
+                cache.put(key, value)
+                future.set_result(value)
+                return value
+            finally:
+                with inflightLock:
+                    inflight.pop(key, None)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = cache.makeKey(args, kwargs)
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            with inflightLock:
+                future = inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = inflight[key] = Future()
+            if not owner:
+                cache.countShared()
+                return future.result()
+            try:
+                value = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                cache.put(key, value)
+                future.set_result(value)
+                return value
+            finally:
+                with inflightLock:
+                    inflight.pop(key, None)
+
+    wrapper.toolCache = cache
+    wrapper.cacheStats = cache.stats
+    wrapper.clearCache = cache.clear
+    return wrapper
+
+
+def toolCacheStats(tools: List[Callable]) -> Dict[str, dict]:
+    """Cache stats of the cacheable tools in tools, by tool name."""
+    return {tool.__name__: tool.cacheStats() for tool in tools or [] if hasattr(tool, "cacheStats")}
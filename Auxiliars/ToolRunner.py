@@ -0,0 +1,76 @@
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class ToolBudget:
+    """
+    Limits of a tool calling loop: at most maxSteps tool rounds and maxSeconds of wall time
+    (None disables either). Once exhausted, the model is asked for a final answer without tools.
+    """
+    def __init__(self, maxSteps: int = 8, maxSeconds: float = None):
+        self.maxSteps = maxSteps
+        self.maxSeconds = maxSeconds
+        self.steps = 0
+        self.started = time.monotonic()
+
+    def step(self):
+        self.steps += 1
+
+    @property
+    def exhausted(self) -> bool:
+        if self.maxSteps is not None and self.steps >= self.maxSteps:
+            return True
+        return self.maxSeconds is not None and time.monotonic() - self.started >= self.maxSeconds
+
+
+def findTool(dispatch: Dict[str, Callable], name: str) -> Callable:
+    tool = dispatch.get(name)
+    if tool is None:
+        raise ValueError(f"Function {name} not found")
+    return tool
+
+
+def executeTool(dispatch: Dict[str, Callable], name: str, arguments: Dict) -> Any:
+    tool = findTool(dispatch, name)
+    try:
+        return tool(**arguments)
+    except Exception as e:
+        raise RuntimeError(f"Error executing {name}: {str(e)}")
+
+
+async def aexecuteTool(dispatch: Dict[str, Callable], name: str, arguments: Dict) -> Any:
+    """Async tools are awaited, plain functions run in a worker thread so they don't block the loop."""
+    tool = findTool(dispatch, name)
+    try:
+        if inspect.iscoroutinefunction(tool):
+            return await tool(**arguments)
+        return await asyncio.to_thread(tool, **arguments)
+    except Exception as e:
+        raise RuntimeError(f"Error executing {name}: {str(e)}")
+
+
+def runToolCalls(dispatch: Dict[str, Callable], calls: List[Tuple[str, Dict]], maxWorkers: int = 8) -> List[Any]:
+    """
+    Runs every (name, arguments) call of a model reply, concurrently in a thread pool when
+    there are several. Async tools are run to completion in their worker thread.
+
+    :return: The results in call order.
+    """
+    def run(call):
+        name, arguments = call
+        if inspect.iscoroutinefunction(findTool(dispatch, name)):
+            return asyncio.run(aexecuteTool(dispatch, name, arguments))
+        return executeTool(dispatch, name, arguments)
+
+    if len(calls) <= 1:
+        return [run(call) for call in calls]
+    with ThreadPoolExecutor(max_workers=min(len(calls), maxWorkers)) as executor:
+        return list(executor.map(run, calls))
+
+
+async def arunToolCalls(dispatch: Dict[str, Callable], calls: List[Tuple[str, Dict]]) -> List[Any]:
+    """Async counterpart of runToolCalls: all calls are awaited together."""
+    return list(await asyncio.gather(*(aexecuteTool(dispatch, name, arguments) for name, arguments in calls)))
@@ -0,0 +1,80 @@
+"""
+Per-call overhead of building the call artifacts from scratch (what every message used to pay)
+versus reusing a compiled CallPlan.
+
+Usage:
+    python -m Benchmarks.CallPlanBenchmark --calls 2000
+"""
+import argparse
+import time
+from Auxiliars.CallPlan import CallPlan, compileCallPlan
+
+OUTPUT_DEFINITION = {
+    "name": (str, ""),
+    "age": (int, -1),
+    "description": (str, ""),
+    "tags": (list, []),
+    "score": (float, 0.0),
+}
+
+
+def multiply(a: float, b: float) -> float:
+    """Multiply two numbers"""
+    return a * b
+
+
+def add(a: float, b: float) -> float:
+    """Add two numbers"""
+    return a + b
+
+
+def lookup(key: str, default: str = "") -> str:
+    """Look up a key"""
+    return default
+
+
+TOOLS = [multiply, add, lookup]
+
+
+def touch(plan, openai):
+    # The artifacts each backend reads on every call.
+    if plan.outputDefinition:
+        plan.outputSchema
+        plan.outputModel.model_validate_json('{"name": "x"}')
+    if plan.tools:
+        plan.toolSystemMessage
+        plan.functionCallSchema
+        plan.dispatch
+        if openai:
+            plan.openaiToolSchemas
+
+
+def measure(calls, build, openai=False):
+    start = time.perf_counter()
+    for _ in range(calls):
+        touch(build(), openai)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def run(calls):
+    scenarios = {
+        "outputDefinition": dict(outputDefinition=OUTPUT_DEFINITION),
+        "ollama_tools": dict(tools=TOOLS),
+        "openai_tools": dict(tools=TOOLS),
+    }
+    results = {}
+    for name, kwargs in scenarios.items():
+        openai = name == "openai_tools"
+        fresh = measure(calls, lambda: CallPlan(systemMessage="You are helpful.", **kwargs), openai)
+        compiled = measure(calls, lambda: compileCallPlan(systemMessage="You are helpful.", **kwargs), openai)
+        results[name] = {"fresh_us_per_call": fresh, "compiled_us_per_call": compiled, "speedup": fresh / compiled}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    for scenario, stats in run(args.calls).items():
+        print(scenario.ljust(18), "  ".join(f"{key}={value:.1f}" for key, value in stats.items()))
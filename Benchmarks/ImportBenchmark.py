@@ -0,0 +1,72 @@
+"""
+Startup cost of the framework: time to import each entry module, and to import it and
+create a model, in a fresh interpreter, plus which heavy third-party packages got loaded.
+
+Usage:
+    python -m Benchmarks.ImportBenchmark --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY = ("ollama", "openai", "httpx", "pydantic", "function_schema", "Levenshtein", "chromadb", "numpy")
+
+SCENARIOS = {
+    "import LLMModelManager": "import LLMModelManager",
+    "import Ollama.OllamaModel": "import Ollama.OllamaModel",
+    "import Ollama.OllamaConversationModel": "import Ollama.OllamaConversationModel",
+    "import Ollama.OllamaEmbeddingModel": "import Ollama.OllamaEmbeddingModel",
+    "import ChatGPT.ChatGPTModel": "import ChatGPT.ChatGPTModel",
+    "import Auxiliars.OutputParser": "import Auxiliars.OutputParser",
+    "LLMModelManager(Ollama)": "from LLMModelManager import LLMModelManager; "
+                               "LLMModelManager(modelName='m', warmUp=False)",
+    "LLMModelManager(ChatGPT)": "from LLMModelManager import LLMModelManager; "
+                                "LLMModelManager(modelName='m', apiKey='k', LLMType='ChatGPT')",
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+try:
+    exec({code!r})
+    error = None
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "error": error,
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe(code):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = PROBE.format(code=code, heavy=HEAVY)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=root, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def run(repeat):
+    results = {}
+    for name, code in SCENARIOS.items():
+        samples = [probe(code) for _ in range(repeat)]
+        results[name] = {
+            "median_ms": statistics.median(s["seconds"] for s in samples) * 1000,
+            "loaded": ",".join(samples[-1]["loaded"]) or "-",
+            "error": samples[-1]["error"],
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for scenario, stats in run(args.repeat).items():
+        line = f"{scenario.ljust(40)} {stats['median_ms']:8.1f} ms  loaded={stats['loaded']}"
+        if stats["error"]:
+            line += f"  error={stats['error']}"
+        print(line)
@@ -0,0 +1,257 @@
+"""
+Local stand-in HTTP servers for the Ollama and OpenAI APIs, so throughput can be measured
+without a real model. Replies are deterministic; latency and token rate are configurable.
+
+    with MockOllamaServer(latency=0.05, tokensPerSecond=200) as server:
+        model = OllamaLLMModel()
+        model.apiEndpoint = server.url
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def estimateTokens(text):
+    return max(1, len(text) // 4)
+
+
+def replyFromSchema(schema):
+    """A small instance of a JSON schema (what a format-constrained model would answer)."""
+    if not isinstance(schema, dict):
+        return {}
+    definitions = schema.get("$defs", {})
+
+    def build(node):
+        if "$ref" in node:
+            return build(definitions.get(node["$ref"].rsplit("/", 1)[-1], {}))
+        if "anyOf" in node:
+            return build(node["anyOf"][0])
+        if "enum" in node:
+            return node["enum"][0]
+        kind = node.get("type")
+        if kind == "object":
+            return {name: build(child) for name, child in node.get("properties", {}).items()}
+        if kind == "array":
+            return [build(node.get("items", {})) for _ in range(2)]
+        return {"string": "mock", "integer": 1, "number": 1.0, "boolean": True}.get(kind, "mock")
+
+    return build(schema)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def readJson(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def sendJson(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def startChunked(self, contentType):
+        self.send_response(200)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def writeChunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def endChunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def route(self, method):
+        server = self.server.mock
+        with server.lock:
+            server.requests += 1
+        handler = server.routes.get((method, self.path.split("?", 1)[0]))
+        if handler is None:
+            self.sendJson({"error": f"{method} {self.path} not found"}, status=404)
+            return
+        handler(self)
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_POST(self):
+        self.route("POST")
+
+
+class MockServer:
+    """Runs routes {(method, path): handler(request)} on a local port in a background thread."""
+    def __init__(self, latency: float = 0.05, tokensPerSecond: float = 200.0, replyTokens: int = 32,
+                 embeddingDim: int = 256, embedSecondsPerText: float = 0.001, host: str = "127.0.0.1", port: int = 0):
+        """
+        :param latency: Seconds before the first token (or before an embed reply).
+        :param tokensPerSecond: Generation speed; each reply holds replyTokens tokens.
+        :param replyTokens: Tokens of a plain text reply.
+        :param embeddingDim: Size of the returned embeddings.
+        :param embedSecondsPerText: Extra embed time per input text.
+        """
+        self.latency = latency
+        self.tokensPerSecond = tokensPerSecond
+        self.replyTokens = replyTokens
+        self.embeddingDim = embeddingDim
+        self.embedSecondsPerText = embedSecondsPerText
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def replyText(self, prompt):
+        seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "big")
+        rng = random.Random(seed)
+        return [f"w{rng.randrange(1000)} " for _ in range(self.replyTokens)]
+
+    def tokenDelay(self):
+        return 1.0 / self.tokensPerSecond if self.tokensPerSecond else 0.0
+
+    def embedding(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+        rng = random.Random(seed)
+        return [rng.uniform(-1, 1) for _ in range(self.embeddingDim)]
+
+
+class MockOllamaServer(MockServer):
+    """Implements /api/chat (streamed or not), /api/generate, /api/embed, /api/ps and /api/tags."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.routes = {
+            ("POST", "/api/chat"): self.chat,
+            ("POST", "/api/generate"): self.generate,
+            ("POST", "/api/embed"): self.embed,
+            ("GET", "/api/ps"): self.ps,
+            ("GET", "/api/tags"): self.ps,
+        }
+        self.loadedModels = set()
+
+    def _reply(self, request, prompt):
+        if isinstance(request.get("format"), dict):
+            return [json.dumps(replyFromSchema(request["format"]))]
+        if request.get("format") == "json":
+            return ['{"answer": "mock"}']
+        return self.replyText(prompt)
+
+    def _stats(self, prompt, tokens, started):
+        total = int((time.perf_counter() - started) * 1e9)
+        return {"done": True, "done_reason": "stop", "total_duration": total, "load_duration": 0,
+                "prompt_eval_count": estimateTokens(prompt), "prompt_eval_duration": int(self.latency * 1e9),
+                "eval_count": tokens, "eval_duration": int(tokens * self.tokenDelay() * 1e9)}
+
+    def _generate(self, handler, request, prompt, wrap):
+        started = time.perf_counter()
+        self.loadedModels.add(request.get("model"))
+        tokens = self._reply(request, prompt)
+        time.sleep(self.latency)
+        base = {"model": request.get("model"), "created_at": "2024-01-01T00:00:00Z"}
+        if request.get("stream", True):
+            handler.startChunked("application/x-ndjson")
+            for token in tokens:
+                time.sleep(self.tokenDelay())
+                handler.writeChunk((json.dumps({**base, **wrap(token), "done": False}) + "\n").encode("utf-8"))
+            final = {**base, **wrap(""), **self._stats(prompt, len(tokens), started)}
+            handler.writeChunk((json.dumps(final) + "\n").encode("utf-8"))
+            handler.endChunked()
+        else:
+            time.sleep(self.tokenDelay() * len(tokens))
+            handler.sendJson({**base, **wrap("".join(tokens)), **self._stats(prompt, len(tokens), started)})
+
+    def chat(self, handler):
+        request = handler.readJson()
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        self._generate(handler, request, prompt, lambda text: {"message": {"role": "assistant", "content": text}})
+
+    def generate(self, handler):
+        request = handler.readJson()
+        self._generate(handler, request, request.get("prompt", ""), lambda text: {"response": text})
+
+    def embed(self, handler):
+        started = time.perf_counter()
+        request = handler.readJson()
+        texts = request.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        time.sleep(self.latency + self.embedSecondsPerText * len(texts))
+        handler.sendJson({"model": request.get("model"), "embeddings": [self.embedding(t) for t in texts],
+                          "total_duration": int((time.perf_counter() - started) * 1e9), "load_duration": 0,
+                          "prompt_eval_count": sum(estimateTokens(t) for t in texts)})
+
+    def ps(self, handler):
+        handler.sendJson({"models": [{"name": m, "model": m, "size": 0, "digest": "", "size_vram": 0,
+                                      "expires_at": "2099-01-01T00:00:00Z"} for m in sorted(self.loadedModels) if m]})
+
+
+class MockOpenAIServer(MockServer):
+    """Implements POST /v1/chat/completions, streamed (SSE) or not. Use url + "/v1" as base_url."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.routes = {("POST", "/v1/chat/completions"): self.completions}
+
+    def completions(self, handler):
+        request = handler.readJson()
+        prompt = "\n".join(str(m.get("content") or "") for m in request.get("messages", []))
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            tokens = ['{"answer": "mock"}']
+        else:
+            tokens = self.replyText(prompt)
+        usage = {"prompt_tokens": estimateTokens(prompt), "completion_tokens": len(tokens),
+                 "total_tokens": estimateTokens(prompt) + len(tokens)}
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": request.get("model")}
+        time.sleep(self.latency)
+
+        if not request.get("stream"):
+            time.sleep(self.tokenDelay() * len(tokens))
+            handler.sendJson({**base, "object": "chat.completion", "usage": usage, "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(tokens)}}]})
+            return
+
+        def event(payload):
+            handler.writeChunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        handler.startChunked("text/event-stream")
+        for token in tokens:
+            time.sleep(self.tokenDelay())
+            event({**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+        event({**base, "object": "chat.completion.chunk", "choices": [
+            {"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        handler.writeChunk(b"data: [DONE]\n\n")
+        handler.endChunked()
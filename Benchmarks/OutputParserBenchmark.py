@@ -0,0 +1,155 @@
+"""
+Throughput of JsonOutputParser.parseOutput before and after compiling the outputDefinition,
+plus parseMany with a process pool. The reference implementation is the original per-call
+parser (literal_eval first, linear Levenshtein scans), kept here verbatim for comparison.
+
+Usage:
+    python -m Benchmarks.OutputParserBenchmark --responses 2000 --items 10 --options 200 --processes 4
+"""
+import argparse
+import ast
+import json
+import random
+import time
+from Levenshtein import distance as levenshtein_distance
+from Auxiliars.OutputParser import JsonOutputParser, compileParser
+
+
+def legacyParseOutput(structuredResponse, outputDefinition):
+    try:
+        structuredResponse = ast.literal_eval(structuredResponse)
+    except:
+        try:
+            structuredResponse = json.loads(structuredResponse)
+        except:
+            return {}
+
+    if outputDefinition is None:
+        return structuredResponse
+
+    isDict = False
+    if isinstance(structuredResponse, dict):
+        structuredResponse = [structuredResponse]
+        isDict = True
+
+    def get_most_similar_option(key, validOptionsList):
+        min_distance = float('inf')
+        best_option = None
+        for option in validOptionsList:
+            distance = levenshtein_distance(key, option)
+            if distance <= 3 and distance < min_distance:
+                min_distance = distance
+                best_option = option
+        return min_distance, best_option
+
+    correctKeyNames = outputDefinition.keys()
+    if isinstance(structuredResponse, list):
+        for item in structuredResponse:
+            if isinstance(item, dict):
+                keys_to_modify = []
+                for key in list(item.keys()):
+                    if key not in correctKeyNames:
+                        min_distance, best_option = get_most_similar_option(key, correctKeyNames)
+                        if min_distance <= 3:
+                            keys_to_modify.append((key, best_option))
+                for old_key, new_key in keys_to_modify:
+                    item[new_key] = item.pop(old_key)
+
+                for correctKey in correctKeyNames:
+                    if correctKey not in item:
+                        item[correctKey] = outputDefinition[correctKey][1]
+                    validOptionsList = outputDefinition[correctKey][0]
+                    if isinstance(validOptionsList, list) and len(validOptionsList) > 0:
+                        if type(validOptionsList[0]) == str:
+                            if item[correctKey] not in validOptionsList:
+                                min_distance, best_option = get_most_similar_option(str(item[correctKey]), validOptionsList)
+                                if min_distance <= 3:
+                                    item[correctKey] = best_option
+                                else:
+                                    item[correctKey] = outputDefinition[correctKey][1]
+                    elif not isinstance(item[correctKey], outputDefinition[correctKey][0]):
+                        item[correctKey] = outputDefinition[correctKey][1]
+
+                for key in list(item.keys()):
+                    if key not in correctKeyNames:
+                        item.pop(key)
+    if isDict:
+        structuredResponse = structuredResponse[0]
+    return structuredResponse
+
+
+def makeDefinition(options):
+    return {
+        "nome": (str, ""),
+        "idade": (int, -1),
+        "ativo": (bool, False),
+        "tags": (list, []),
+        "categoria": ([f"categoria_{i:04d}" for i in range(options)], "categoria_0000"),
+    }
+
+
+def misspell(word, rng):
+    if len(word) < 3 or rng.random() < 0.5:
+        return word
+    i = rng.randrange(len(word))
+    return word[:i] + word[i + 1:]
+
+
+def makeResponses(count, items, options, seed=0):
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(count):
+        rows = []
+        for _ in range(items):
+            row = {
+                misspell("nome", rng): "Maria",
+                misspell("idade", rng): rng.choice([30, "trinta"]),
+                "ativo": rng.random() < 0.5,
+                misspell("tags", rng): ["a", "b"],
+                "categoria": misspell(f"categoria_{rng.randrange(options):04d}", rng),
+                "extra": "dropped",
+            }
+            rows.append(row)
+        responses.append(json.dumps(rows, ensure_ascii=False))
+    return responses
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run(count, items, options, processes):
+    definition = makeDefinition(options)
+    responses = makeResponses(count, items, options)
+    parser = JsonOutputParser()
+
+    legacy_time, expected = timed(lambda: [legacyParseOutput(r, definition) for r in responses])
+    compileParser(definition)
+    compiled_time, compiled = timed(lambda: [parser.parseOutput(r, definition) for r in responses])
+    results = {
+        "legacy": {"seconds": legacy_time, "responses_per_s": count / legacy_time},
+        "compiled": {"seconds": compiled_time, "responses_per_s": count / compiled_time,
+                     "speedup": legacy_time / compiled_time},
+    }
+    if processes and processes > 1:
+        pool_time, pooled = timed(lambda: parser.parseMany(responses, definition, processes=processes))
+        results["parseMany_pool"] = {"seconds": pool_time, "responses_per_s": count / pool_time,
+                                     "speedup": legacy_time / pool_time}
+        assert pooled == compiled
+    mismatches = sum(1 for a, b in zip(expected, compiled) if a != b)
+    results["compiled"]["mismatching_responses"] = mismatches
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--options", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=0)
+    args = parser.parse_args()
+
+    for scenario, stats in run(args.responses, args.items, args.options, args.processes).items():
+        print(scenario.ljust(16), "  ".join(f"{key}={value:.2f}" for key, value in stats.items()))
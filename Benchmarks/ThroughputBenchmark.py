@@ -0,0 +1,182 @@
+"""
+End-to-end throughput of the framework against local stand-in Ollama and OpenAI servers
+(Benchmarks.MockServers), so no real model is needed and runs are reproducible.
+
+Scenarios: batch OllamaLLMModel.sendMessage, LLMModelManager.sendMessageAsync concurrency,
+batch ChatGPTModel.sendMessage, OllamaEmbeddingModel.add_texts ingestion and search_many,
+and JsonOutputParser.parseOutput on large payloads. Results are written as JSON; pass an
+earlier file with --compare to print the ratios of every per-second metric.
+
+Usage:
+    python -m Benchmarks.ThroughputBenchmark --output bench.json
+    python -m Benchmarks.ThroughputBenchmark --output new.json --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from Benchmarks.MockServers import MockOllamaServer, MockOpenAIServer
+
+MODEL = "mock-model"
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def throughput(count, seconds, unit="requests"):
+    return {unit: count, "seconds": seconds, f"{unit}_per_s": count / seconds if seconds > 0 else 0.0}
+
+
+def makeMessages(count, prefix="message"):
+    return [f"{prefix} {i}: describe item number {i} in one sentence." for i in range(count)]
+
+
+def ollamaBatch(server, messages, concurrency):
+    from Ollama.OllamaModel import OllamaLLMModel
+    model = OllamaLLMModel()
+    model.apiEndpoint = server.url
+    model.modelName = MODEL
+    seconds, results = timed(lambda: model.sendMessage(messages, maxConcurrency=concurrency))
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    return {**throughput(len(messages), seconds), "failed": failed}
+
+
+def managerAsync(server, messages, workers):
+    from LLMModelManager import LLMModelManager
+    manager = LLMModelManager(modelName=MODEL, LLMType="Ollama", maxWorkers=workers, warmUp=False)
+    manager.model.apiEndpoint = server.url
+
+    def run():
+        ids = [manager.sendMessageAsync(message, assistantFormat=False) for message in messages]
+        return [manager.waitResponse(i) for i in ids]
+
+    try:
+        seconds, _ = timed(run)
+    finally:
+        manager.shutdown()
+    return throughput(len(messages), seconds)
+
+
+def openaiBatch(server, messages, concurrency):
+    from ChatGPT.ChatGPTModel import ChatGPTModel
+    model = ChatGPTModel(modelName=MODEL, apiKey="mock", baseUrl=server.url + "/v1")
+    seconds, results = timed(lambda: model.sendMessage(messages, maxConcurrency=concurrency))
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    return {**throughput(len(messages), seconds), "failed": failed}
+
+
+def embeddingScenarios(server, texts, queries, concurrency):
+    from Ollama.OllamaEmbeddingModel import OllamaEmbeddingModel
+    from VectorStores.NumpyVectorStore import NumpyVectorStore
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        model = OllamaEmbeddingModel(MODEL, MODEL, persist_directory=directory, use_embedding_cache=False,
+                                     vector_store=NumpyVectorStore(os.path.join(directory, "vectors")),
+                                     api_endpoint=server.url)
+        stats = model.add_texts(texts, batch_size=64, max_concurrency=concurrency)
+        results["add_texts"] = {**throughput(stats["texts"], stats["seconds"], "texts"), "requests": stats["requests"]}
+        seconds, _ = timed(lambda: model.search_many(queries, n_results=5, max_concurrency=concurrency))
+        results["search_many"] = throughput(len(queries), seconds, "queries")
+    return results
+
+
+def parseLargePayloads(count, items, options):
+    from Auxiliars.OutputParser import JsonOutputParser
+    from Benchmarks.OutputParserBenchmark import makeDefinition, makeResponses
+    definition = makeDefinition(options)
+    responses = makeResponses(count, items, options)
+    parser = JsonOutputParser()
+    seconds, _ = timed(lambda: [parser.parseOutput(response, definition) for response in responses])
+    return {**throughput(count, seconds, "responses"), "items_per_response": items}
+
+
+def attempt(results, name, func, *args, nested=False):
+    """
+    Runs a scenario; a missing backend dependency is recorded as skipped instead of aborting the run.
+    A nested scenario returns several named results at once.
+    """
+    try:
+        outcome = func(*args)
+    except ImportError as e:
+        results[name] = {"skipped": str(e)}
+        return
+    if nested:
+        results.update(outcome)
+    else:
+        results[name] = outcome
+
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    serverOptions = dict(latency=args.latency, tokensPerSecond=args.tokens_per_second, replyTokens=args.reply_tokens)
+    messages = makeMessages(args.requests)
+    scenarios = {}
+    with MockOllamaServer(embeddingDim=args.dim, **serverOptions) as ollama, MockOpenAIServer(**serverOptions) as openai:
+        for concurrency in args.concurrency:
+            attempt(scenarios, f"ollama_sendMessage_batch_c{concurrency}", ollamaBatch, ollama, messages, concurrency)
+            attempt(scenarios, f"manager_sendMessageAsync_w{concurrency}", managerAsync, ollama, messages, concurrency)
+            attempt(scenarios, f"openai_sendMessage_batch_c{concurrency}", openaiBatch, openai, messages, concurrency)
+        attempt(scenarios, "embeddings", embeddingScenarios, ollama, makeMessages(args.texts, "document"),
+                makeMessages(args.queries, "query"), max(args.concurrency), nested=True)
+    attempt(scenarios, "parseOutput_large", parseLargePayloads, args.responses, args.items, 200)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": gitCommit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": vars(args),
+        },
+        "scenarios": scenarios,
+    }
+
+
+def compare(current, baseline):
+    """Prints current / baseline for every *_per_s metric the two runs share."""
+    for name, stats in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name, {})
+        for key, value in stats.items():
+            if key.endswith("_per_s") and old.get(key):
+                print(f"{name.ljust(36)} {key.ljust(16)} {old[key]:10.1f} -> {value:10.1f}  x{value / old[key]:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--reply-tokens", type=int, default=16)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--responses", type=int, default=200)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--output", default=None, help="JSON file for the results.")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against.")
+    args = parser.parse_args()
+
+    results = run(args)
+    for scenario, stats in results["scenarios"].items():
+        print(scenario.ljust(36), "  ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                                            for key, value in stats.items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
@@ -0,0 +1,97 @@
+"""
+Recall/latency comparison of the vector store backends on synthetic clustered vectors.
+
+Usage:
+    python -m Benchmarks.VectorStoreBenchmark --rows 50000 --dim 128 --queries 200
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from VectorStores.NumpyVectorStore import NumpyVectorStore
+
+
+def make_dataset(rows, dim, queries, clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32) * 4
+    data = centers[rng.integers(0, clusters, rows)] + rng.normal(size=(rows, dim)).astype(np.float32)
+    query = centers[rng.integers(0, clusters, queries)] + rng.normal(size=(queries, dim)).astype(np.float32)
+    return data, query
+
+
+def exact_neighbours(data, query, k):
+    distances = (query ** 2).sum(1)[:, None] - 2 * query @ data.T + (data ** 2).sum(1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def ingest(store, data, batch=5000):
+    start = time.perf_counter()
+    for offset in range(0, len(data), batch):
+        chunk = data[offset:offset + batch]
+        ids = [str(offset + i) for i in range(len(chunk))]
+        store.upsert(ids=ids, embeddings=chunk.tolist(), documents=ids, metadatas=[{"n": offset + i} for i in range(len(chunk))])
+    return time.perf_counter() - start
+
+
+def measure(store, query, truth, k):
+    latencies = []
+    hits = 0
+    for i, vector in enumerate(query):
+        start = time.perf_counter()
+        result = store.query(query_embeddings=[vector.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(int(doc_id) for doc_id in result["ids"][0]) & set(truth[i].tolist()))
+    latencies = np.array(latencies) * 1000
+    return {
+        f"recall@{k}": hits / (len(query) * k),
+        "mean_ms": float(latencies.mean()),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def run(rows, dim, queries, k, n_probe, skip_chroma):
+    data, query = make_dataset(rows, dim, queries)
+    truth = exact_neighbours(data, query, k)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "numpy")
+        store = NumpyVectorStore(path, exact_threshold=rows + 1, auto_index=False)
+        ingest_seconds = ingest(store, data)
+        results["numpy_exact"] = measure(store, query, truth, k)
+        results["numpy_exact"]["ingest_s"] = ingest_seconds
+
+        start = time.perf_counter()
+        store.build_index()
+        index_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        store = NumpyVectorStore(path, exact_threshold=0, n_probe=n_probe, auto_index=False)
+        open_ms = (time.perf_counter() - start) * 1000
+        results["numpy_ivf"] = measure(store, query, truth, k)
+        results["numpy_ivf"].update({"index_build_s": index_seconds, "open_ms": open_ms})
+
+        if not skip_chroma:
+            from VectorStores.ChromaVectorStore import ChromaVectorStore
+            chroma_path = os.path.join(directory, "chroma")
+            store = ChromaVectorStore(chroma_path)
+            ingest_seconds = ingest(store, data)
+            start = time.perf_counter()
+            store = ChromaVectorStore(chroma_path)
+            open_ms = (time.perf_counter() - start) * 1000
+            results["chroma"] = measure(store, query, truth, k)
+            results["chroma"].update({"ingest_s": ingest_seconds, "open_ms": open_ms})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, default=8)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    for backend, stats in run(args.rows, args.dim, args.queries, args.k, args.n_probe, args.skip_chroma).items():
+        print(backend.ljust(12), "  ".join(f"{key}={value:.3f}" for key, value in stats.items()))
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, List
+from Auxiliars.BatchRunner import BatchItemError
+
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class ChatGPTBatchJob:
+    """
+    Offline bulk run of chat completions through the OpenAI Batch API.
+
+    The requests are written as JSONL files in workDirectory (at most maxRequestsPerBatch per
+    file), uploaded and submitted as batches; the job then polls them, downloads the output
+    files and maps every line back to its input through its custom_id. Every step is recorded
+    in workDirectory/state.json, so running the same job again after a crash resumes where it
+    stopped instead of paying for the requests twice.
+    """
+    def __init__(self, client, workDirectory: str, maxRequestsPerBatch: int = 50_000,
+                 completionWindow: str = "24h", pollInterval: float = 60.0):
+        """
+        :param client: openai.OpenAI client.
+        :param workDirectory: Directory holding the input/output files and state.json of the job.
+        :param maxRequestsPerBatch: Requests per batch file (the API accepts up to 50,000).
+        :param completionWindow: Completion window of the batches.
+        :param pollInterval: Seconds between status checks while waiting.
+        """
+        self.client = client
+        self.workDirectory = workDirectory
+        self.maxRequestsPerBatch = maxRequestsPerBatch
+        self.completionWindow = completionWindow
+        self.pollInterval = pollInterval
+        self.statePath = os.path.join(workDirectory, "state.json")
+        os.makedirs(workDirectory, exist_ok=True)
+        self.state = None
+        if os.path.exists(self.statePath):
+            with open(self.statePath, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def _saveState(self):
+        # Write then rename, so a crash never leaves a truncated state file.
+        tmpPath = self.statePath + ".tmp"
+        with open(tmpPath, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmpPath, self.statePath)
+
+    def submit(self, requests: List[Dict]):
+        """
+        Writes, uploads and submits the chat.completions request bodies, skipping the steps a
+        previous run of this job already did.
+
+        :raises ValueError: When workDirectory holds a job for different requests.
+        """
+        lines = [json.dumps({"custom_id": f"item-{i}", "method": "POST", "url": "/v1/chat/completions",
+                             "body": body}, ensure_ascii=False)
+                 for i, body in enumerate(requests)]
+        fingerprint = hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+        if self.state is None:
+            self.state = {"fingerprint": fingerprint, "total": len(lines), "chunks": [
+                {"start": start, "end": min(start + self.maxRequestsPerBatch, len(lines))}
+                for start in range(0, len(lines), self.maxRequestsPerBatch)]}
+            self._saveState()
+        elif self.state["fingerprint"] != fingerprint:
+            raise ValueError(f"{self.workDirectory} holds a batch job for other requests.")
+
+        for k, chunk in enumerate(self.state["chunks"]):
+            if "batch_id" in chunk:
+                continue
+            if "input_file_id" not in chunk:
+                inputPath = os.path.join(self.workDirectory, f"batch_{k}_input.jsonl")
+                with open(inputPath, "w", encoding="utf-8") as f:
+                    for line in lines[chunk["start"]:chunk["end"]]:
+                        f.write(line + "\n")
+                with open(inputPath, "rb") as f:
+                    chunk["input_file_id"] = self.client.files.create(file=f, purpose="batch").id
+                self._saveState()
+            batch = self.client.batches.create(input_file_id=chunk["input_file_id"],
+                                               endpoint="/v1/chat/completions",
+                                               completion_window=self.completionWindow)
+            chunk["batch_id"] = batch.id
+            chunk["status"] = batch.status
+            self._saveState()
+
+    def poll(self) -> bool:
+        """
+        Refreshes the status of unfinished batches and downloads the files of finished ones.
+
+        :return: True once every batch is finished and downloaded.
+        """
+        done = True
+        for k, chunk in enumerate(self.state["chunks"]):
+            if chunk.get("downloaded"):
+                continue
+            batch = self.client.batches.retrieve(chunk["batch_id"])
+            chunk["status"] = batch.status
+            if batch.status not in FINAL_STATUSES:
+                done = False
+                continue
+            # Expired or cancelled batches still have output for the requests they finished.
+            if batch.output_file_id:
+                chunk["output_path"] = self._download(batch.output_file_id, f"batch_{k}_output.jsonl")
+            if batch.error_file_id:
+                chunk["error_path"] = self._download(batch.error_file_id, f"batch_{k}_errors.jsonl")
+            chunk["downloaded"] = True
+            self._saveState()
+        return done
+
+    def _download(self, fileId, name):
+        path = os.path.join(self.workDirectory, name)
+        self.client.files.content(fileId).write_to_file(path)
+        return path
+
+    def wait(self, onProgress: Callable[[int, int], None] = None):
+        """Polls until every batch is finished; onProgress(finishedBatches, totalBatches) after each poll."""
+        while True:
+            done = self.poll()
+            if onProgress:
+                onProgress(sum(1 for c in self.state["chunks"] if c.get("downloaded")), len(self.state["chunks"]))
+            if done:
+                return
+            time.sleep(self.pollInterval)
+
+    def iterResults(self):
+        """
+        Streams (index, content, error) from the downloaded files, one line at a time.
+        content is the reply text, error a description when the request failed.
+        """
+        for chunk in self.state["chunks"]:
+            for key in ("output_path", "error_path"):
+                if key not in chunk:
+                    continue
+                with open(chunk[key], encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        record = json.loads(line)
+                        index = int(record["custom_id"].split("-", 1)[1])
+                        response = record.get("response") or {}
+                        if record.get("error") or response.get("status_code", 200) != 200:
+                            yield index, None, record.get("error") or response.get("body")
+                        else:
+                            yield index, response["body"]["choices"][0]["message"]["content"], None
+
+    def results(self, inputs: List, parse: Callable[[str], object] = None) -> List:
+        """
+        :param inputs: The inputs the requests were built from, stored in failed items.
+        :param parse: (Optional) Applied to each reply text.
+        :return: One result per input, in input order. Failed or missing items (e.g. of an
+                 expired batch) hold a BatchItemError.
+        """
+        results = [None] * self.state["total"]
+        seen = [False] * self.state["total"]
+        for index, content, error in self.iterResults():
+            seen[index] = True
+            if error is not None:
+                results[index] = BatchItemError(index, inputs[index], RuntimeError(str(error)))
+                continue
+            try:
+                results[index] = parse(content) if parse else content
+            except Exception as e:
+                results[index] = BatchItemError(index, inputs[index], e)
+        for index, found in enumerate(seen):
+            if not found:
+                results[index] = BatchItemError(index, inputs[index], RuntimeError("No result returned by the batch."))
+        return results
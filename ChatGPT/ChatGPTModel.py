@@ -1,7 +1,14 @@
-from openai import OpenAI
 from Auxiliars.OutputParser import JsonOutputParser
-from function_schema import get_function_schema
+from Auxiliars.CallPlan import compileCallPlan
+from Auxiliars.BatchRunner import runBatch, runBatchAsync
+from Auxiliars.Streaming import StreamChunk, openaiUsage
+from Auxiliars.StreamingJsonParser import StreamingJsonListParser
+from Auxiliars.ClientPool import clientPool
+from Auxiliars.Metrics import usageEvent
+from Auxiliars.ToolRunner import ToolBudget, runToolCalls, arunToolCalls
+from ChatGPT.ChatGPTBatchJob import ChatGPTBatchJob
 import json
+import time
 
 class ChatGPTModel:
     def __init__(self, 
@@ -10,148 +17,425 @@ class ChatGPTModel:
                  tools=None,
                  systemMessage = "",
                  expectsOutputParser = False,
-                 outputDefinition = None):
+                 outputDefinition = None,
+                 scheduler = None,
+                 baseUrl = None,
+                 maxToolSteps = 8,
+                 toolTimeBudget = None):
         self.modelName = modelName
         self.apiKey = apiKey
-        if apiKey != "":
-            self.client = OpenAI(api_key=apiKey)
-        else:
-            self.client = None
+        # Optional API base URL, for OpenAI-compatible servers.
+        self.baseUrl = baseUrl
+        # Clients come from the shared pool, so instances with the same key reuse connections.
+        # The client is fetched on the first call, so creating a model doesn't import openai.
+        self.client = None
+        # Optional Auxiliars.ResponseCache shared with the manager.
+        self.responseCache = None
+        # Optional Auxiliars.RateLimiter.RateLimitScheduler pacing and retrying the API calls.
+        self.scheduler = scheduler
+        # Optional Auxiliars.Metrics.MetricsHub receiving a CallEvent per API call.
+        self.metrics = None
         self.tools = tools if tools else []
         self.systemMessage = systemMessage
         self.expectsOutputParser = expectsOutputParser
         self.outputDefinition = outputDefinition
+        # Tool rounds (and seconds) allowed before the model must give a final answer.
+        self.maxToolSteps = maxToolSteps
+        self.toolTimeBudget = toolTimeBudget
+
+    @property
+    def asyncClient(self):
+        # Looked up per call: the shared AsyncOpenAI belongs to the running event loop.
+        return clientPool.openaiAsyncClient(self.apiKey, self.baseUrl)
 
     def setParameters(self):
         pass
 
     def sendMessage(self, userMessage, expectsOutputParser=None,
-                 outputDefinition = None, tools = None, FunctionCallMessages = None):
-        #if isinstance(userMessage, str):
-        #    userMessage = [userMessage]
-        
+                 outputDefinition = None, tools = None, FunctionCallMessages = None,
+                 maxConcurrency = 1, onProgress = None, callPlan = None):
+        """
+        Sends one message, or a list of messages with up to maxConcurrency requests in flight.
+        Results keep input order; in a list, a failed item holds a BatchItemError. Errors of a
+        single message are raised (after the scheduler's retries, when one is set).
+
+        With tools, every tool call of a reply is run concurrently and all results go back in
+        one round-trip, until the model answers or maxToolSteps/toolTimeBudget runs out.
+        FunctionCallMessages continues from an existing message list instead of userMessage.
+        callPlan (from compileCallPlan) replaces tools with its precompiled tool schemas.
+        """
+        if self.client is None:
+            self.client = clientPool.openaiClient(self.apiKey, self.baseUrl)
+
+        iso1model, tools, schemas, expectsOutputParser = self._prepareCall(tools, expectsOutputParser, callPlan)
+
+        def send(currentUserMessage):
+            completion_params = self._buildCompletionParams(
+                currentUserMessage, FunctionCallMessages, iso1model, tools, schemas, expectsOutputParser)
+
+            cacheKey = self._cacheKey(completion_params, FunctionCallMessages)
+            if cacheKey is not None:
+                started = time.perf_counter()
+                cached = self.responseCache.get(cacheKey)
+                if cached is not None:
+                    self._emitCall(started, cacheHit=True)
+                    return self._parseContent(cached, expectsOutputParser, outputDefinition)
+
+            budget = ToolBudget(self.maxToolSteps, self.toolTimeBudget)
+            while True:
+                responseRaw = self._createCompletion(completion_params)
+                if budget.steps == 0:
+                    self._cacheStore(cacheKey, responseRaw)
+                if responseRaw.choices[0].finish_reason != "tool_calls":
+                    return self._parseResponse(responseRaw, expectsOutputParser, outputDefinition)
+                if self._checkToolBudget(completion_params, responseRaw, budget):
+                    continue
+                calls = self._resolveToolCalls(responseRaw, tools)
+                results = runToolCalls(compileCallPlan(tools=tools).dispatch, calls)
+                self._appendToolMessages(completion_params, responseRaw, calls, results)
+                budget.step()
+
+        if type(userMessage) == str:
+            return send(userMessage)
+        return runBatch(send, userMessage, maxConcurrency=maxConcurrency, onProgress=onProgress)
+
+    def sendMessageBulk(self, userMessages, workDirectory, expectsOutputParser=None,
+                        outputDefinition = None, pollInterval = 60.0, maxRequestsPerBatch = 50_000,
+                        onProgress = None):
+        """
+        Sends a large list of messages through the Batch API (half the price, results within
+        24h) and blocks until they are done. Calling it again with the same workDirectory after
+        a crash resumes the job. Replies go through JsonOutputParser like in sendMessage; failed
+        items hold a BatchItemError. Tools are not available in bulk mode.
+
+        :param workDirectory: Directory for the batch files and the resumable job state.
+        :param pollInterval: Seconds between status checks.
+        :param maxRequestsPerBatch: Requests per submitted batch.
+        :param onProgress: (Optional) onProgress(finishedBatches, totalBatches) after each check.
+        """
         if self.client is None:
-            self.client = OpenAI(api_key=self.apiKey)
+            self.client = clientPool.openaiClient(self.apiKey, self.baseUrl)
+
+        # Iterated twice (requests, then results), so a generator is materialized first.
+        userMessages = list(userMessages)
+        iso1model, _, _, expectsOutputParser = self._prepareCall([], expectsOutputParser)
+        requests = [self._buildCompletionParams(message, None, iso1model, None, None, expectsOutputParser)
+                    for message in userMessages]
+
+        job = ChatGPTBatchJob(self.client, workDirectory, maxRequestsPerBatch=maxRequestsPerBatch,
+                              pollInterval=pollInterval)
+        job.submit(requests)
+        job.wait(onProgress)
+        return job.results(userMessages, lambda content: self._parseContent(content, expectsOutputParser, outputDefinition))
+
+    async def asendMessage(self, userMessage, expectsOutputParser=None,
+                 outputDefinition = None, tools = None, FunctionCallMessages = None,
+                 maxConcurrency = 1, callPlan = None):
+        """
+        Async version of sendMessage built on AsyncOpenAI. A list of messages is
+        sent with up to maxConcurrency requests in flight, results keep input order.
+        """
+        iso1model, tools, schemas, expectsOutputParser = self._prepareCall(tools, expectsOutputParser, callPlan)
+
+        async def send(currentUserMessage):
+            completion_params = self._buildCompletionParams(
+                currentUserMessage, FunctionCallMessages, iso1model, tools, schemas, expectsOutputParser)
+
+            cacheKey = self._cacheKey(completion_params, FunctionCallMessages)
+            if cacheKey is not None:
+                started = time.perf_counter()
+                cached = self.responseCache.get(cacheKey)
+                if cached is not None:
+                    self._emitCall(started, cacheHit=True)
+                    return self._parseContent(cached, expectsOutputParser, outputDefinition)
+
+            budget = ToolBudget(self.maxToolSteps, self.toolTimeBudget)
+            while True:
+                responseRaw = await self._acreateCompletion(completion_params)
+                if budget.steps == 0:
+                    self._cacheStore(cacheKey, responseRaw)
+                if responseRaw.choices[0].finish_reason != "tool_calls":
+                    return self._parseResponse(responseRaw, expectsOutputParser, outputDefinition)
+                if self._checkToolBudget(completion_params, responseRaw, budget):
+                    continue
+                calls = self._resolveToolCalls(responseRaw, tools)
+                results = await arunToolCalls(compileCallPlan(tools=tools).dispatch, calls)
+                self._appendToolMessages(completion_params, responseRaw, calls, results)
+                budget.step()
+
+        if type(userMessage) == str:
+            return await send(userMessage)
+        return await runBatchAsync(send, userMessage, maxConcurrency=maxConcurrency)
+
+    def sendMessageStream(self, userMessage, expectsOutputParser=None, outputDefinition = None):
+        """
+        Streams the reply to a single message as StreamChunk events. The last event has
+        done=True and carries the full text, the parsed result and the token usage.
+        Tool calling is not available in streaming mode.
+        """
+        if self.client is None:
+            self.client = clientPool.openaiClient(self.apiKey, self.baseUrl)
+
+        iso1model, _, _, expectsOutputParser = self._prepareCall([], expectsOutputParser)
+        completion_params = self._buildCompletionParams(
+            userMessage, None, iso1model, None, None, expectsOutputParser)
+
+        parts = []
+        usage = None
+        started, firstTokenAt = time.perf_counter(), None
+        for chunk in self._createCompletion(
+                {**completion_params, "stream": True, "stream_options": {"include_usage": True}}):
+            if chunk.choices and chunk.choices[0].delta.content:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                parts.append(chunk.choices[0].delta.content)
+                yield StreamChunk(chunk.choices[0].delta.content)
+            if chunk.usage is not None:
+                usage = chunk.usage
+        self._emitCall(started, openaiUsage(usage), operation="stream", firstTokenAt=firstTokenAt)
+        fullText = "".join(parts)
+        yield StreamChunk(done=True, fullText=fullText,
+                          result=self._parseContent(fullText, expectsOutputParser, outputDefinition),
+                          usage=openaiUsage(usage))
+
+    async def asendMessageStream(self, userMessage, expectsOutputParser=None, outputDefinition = None):
+        """
+        Async iterator version of sendMessageStream built on AsyncOpenAI.
+        """
+        iso1model, _, _, expectsOutputParser = self._prepareCall([], expectsOutputParser)
+        completion_params = self._buildCompletionParams(
+            userMessage, None, iso1model, None, None, expectsOutputParser)
 
+        parts = []
+        usage = None
+        started, firstTokenAt = time.perf_counter(), None
+        async for chunk in await self._acreateCompletion(
+                {**completion_params, "stream": True, "stream_options": {"include_usage": True}}):
+            if chunk.choices and chunk.choices[0].delta.content:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                parts.append(chunk.choices[0].delta.content)
+                yield StreamChunk(chunk.choices[0].delta.content)
+            if chunk.usage is not None:
+                usage = chunk.usage
+        self._emitCall(started, openaiUsage(usage), operation="stream", firstTokenAt=firstTokenAt)
+        fullText = "".join(parts)
+        yield StreamChunk(done=True, fullText=fullText,
+                          result=self._parseContent(fullText, expectsOutputParser, outputDefinition),
+                          usage=openaiUsage(usage))
+
+    def sendMessageRecords(self, userMessage, outputDefinition = None):
+        """
+        Streams a JSON reply holding a list of records (e.g. {"items": [...]}, as json_object
+        mode only allows objects; the system message should ask for it) and yields each record,
+        repaired against outputDefinition, as soon as its closing brace arrives.
+        """
+        if self.client is None:
+            self.client = clientPool.openaiClient(self.apiKey, self.baseUrl)
+
+        iso1model, _, _, _ = self._prepareCall([], True)
+        completion_params = self._buildCompletionParams(userMessage, None, iso1model, None, None, True)
+        parser = StreamingJsonListParser(outputDefinition if outputDefinition is not None else self.outputDefinition)
+        started, firstTokenAt, usage = time.perf_counter(), None, None
+        for chunk in self._createCompletion(
+                {**completion_params, "stream": True, "stream_options": {"include_usage": True}}):
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                yield from parser.feed(chunk.choices[0].delta.content)
+        self._emitCall(started, openaiUsage(usage), operation="records", firstTokenAt=firstTokenAt)
+        yield from parser.close()
+
+    async def asendMessageRecords(self, userMessage, outputDefinition = None):
+        """
+        Async iterator version of sendMessageRecords built on AsyncOpenAI.
+        """
+        iso1model, _, _, _ = self._prepareCall([], True)
+        completion_params = self._buildCompletionParams(userMessage, None, iso1model, None, None, True)
+        parser = StreamingJsonListParser(outputDefinition if outputDefinition is not None else self.outputDefinition)
+        started, firstTokenAt, usage = time.perf_counter(), None, None
+        async for chunk in await self._acreateCompletion(
+                {**completion_params, "stream": True, "stream_options": {"include_usage": True}}):
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                for record in parser.feed(chunk.choices[0].delta.content):
+                    yield record
+        self._emitCall(started, openaiUsage(usage), operation="records", firstTokenAt=firstTokenAt)
+        for record in parser.close():
+            yield record
+
+    def _prepareCall(self, tools, expectsOutputParser, callPlan=None):
         # o1 model doesn't support system message, tool and json mode.
         iso1model = False
         if self.modelName in ["o1-preview", "o1-mini"]:
             iso1model = True
 
+        if callPlan is not None:
+            tools = callPlan.tools
         if tools is None:
             tools = self.tools
         # Add tool functions if provided
+        schemas = None
         if tools and not iso1model:
             if not isinstance(tools, list):
                 tools = [tools]
-            schemas = []
-            for tool in tools:
-                schemas.append({"type": "function",
-                                "function": get_function_schema(tool)})
+            # Cached per tool list, so the schemas are not re-inspected on every call.
+            schemas = (callPlan if callPlan is not None else compileCallPlan(tools=tools)).openaiToolSchemas
 
-        if type(userMessage) == str:
-            isSingleMessage = True
-            userMessage = [userMessage]
+        if expectsOutputParser is None:
+            expectsOutputParser = self.expectsOutputParser
+        return iso1model, tools, schemas, expectsOutputParser
+
+    def _buildCompletionParams(self, currentUserMessage, FunctionCallMessages, iso1model, tools, schemas, expectsOutputParser):
+        # Construct the message for the model
+        if FunctionCallMessages is not None:
+            # The tool loop appends to the list, the caller's one is left as it was.
+            messages = list(FunctionCallMessages)
         else:
-            isSingleMessage = False
-        responses = []
-        for currentUserMessage in userMessage:
-            # Construct the message for the model
-            if FunctionCallMessages is not None:
-                messages = FunctionCallMessages
+            if iso1model:
+                messages = [
+                    {"role": "user", "content": currentUserMessage}
+                ]
             else:
-                if iso1model:
-                    messages = [
-                        {"role": "user", "content": currentUserMessage}
-                    ]
-                else:
-                    messages = [
-                        {"role": "system", "content": self.systemMessage},
-                        {"role": "user", "content": currentUserMessage}
-                    ]
-
-            # Build the API parameters
-            completion_params = {
-                "model": self.modelName,
-                "messages": messages,
-            }
-            
-            # Add tool functions if provided
-            if tools and not iso1model:
-                completion_params["tools"] = schemas
-                #completion_params["tool_choice"] = "auto"
-
-            if expectsOutputParser is None:
-                expectsOutputParser = self.expectsOutputParser
-            # Request JSON response format if expectsOutputParser is True
-            if expectsOutputParser and not iso1model:
-                completion_params["response_format"] = {"type": "json_object"}
-
-            # Make the API call
-            try:
-                responseRaw = self.client.chat.completions.create(**completion_params)
-            except Exception as e:
-                print(f"Error: {e}")
-                return str(e)
-
-            if responseRaw.choices[0].finish_reason == "tool_calls":
-                tool_call = responseRaw.choices[0].message.tool_calls[0]
-                functionName = tool_call.function.name
-                arguments = json.loads(tool_call.function.arguments)
-                for func in tools:
-                    if func.__name__ == functionName:
-                        functionToUse = func
-                        break
-                print(f"Calling function: {functionName}.")
-                responseFunction = functionToUse(**arguments)
-
-                function_call_input_message = {
-                    "role": "assistant",
-                    "tool_calls": [
-                        {'id': tool_call.id,
-                        'function': {
-                            'arguments': tool_call.function.arguments,
-                            'name': tool_call.function.name
-                        },
-                        'type': tool_call.type}
-                        ]}
-
-                function_call_result_message = {
-                    "role": "tool",
-                    "content": json.dumps(
-                        arguments | {functionName+'_result': responseFunction}),
-                    "tool_call_id": tool_call.id
-                }
-
-                completion_params['messages'].append(function_call_input_message)
-                completion_params['messages'].append(function_call_result_message)
-
-                if ((len(completion_params['messages'])-2)/2) > (len(tools)*3):
-                #This means that all the functions were called 3 times each
-                    print("Exiting function calling, found infinite loop on calling the function!!!")
-                    return responseRaw
-                
-                responseRaw = self.sendMessage("", 
-                                            expectsOutputParser = expectsOutputParser,
-                                            outputDefinition = outputDefinition,
-                                            tools = tools,
-                                            FunctionCallMessages = completion_params['messages'])
-
-            if FunctionCallMessages is not None:
-                return responseRaw
-
-            response = responseRaw.choices[0].message.content
-
-            if expectsOutputParser:
-                if outputDefinition is None:
-                    outputDefinition = self.outputDefinition
-                parser = JsonOutputParser()
-                response = parser.parseOutput(response, outputDefinition)
-            responses.append(response)
-
-        if isSingleMessage:
-            return responses[0]
-        return responses
+                messages = [
+                    {"role": "system", "content": self.systemMessage},
+                    {"role": "user", "content": currentUserMessage}
+                ]
+
+        # Build the API parameters
+        completion_params = {
+            "model": self.modelName,
+            "messages": messages,
+        }
+        
+        # Add tool functions if provided
+        if tools and not iso1model:
+            completion_params["tools"] = schemas
+            #completion_params["tool_choice"] = "auto"
+
+        # Request JSON response format if expectsOutputParser is True
+        if expectsOutputParser and not iso1model:
+            completion_params["response_format"] = {"type": "json_object"}
+        return completion_params
+
+    def _createCompletion(self, completion_params):
+        """Runs a completion request, through the scheduler when set. Non-streamed calls are reported to self.metrics."""
+        started = time.perf_counter()
+        record = {"retries": 0}
+        try:
+            if self.scheduler is None:
+                response = self.client.chat.completions.create(**completion_params)
+            else:
+                # The scheduler owns retries, the client must not retry on its own as well.
+                client = self.client.with_options(max_retries=0)
+                response = self.scheduler.call(
+                    lambda params: client.chat.completions.create(**params), completion_params, record)
+        except Exception as e:
+            self._emitCall(started, retries=record["retries"], error=repr(e))
+            raise
+        if not completion_params.get("stream"):
+            self._emitCall(started, openaiUsage(response.usage), retries=record["retries"])
+        return response
+
+    async def _acreateCompletion(self, completion_params):
+        started = time.perf_counter()
+        record = {"retries": 0}
+        try:
+            if self.scheduler is None:
+                response = await self.asyncClient.chat.completions.create(**completion_params)
+            else:
+                client = self.asyncClient.with_options(max_retries=0)
+                response = await self.scheduler.acall(
+                    lambda params: client.chat.completions.create(**params), completion_params, record)
+        except Exception as e:
+            self._emitCall(started, retries=record["retries"], error=repr(e))
+            raise
+        if not completion_params.get("stream"):
+            self._emitCall(started, openaiUsage(response.usage), retries=record["retries"])
+        return response
+
+    def _emitCall(self, started, usage=None, operation="chat", **fields):
+        if self.metrics is not None:
+            self.metrics.emit(usageEvent("openai", self.modelName, operation, started, usage, **fields))
+
+    def _cacheKey(self, completion_params, FunctionCallMessages):
+        # Only top-level requests are cached; tool-calling rounds depend on tool results.
+        if self.responseCache is None or FunctionCallMessages is not None:
+            return None
+        return self.responseCache.makeKey({"backend": "openai", **completion_params})
+
+    def _cacheStore(self, cacheKey, responseRaw):
+        # A tool call is not an answer, only final replies are stored.
+        if cacheKey is not None and responseRaw.choices[0].finish_reason != "tool_calls":
+            self.responseCache.put(cacheKey, responseRaw.choices[0].message.content)
+
+    def _resolveToolCalls(self, responseRaw, tools):
+        """Every tool call of the reply as (name, arguments) pairs."""
+        calls = []
+        dispatch = compileCallPlan(tools=tools).dispatch
+        for tool_call in responseRaw.choices[0].message.tool_calls:
+            functionName = tool_call.function.name
+            if functionName not in dispatch:
+                raise ValueError(f"Function {functionName} not found")
+            print(f"Calling function: {functionName}.")
+            calls.append((functionName, json.loads(tool_call.function.arguments)))
+        return calls
+
+    def _checkToolBudget(self, completion_params, responseRaw, budget):
+        """
+        When the tool budget is exhausted, answers the pending tool calls with a notice that
+        they were not run and asks for a final answer without tools.
+        Returns True when the caller should request that answer.
+        """
+        if not budget.exhausted:
+            return False
+        if completion_params.get("tool_choice") == "none":
+            raise RuntimeError("The model kept calling tools after the tool budget was exhausted.")
+        tool_calls = responseRaw.choices[0].message.tool_calls
+        self._appendToolMessages(
+            completion_params, responseRaw,
+            [(tool_call.function.name, {}) for tool_call in tool_calls],
+            ["Not run: the tool budget is exhausted, answer with the results you have."] * len(tool_calls))
+        completion_params["tool_choice"] = "none"
+        return True
+
+    def _appendToolMessages(self, completion_params, responseRaw, calls, results):
+        """Appends the assistant's tool calls and all their results, for one more round-trip."""
+        tool_calls = responseRaw.choices[0].message.tool_calls
+        completion_params['messages'].append({
+            "role": "assistant",
+            "tool_calls": [
+                {'id': tool_call.id,
+                'function': {
+                    'arguments': tool_call.function.arguments,
+                    'name': tool_call.function.name
+                },
+                'type': tool_call.type}
+                for tool_call in tool_calls]})
+
+        for tool_call, (functionName, arguments), result in zip(tool_calls, calls, results):
+            completion_params['messages'].append({
+                "role": "tool",
+                "content": json.dumps(
+                    arguments | {functionName+'_result': result}),
+                "tool_call_id": tool_call.id
+            })
+
+    def _parseResponse(self, responseRaw, expectsOutputParser, outputDefinition):
+        return self._parseContent(responseRaw.choices[0].message.content, expectsOutputParser, outputDefinition)
+
+    def _parseContent(self, response, expectsOutputParser, outputDefinition):
+        if expectsOutputParser:
+            if outputDefinition is None:
+                outputDefinition = self.outputDefinition
+            parser = JsonOutputParser()
+            response = parser.parseOutput(response, outputDefinition)
+        return response
 
 
 
@@ -1,4 +1,14 @@
+import asyncio
+import itertools
 import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from Auxiliars.CallPlan import compileCallPlan
+from Auxiliars.ToolCache import toolCacheStats
+from Auxiliars.Metrics import callContext
+from Auxiliars.BackendRegistry import resolveBackend
 
 class LLMModelManager:
     def __init__(self, 
@@ -10,7 +20,19 @@ class LLMModelManager:
                  outputDefinition = None,
                  conversation_mode=False,
                  assistantFormat=True,
-                 LLMType = "Ollama"):
+                 LLMType = "Ollama",
+                 maxWorkers = 4,
+                 maxStoredResults = 1000,
+                 responseCache = None,
+                 historyPolicy = None,
+                 endpointPool = None,
+                 scheduler = None,
+                 maxToolSteps = 8,
+                 toolTimeBudget = None,
+                 metrics = None,
+                 lifecycle = None,
+                 keepAlive = None,
+                 warmUp = None):
         self.modelName = modelName
         self.apiKey = apiKey
         self.tools = tools if tools else []
@@ -19,118 +41,299 @@ class LLMModelManager:
         self.outputDefinition = outputDefinition
         self.conversation_mode = conversation_mode
         self.assistantFormat = assistantFormat
+        # Optional Auxiliars.ResponseCache.ResponseCache memoizing identical requests.
+        self.responseCache = responseCache
+        # Optional Auxiliars.HistoryPolicy.HistoryPolicy bounding the conversation history.
+        self.historyPolicy = historyPolicy
+        # Optional Auxiliars.EndpointPool spreading Ollama requests over several servers.
+        self.endpointPool = endpointPool
+        # Optional Auxiliars.RateLimiter.RateLimitScheduler pacing and retrying ChatGPT calls.
+        self.scheduler = scheduler
+        # Budget of the tool calling loop: tool rounds and seconds before a final answer is forced.
+        self.maxToolSteps = maxToolSteps
+        self.toolTimeBudget = toolTimeBudget
+        # Optional Auxiliars.Metrics.MetricsHub receiving a CallEvent for every backend call.
+        self.metrics = metrics
+        # Ollama only: Ollama.OllamaModelLifecycle.ModelLifecycle (defaults to the shared one of
+        # the endpoint) and the keep_alive sent with the requests ("5m", seconds, -1 forever).
+        self.lifecycle = lifecycle
+        self.keepAlive = keepAlive
 
         self.LLMType = LLMType
  
-        if self.LLMType == "Ollama":
-            if self.conversation_mode:
-                from Ollama.OllamaConversationModel import OllamaConversationLLMModel
-                self.model = OllamaConversationLLMModel()
-            else:
-                from Ollama.OllamaModel import OllamaLLMModel
-                self.model = OllamaLLMModel()
-        elif self.LLMType == "ChatGPT":
-            if self.conversation_mode:
-                #from ChatGPT.OllamaConversationModel import OllamaConversationLLMModel
-                #self.model = OllamaConversationLLMModel()
-                pass
-            else:
-                from ChatGPT.ChatGPTModel import ChatGPTModel
-                self.model = ChatGPTModel()
-                self.model.apiKey = self.apiKey
+        # Only the selected backend module (and its client library) is imported.
+        self.model = resolveBackend(self.LLMType, bool(self.conversation_mode))()
+        if hasattr(self.model, 'apiKey'):
+            self.model.apiKey = self.apiKey
 
         self.setParameters()
+        if self.conversation_mode and hasattr(self.model, 'historyPolicy'):
+            self.model.historyPolicy = self.historyPolicy
+        if self.endpointPool is not None and hasattr(self.model, 'endpointPool'):
+            self.model.endpointPool = self.endpointPool
+        if self.scheduler is not None and hasattr(self.model, 'scheduler'):
+            self.model.scheduler = self.scheduler
+        if hasattr(self.model, 'lifecycle'):
+            if self.lifecycle is None:
+                from Ollama.OllamaModelLifecycle import ModelLifecycle, modelLifecycle
+                self.lifecycle = (ModelLifecycle(endpointPool=self.endpointPool, metrics=self.metrics)
+                                  if self.endpointPool is not None else modelLifecycle(self.model.apiEndpoint))
+            self.model.lifecycle = self.lifecycle
 
-        # Dictionary to store responses from asynchronous calls, keyed by id.
-        self.response = None
-        self.processing = False
+        # Set by startWarmUp(); requests wait for it so none is sent while the model is pulled.
+        # Ollama models are warmed up at construction unless warmUp=False.
+        self.warmUpFuture = None
+        if warmUp is None:
+            warmUp = self.lifecycle is not None and bool(self.modelName)
+        if warmUp:
+            self.startWarmUp()
+
+        # Job queue for asynchronous calls. Finished results wait in
+        # self.results, keyed by job id, until claimed or evicted.
+        self.maxWorkers = maxWorkers
+        self.maxStoredResults = maxStoredResults
+        self.executor = None
+        self.pendingJobs = {}
+        self.results = OrderedDict()
+        self.jobCounter = itertools.count(1)
         self.lock = threading.Lock()
+        # Conversation models share one history, so their turns must not overlap.
+        self.conversationLock = threading.Lock()
 
     def setParameters(self):
-        #if self.LLMType == "Ollama":
-        #    from Ollama.OllamaPullModel import pull_model
-        #    pull_model(self.modelName)
         self.model.modelName = self.modelName
         self.model.systemMessage = self.systemMessage
+        self.model.responseCache = self.responseCache
+        self.model.metrics = self.metrics
+        if hasattr(self.model, 'maxToolSteps'):
+            self.model.maxToolSteps = self.maxToolSteps
+            self.model.toolTimeBudget = self.toolTimeBudget
+        if hasattr(self.model, 'keepAlive'):
+            self.model.keepAlive = self.keepAlive
 
-    def _send_message_thread(self, message, expectsOutputParser, outputDefinition, tools, assistantFormat):
+    def startWarmUp(self, onProgress=None):
         """
-        Worker function that calls the blocking sendMessage method and stores the result.
+        Pulls the model if it is missing and loads it with an empty request, in a background
+        thread, so the first request doesn't pay for the download or the model load. Ollama only.
+
+        :param onProgress: (Optional) Pull progress callback, onProgress(model, status, completed, total).
+        :return: A Future (also self.warmUpFuture) resolved with the seconds the load took.
         """
+        if self.lifecycle is None:
+            raise ValueError(f"Warm-up is not supported by the {self.LLMType} backend.")
+        future = Future()
+
+        def run():
+            try:
+                self.lifecycle.ensure([self.modelName], onProgress)
+                future.set_result(self.lifecycle.warm(self.modelName, self.keepAlive))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.warmUpFuture = future
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def _awaitWarmUp(self):
+        # Requests wait for a running warm-up, so none is sent while the model is pulled.
+        # Its errors are left to surface through the request itself.
+        warmUp = self.warmUpFuture
+        if warmUp is not None and not warmUp.done():
+            wait([warmUp])
+
+    async def _aawaitWarmUp(self):
+        warmUp = self.warmUpFuture
+        if warmUp is not None and not warmUp.done():
+            await asyncio.wait([asyncio.wrap_future(warmUp)])
+
+    def _callModel(self, message, expectsOutputParser, outputDefinition, tools, assistantFormat, callPlan=None,
+                   submittedAt=None):
+        """
+        Calls the blocking sendMessage method of the backend with the arguments it supports.
+        Jobs from submit() pass submittedAt, so their CallEvents carry the time spent queued.
+        """
+        if submittedAt is not None:
+            with callContext(queueWait=time.perf_counter() - submittedAt):
+                return self._callModel(message, expectsOutputParser, outputDefinition, tools, assistantFormat, callPlan)
+        self._awaitWarmUp()
         if self.conversation_mode:
-            response = self.model.sendMessage(
-                message,
-                expectsOutputParser=expectsOutputParser,
-                outputDefinition=outputDefinition,
-                tools=tools
-            )
-        else:
-            response = self.model.sendMessage(
+            with self.conversationLock:
+                return self.model.sendMessage(
+                    message,
+                    expectsOutputParser=expectsOutputParser,
+                    outputDefinition=outputDefinition,
+                    tools=tools
+                )
+        if self.LLMType == "Ollama":
+            return self.model.sendMessage(
                 message,
                 expectsOutputParser=expectsOutputParser,
                 outputDefinition=outputDefinition,
                 tools=tools,
-                assistantFormat=assistantFormat
+                assistantFormat=assistantFormat,
+                **self._planArguments(callPlan)
             )
-        with self.lock:
-            self.response = response
+        return self.model.sendMessage(
+            message,
+            expectsOutputParser=expectsOutputParser,
+            outputDefinition=outputDefinition,
+            tools=tools,
+            **self._planArguments(callPlan)
+        )
 
-    def sendMessageAsync(self, message, expectsOutputParser=None, outputDefinition=None, tools=None, assistantFormat=None):
+    def submit(self, message, expectsOutputParser=None, outputDefinition=None, tools=None, assistantFormat=None, callback=None, callPlan=None):
         """
-        Initiates an asynchronous sendMessage call using a separate thread.
-        The response is stored internally and can later be retrieved with getResponse(id).
+        Queues a sendMessage call on the manager's worker pool.
 
-        :param id: A unique identifier for this asynchronous call.
         :param message: The message to send.
         :param expectsOutputParser: (Optional) Override for expectsOutputParser.
         :param outputDefinition: (Optional) Override for outputDefinition.
         :param tools: (Optional) Override for tools.
+        :param assistantFormat: (Optional) Override for assistantFormat.
+        :param callback: (Optional) Called with the finished Future. Results delivered
+                         to a callback are not kept for getResponse.
+        :param callPlan: (Optional) Plan from compile(), replacing outputDefinition and tools.
+        :return: A concurrent.futures.Future; its jobId attribute identifies the job.
         """
-        
-        if self.processing:
-            return None
-
         if self.model.modelName == None or self.model.modelName == "":
             self.setParameters()
+        if callPlan is not None:
+            expectsOutputParser, outputDefinition, tools = self._unpackCallPlan(callPlan)
             
         expectsOutputParser = expectsOutputParser if expectsOutputParser is not None else self.expectsOutputParser
         outputDefinition = outputDefinition if outputDefinition is not None else self.outputDefinition
         tools = tools if tools is not None else self.tools
         assistantFormat = assistantFormat if assistantFormat is not None else self.assistantFormat
 
-        # # Clear any previous response.
-        # with self.lock:
-        #     self.response = None
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+            jobId = next(self.jobCounter)
+            future = self.executor.submit(
+                self._callModel, message, expectsOutputParser, outputDefinition, tools, assistantFormat,
+                callPlan, time.perf_counter())
+            future.jobId = jobId
+            self.pendingJobs[jobId] = future
+        future.add_done_callback(lambda f: self._finishJob(f, callback))
+        return future
 
-        thread = threading.Thread(
-            target=self._send_message_thread, 
-            args=(message, expectsOutputParser, outputDefinition, tools, assistantFormat)
-        )
-        self.processing = True
-        thread.start()
+    def _finishJob(self, future, callback):
+        with self.lock:
+            self.pendingJobs.pop(future.jobId, None)
+            # Results already claimed by waitResponse are not stored again.
+            if callback is None and not getattr(future, 'claimed', False):
+                self.results[future.jobId] = future
+                # Bounded store: the oldest unclaimed results are dropped first.
+                while len(self.results) > self.maxStoredResults:
+                    self.results.popitem(last=False)
+        if callback is not None:
+            callback(future)
+
+    def sendMessageAsync(self, message, expectsOutputParser=None, outputDefinition=None, tools=None, assistantFormat=None):
+        """
+        Initiates an asynchronous sendMessage call on the worker pool.
+        The response is stored internally and can later be retrieved with getResponse(id).
+
+        :param message: The message to send.
+        :param expectsOutputParser: (Optional) Override for expectsOutputParser.
+        :param outputDefinition: (Optional) Override for outputDefinition.
+        :param tools: (Optional) Override for tools.
+        :return: A unique identifier for this asynchronous call.
+        """
+        return self.submit(message, expectsOutputParser, outputDefinition, tools, assistantFormat).jobId
+
+    @property
+    def processing(self):
+        """True while any submitted job is still running or queued."""
+        with self.lock:
+            return len(self.pendingJobs) > 0
 
-    def getResponse(self):
+    def jobStatus(self, id):
+        """
+        :return: "pending", "done" (result waiting to be claimed) or None for unknown,
+                 claimed or evicted jobs.
+        """
+        with self.lock:
+            if id in self.pendingJobs:
+                return "pending"
+            if id in self.results:
+                return "done"
+        return None
+
+    def getResponse(self, id=None):
         """
         Retrieves the response for the given id if available; otherwise, returns None.
-        Once retrieved, the response is removed from storage.
+        Once retrieved, the response is removed from storage. If the call raised,
+        the exception is re-raised here.
 
-        :param id: The unique identifier for the asynchronous call.
+        :param id: The unique identifier for the asynchronous call. When omitted, the
+                   oldest finished response is returned.
         :return: The response from the sendMessage call or None if not yet available.
         """
         with self.lock:
-            currentResponse = self.response
-            if self.response != None:
-                self.processing = False
-            self.response = None
-        return currentResponse
+            if id is None:
+                if not self.results:
+                    return None
+                _, future = self.results.popitem(last=False)
+            else:
+                future = self.results.pop(id, None)
+                if future is None:
+                    return None
+        return future.result()
+
+    def waitResponse(self, id, timeout=None):
+        """
+        Blocks until the given job finishes and returns its response, removing it from storage.
+
+        :param id: The unique identifier for the asynchronous call.
+        :param timeout: (Optional) Seconds to wait before raising concurrent.futures.TimeoutError.
+        :return: The response, or None if the id is unknown or was already claimed/evicted.
+        """
+        with self.lock:
+            future = self.pendingJobs.get(id) or self.results.get(id)
+        if future is None:
+            return None
+        # The waiters of a future wake up before its done callbacks run, so _finishJob may
+        # not have stored it yet: claim this future directly instead of going through getResponse.
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            if future.done():
+                with self.lock:
+                    future.claimed = True
+                    self.pendingJobs.pop(id, None)
+                    self.results.pop(id, None)
+
+    def shutdown(self, wait=True):
+        """Stops the worker pool. Queued jobs still run when wait is True."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
 
     def sendMessage(self, 
                     userMessage, 
                     expectsOutputParser=None, 
                     outputDefinition = None, 
-                    tools = None):
+                    tools = None,
+                    onToken = None,
+                    callPlan = None,
+                    maxConcurrency = 1):
+        """
+        Sends a message (or a list of messages) and returns the response.
+
+        :param onToken: (Optional) Streams the reply of a single message, calling onToken(text)
+                        with every new piece of text before the full response is returned.
+                        Not available with tools.
+        :param callPlan: (Optional) Plan from compile(), replacing outputDefinition and tools.
+        :param maxConcurrency: Requests kept in flight for a list of messages (ignored in
+                               conversation mode). Failed items hold a BatchItemError.
+        """
         if self.model.modelName == None or self.model.modelName == "":
             self.setParameters()
+        self._awaitWarmUp()
+        if callPlan is not None:
+            expectsOutputParser, outputDefinition, tools = self._unpackCallPlan(callPlan)
         
         if expectsOutputParser == None:
             expectsOutputParser = self.expectsOutputParser
@@ -139,15 +342,209 @@ class LLMModelManager:
         if tools == None:
             tools = self.tools
 
+        if onToken is not None:
+            self._checkStreamable(userMessage, tools)
+            with self.conversationLock if self.conversation_mode else nullcontext():
+                for chunk in self.model.sendMessageStream(
+                        userMessage, expectsOutputParser=expectsOutputParser, outputDefinition=outputDefinition):
+                    if chunk.done:
+                        return chunk.result
+                    onToken(chunk.text)
+            raise RuntimeError("The reply stream ended without its final chunk.")
+
+        if self.conversation_mode:
+            with self.conversationLock:
+                return self.model.sendMessage(
+                    userMessage,
+                    expectsOutputParser=expectsOutputParser,
+                    outputDefinition=outputDefinition,
+                    tools=tools
+                )
         response = self.model.sendMessage(
             userMessage,
             expectsOutputParser=expectsOutputParser,
             outputDefinition=outputDefinition,
-            tools=tools
+            tools=tools,
+            maxConcurrency=maxConcurrency,
+            **self._planArguments(callPlan)
         )
 
         return response
 
+    def sendMessageBulk(self, userMessages, workDirectory, expectsOutputParser=None, outputDefinition=None,
+                        pollInterval=60.0, onProgress=None):
+        """
+        Offline bulk mode of the ChatGPT backend: the messages go through the OpenAI Batch API
+        and the call blocks until every result is in. Resumable with the same workDirectory.
+
+        :param workDirectory: Directory for the batch files and the job state.
+        :param onProgress: (Optional) onProgress(finishedBatches, totalBatches) after each status check.
+        :return: One response per message; failed items hold a BatchItemError.
+        """
+        if not hasattr(self.model, 'sendMessageBulk'):
+            raise ValueError("Bulk mode is only available with the ChatGPT backend.")
+        if self.model.modelName == None or self.model.modelName == "":
+            self.setParameters()
+        self._awaitWarmUp()
+        return self.model.sendMessageBulk(
+            userMessages,
+            workDirectory,
+            expectsOutputParser=expectsOutputParser if expectsOutputParser is not None else self.expectsOutputParser,
+            outputDefinition=outputDefinition if outputDefinition is not None else self.outputDefinition,
+            pollInterval=pollInterval,
+            onProgress=onProgress
+        )
+
+    async def asendMessage(self,
+                           userMessage,
+                           expectsOutputParser=None,
+                           outputDefinition = None,
+                           tools = None,
+                           maxConcurrency = 1,
+                           onToken = None,
+                           callPlan = None):
+        """
+        Native asyncio version of sendMessage, for callers already running an event loop.
+        A list of messages is fanned out as coroutines with at most maxConcurrency in flight
+        (ignored in conversation mode, where turns are sequential by nature).
+        onToken and callPlan work as in sendMessage.
+        """
+        if self.model.modelName == None or self.model.modelName == "":
+            self.setParameters()
+        await self._aawaitWarmUp()
+        if callPlan is not None:
+            expectsOutputParser, outputDefinition, tools = self._unpackCallPlan(callPlan)
+
+        if expectsOutputParser == None:
+            expectsOutputParser = self.expectsOutputParser
+        if outputDefinition == None:
+            outputDefinition = self.outputDefinition
+        if tools == None:
+            tools = self.tools
+
+        if onToken is not None:
+            self._checkStreamable(userMessage, tools)
+            async for chunk in self.model.asendMessageStream(
+                    userMessage, expectsOutputParser=expectsOutputParser, outputDefinition=outputDefinition):
+                if chunk.done:
+                    return chunk.result
+                onToken(chunk.text)
+            raise RuntimeError("The reply stream ended without its final chunk.")
+
+        if self.conversation_mode:
+            return await self.model.asendMessage(
+                userMessage,
+                expectsOutputParser=expectsOutputParser,
+                outputDefinition=outputDefinition,
+                tools=tools
+            )
+        return await self.model.asendMessage(
+            userMessage,
+            expectsOutputParser=expectsOutputParser,
+            outputDefinition=outputDefinition,
+            tools=tools,
+            maxConcurrency=maxConcurrency,
+            **self._planArguments(callPlan)
+        )
+
+    def sendMessageStream(self, userMessage, expectsOutputParser=None, outputDefinition=None):
+        """
+        Streams the reply to a single message as StreamChunk events; the last one has
+        done=True and carries the full text, the parsed result and usage stats.
+        In conversation mode the reply is added to the history when the stream ends.
+        """
+        if self.model.modelName == None or self.model.modelName == "":
+            self.setParameters()
+        self._awaitWarmUp()
+        return self.model.sendMessageStream(
+            userMessage,
+            expectsOutputParser=expectsOutputParser if expectsOutputParser is not None else self.expectsOutputParser,
+            outputDefinition=outputDefinition if outputDefinition is not None else self.outputDefinition
+        )
+
+    async def asendMessageStream(self, userMessage, expectsOutputParser=None, outputDefinition=None):
+        """
+        Async iterator version of sendMessageStream.
+        """
+        if self.model.modelName == None or self.model.modelName == "":
+            self.setParameters()
+        await self._aawaitWarmUp()
+        async for chunk in self.model.asendMessageStream(
+            userMessage,
+            expectsOutputParser=expectsOutputParser if expectsOutputParser is not None else self.expectsOutputParser,
+            outputDefinition=outputDefinition if outputDefinition is not None else self.outputDefinition
+        ):
+            yield chunk
+
+    def streamRecords(self, userMessage, outputDefinition=None):
+        """
+        Asks for a list of outputDefinition records and yields each one, repaired like
+        JsonOutputParser does, as soon as it is complete in the streamed reply.
+        """
+        self._checkRecordStreamable()
+        self._awaitWarmUp()
+        return self.model.sendMessageRecords(
+            userMessage,
+            outputDefinition=outputDefinition if outputDefinition is not None else self.outputDefinition
+        )
+
+    async def astreamRecords(self, userMessage, outputDefinition=None):
+        """
+        Async iterator version of streamRecords.
+        """
+        self._checkRecordStreamable()
+        await self._aawaitWarmUp()
+        async for record in self.model.asendMessageRecords(
+            userMessage,
+            outputDefinition=outputDefinition if outputDefinition is not None else self.outputDefinition
+        ):
+            yield record
+
+    def _checkRecordStreamable(self):
+        if self.conversation_mode:
+            raise ValueError("Record streaming is not available in conversation mode.")
+        if self.model.modelName == None or self.model.modelName == "":
+            self.setParameters()
+
+    def _checkStreamable(self, userMessage, tools):
+        if isinstance(userMessage, list):
+            raise ValueError("Streaming works on a single message, not a list.")
+        if tools:
+            raise ValueError("Streaming is not available with tools.")
+
+    def compile(self, outputDefinition=None, tools=None):
+        """
+        Precompiles the artifacts of a call (output model and JSON schema, tool schemas,
+        tool system prompt and dispatch table) into a reusable CallPlan. Pass it as
+        callPlan= to sendMessage, asendMessage or submit.
+
+        :param outputDefinition: (Optional) {"name": (type, default)} of the structured output.
+        :param tools: (Optional) Tool functions.
+        :return: The cached CallPlan.
+        """
+        return compileCallPlan(outputDefinition=outputDefinition, tools=tools, systemMessage=self.systemMessage)
+
+    def _unpackCallPlan(self, callPlan):
+        return callPlan.outputDefinition is not None, callPlan.outputDefinition, callPlan.tools
+
+    def _planArguments(self, callPlan):
+        # The plan itself goes to the backend too, so it reuses the precompiled schemas and
+        # prompts. Conversation models build their own per-turn plan and don't take one.
+        return {"callPlan": callPlan} if callPlan is not None else {}
+
+    def cacheStats(self):
+        """
+        :return: Hit/miss stats of the response cache, or None when no cache is set.
+        """
+        return self.responseCache.stats() if self.responseCache else None
+
+    def toolCacheStats(self, tools=None):
+        """
+        :param tools: (Optional) Tools to report on; defaults to the manager's tools.
+        :return: Hit/miss stats of every tool marked with Auxiliars.ToolCache.cacheableTool, by name.
+        """
+        return toolCacheStats(tools if tools is not None else self.tools)
+
     def addAssistantMessage(self, message):
         self.model.history.append({'role': 'assistant', 'content': message})
 
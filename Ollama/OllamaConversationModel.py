@@ -1,10 +1,17 @@
-from ollama import Client
-from pydantic import BaseModel, create_model
 from typing import Union, List, Dict, Any, Callable
-import inspect
 import json
-
-class OllamaConversationLLMModel:
+import time
+from Ollama.OllamaModel import OllamaLLMModel
+from Auxiliars.Streaming import StreamChunk, ollamaUsage
+from Auxiliars.CallPlan import compileCallPlan
+from Auxiliars.ToolRunner import ToolBudget, runToolCalls, arunToolCalls
+from Auxiliars.HistoryPolicy import HistoryPolicy
+
+class OllamaConversationLLMModel(OllamaLLMModel):
+    """
+    Stateful chat on top of OllamaLLMModel: keeps the running history and reuses
+    the client, schema and tool helpers of the stateless model.
+    """
     def __init__(self, modelName: str = None, systemMessage: str = None, api_endpoint: str = 'http://localhost:11434'):
         super().__init__()
         self.modelName = modelName
@@ -12,17 +19,16 @@ class OllamaConversationLLMModel:
         self.systemMessage = systemMessage
         self.history = []
         self.parametersSet = False
+        # Optional Auxiliars.HistoryPolicy deciding which turns are kept and resent.
+        self.historyPolicy = None
+        # Tool rounds (and seconds) allowed before the model must give a final answer.
+        self.maxToolSteps = 8
+        self.toolTimeBudget = None
 
     def clear_history(self):
         """Reset conversation history while preserving the system message."""
-        system_msg = None
-        for msg in self.history:
-            if msg['role'] == 'system':
-                system_msg = msg
-                break
-        self.history = []
-        if system_msg:
-            self.history.append(system_msg)
+        # A SummarizingPolicy summary is part of the conversation and goes with it.
+        self.history = self.history[:HistoryPolicy.pinnedCount(self.history)]
 
     def setParameters(self):
         if self.systemMessage:
@@ -39,80 +45,177 @@ class OllamaConversationLLMModel:
         """
         Send a user message, manage conversation history, handle tool calls, 
         and return the assistant's response.
+
+        With tools, the model may ask for several calls per round; they run concurrently and
+        all results are added to the history before the next round, until the model answers
+        or maxToolSteps/toolTimeBudget runs out.
+        """
+        messages, plan = self._prepareTurn(userMessage, expectsOutputParser, outputDefinition, tools)
+        if plan.outputModel is None and plan.tools:
+            budget = ToolBudget(self.maxToolSteps, self.toolTimeBudget)
+            while True:
+                step = plan.agentStepModel.model_validate_json(self._chatContent(self._buildTurnRequest(messages, plan)))
+                if not step.tool_calls:
+                    return self._finishTurn(step.answer, None)
+                if budget.exhausted:
+                    return self._finishTurn(self._chatContent(self._finalAnswerRequest()), None)
+                calls = [(call.function, call.arguments) for call in step.tool_calls]
+                self._appendToolInteraction(calls, runToolCalls(plan.dispatch, calls))
+                budget.step()
+                messages = self._turnMessages(plan)
+
+        content = self._chatContent(self._buildTurnRequest(messages, plan))
+        return self._finishTurn(content, plan.outputModel)
+
+    async def asendMessage(
+        self,
+        userMessage: str,
+        expectsOutputParser: bool = False,
+        outputDefinition: Dict = None,
+        tools: List[Callable] = None
+    ) -> Union[str, Dict, Any]:
+        """
+        Async version of sendMessage built on ollama.AsyncClient.
+        """
+        messages, plan = self._prepareTurn(userMessage, expectsOutputParser, outputDefinition, tools)
+        if plan.outputModel is None and plan.tools:
+            budget = ToolBudget(self.maxToolSteps, self.toolTimeBudget)
+            while True:
+                step = plan.agentStepModel.model_validate_json(await self._achatContent(self._buildTurnRequest(messages, plan)))
+                if not step.tool_calls:
+                    return self._finishTurn(step.answer, None)
+                if budget.exhausted:
+                    return self._finishTurn(await self._achatContent(self._finalAnswerRequest()), None)
+                calls = [(call.function, call.arguments) for call in step.tool_calls]
+                self._appendToolInteraction(calls, await arunToolCalls(plan.dispatch, calls))
+                budget.step()
+                messages = self._turnMessages(plan)
+
+        content = await self._achatContent(self._buildTurnRequest(messages, plan))
+        return self._finishTurn(content, plan.outputModel)
+
+    def sendMessageStream(
+        self,
+        userMessage: str,
+        expectsOutputParser: bool = False,
+        outputDefinition: Dict = None
+    ):
+        """
+        Streams the assistant's reply as StreamChunk events. The assembled reply is appended
+        to history when the stream finishes; the last event carries it with usage stats.
+        """
+        messages, plan = self._prepareTurn(userMessage, expectsOutputParser, outputDefinition, None)
+        parts = []
+        started, firstTokenAt = time.perf_counter(), None
+        for part in self.client.chat(**self._buildTurnRequest(messages, plan), stream=True):
+            text = part.message.content or ""
+            if text:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                parts.append(text)
+                yield StreamChunk(text)
+            if part.done:
+                self._emitCall(started, ollamaUsage(part), operation="stream", firstTokenAt=firstTokenAt)
+                fullText = "".join(parts)
+                result = self._finishTurn(fullText, plan.outputModel)
+                yield StreamChunk(done=True, fullText=fullText, result=result, usage=ollamaUsage(part))
+
+    async def asendMessageStream(
+        self,
+        userMessage: str,
+        expectsOutputParser: bool = False,
+        outputDefinition: Dict = None
+    ):
+        """
+        Async iterator version of sendMessageStream built on ollama.AsyncClient.
+        """
+        messages, plan = self._prepareTurn(userMessage, expectsOutputParser, outputDefinition, None)
+        parts = []
+        started, firstTokenAt = time.perf_counter(), None
+        async for part in await self.asyncClient.chat(**self._buildTurnRequest(messages, plan), stream=True):
+            text = part.message.content or ""
+            if text:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                parts.append(text)
+                yield StreamChunk(text)
+            if part.done:
+                self._emitCall(started, ollamaUsage(part), operation="stream", firstTokenAt=firstTokenAt)
+                fullText = "".join(parts)
+                result = self._finishTurn(fullText, plan.outputModel)
+                yield StreamChunk(done=True, fullText=fullText, result=result, usage=ollamaUsage(part))
+
+    def summarizeMessages(self, messages: List[Dict]) -> str:
         """
+        Summarizes part of the conversation with this model, outside of the history.
+        Meant as the summarize callable of Auxiliars.HistoryPolicy.SummarizingPolicy.
+        """
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        request = self._baseRequest([
+            {'role': 'system', 'content': "Summarize the conversation below in a few sentences. "
+                                          "Keep names, facts, decisions and open questions."},
+            {'role': 'user', 'content': transcript},
+        ])
+        return self._chatContent(request)
+
+    def _prepareTurn(self, userMessage, expectsOutputParser, outputDefinition, tools):
         if not self.parametersSet:
             self.setParameters()
             
         if userMessage:
             self.history.append({'role': 'user', 'content': userMessage})
+        if self.historyPolicy is not None:
+            self.history = self.historyPolicy.apply(self.history)
+
+        plan = compileCallPlan(
+            outputDefinition=outputDefinition if expectsOutputParser else None,
+            tools=tools,
+            systemMessage=self.systemMessage)
+        return self._turnMessages(plan), plan
 
+    def _turnMessages(self, plan):
         messages = self.history.copy()
-        final_response = None
-
-        if tools:
-            tool_schemas = [self._generate_tool_schema(func) for func in tools]
-            system_msg = self._build_tool_system_message(tool_schemas)
-            system_indices = [i for i, msg in enumerate(messages) if msg['role'] == 'system']
-            if system_indices:
-                messages[system_indices[0]]['content'] = system_msg
+        if plan.tools:
+            toolPrompt = {'role': 'system', 'content': plan.agentSystemMessage}
+            # Only the pinned system prompt is replaced (with a new dict, the old one is shared
+            # with self.history); a SummarizingPolicy summary keeps its place after the tool prompt.
+            if HistoryPolicy.pinnedCount(messages):
+                messages[0] = toolPrompt
             else:
-                messages.insert(0, {'role': 'system', 'content': system_msg})
-
-        if expectsOutputParser and outputDefinition:
-            DynamicModel = self._create_pydantic_model(outputDefinition)
-            response = self.client.chat(
-                model=self.modelName,
-                messages=messages,
-                format=DynamicModel.model_json_schema()
-            )
-            parsed = DynamicModel.model_validate_json(response.message['content'])
-            final_response = parsed.dict()
-            self.history.append({'role': 'assistant', 'content': json.dumps(final_response)})
-        elif tools:
-            FunctionCallModel = self._create_functioncall_model()
-            response = self.client.chat(
-                model=self.modelName,
-                messages=messages,
-                format=FunctionCallModel.model_json_schema()
-            )
-            func_call = FunctionCallModel.model_validate_json(response.message['content'])
-            
-            # Execute tool
-            try:
-                tool = next(t for t in tools if t.__name__ == func_call.function)
-                result = tool(**func_call.arguments)
-            except StopIteration:
-                raise ValueError(f"Function {func_call.function} not found")
-            except Exception as e:
-                raise RuntimeError(f"Error executing {func_call.function}: {str(e)}")
-
-            # Append tool interaction to history
-            self.history.append({
-                'role': 'assistant',
-                'content': json.dumps({'function': func_call.function, 'arguments': func_call.arguments})
-            })
+                messages.insert(0, toolPrompt)
+        return messages
+
+    def _buildTurnRequest(self, messages, plan):
+        request = self._baseRequest(messages)
+        if plan.outputModel is not None:
+            request['format'] = plan.outputSchema
+        elif plan.tools:
+            request['format'] = plan.agentStepSchema
+        return request
+
+    def _finalAnswerRequest(self):
+        # Same history without the tool prompt and schema, so the model has to answer in text.
+        messages = self.history + [{'role': 'system', 'content': "The tool budget is exhausted. "
+                                                                 "Answer now with the information gathered so far."}]
+        return self._baseRequest(messages)
+
+    def _appendToolInteraction(self, calls, results):
+        # Append the round of tool calls and every result to history
+        self.history.append({
+            'role': 'assistant',
+            'content': json.dumps({'tool_calls': [{'function': name, 'arguments': arguments} for name, arguments in calls]})
+        })
+        for (name, arguments), result in zip(calls, results):
             self.history.append({
                 'role': 'tool',
                 'content': json.dumps(result),
-                'name': func_call.function
+                'name': name
             })
 
-            # Recursively continue conversation
-            return self.sendMessage("", expectsOutputParser=expectsOutputParser, outputDefinition=outputDefinition, tools=tools)
+    def _finishTurn(self, content, DynamicModel):
+        final_response = self._parseContent(content, DynamicModel)
+        if DynamicModel is not None:
+            self.history.append({'role': 'assistant', 'content': json.dumps(final_response)})
         else:
-            response = self.client.chat(
-                model=self.modelName,
-                messages=messages
-            )
-            final_response = response.message['content']
             self.history.append({'role': 'assistant', 'content': final_response})
-
         return final_response
-
-
-
-
-
-
-
-
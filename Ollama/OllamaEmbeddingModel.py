@@ -1,44 +1,77 @@
 import os
-import ollama
-import chromadb
-from chromadb.config import DEFAULT_TENANT, DEFAULT_DATABASE, Settings
-from chromadb import AdminClient
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from Auxiliars.EmbeddingCache import EmbeddingCache
+from Auxiliars.ClientPool import clientPool
+from VectorStores.VectorStore import VectorStore
+from Auxiliars.EndpointPool import EndpointPool
+from Auxiliars.Metrics import MetricsHub, usageEvent
+from Auxiliars.Streaming import ollamaUsage
 
 class OllamaEmbeddingModel:
-    def __init__(self, embedding_model: str, answer_model: str, persist_directory: str = "chromadb", database_name: str = "default"):
+    def __init__(self, embedding_model: str, answer_model: str, persist_directory: str = "chromadb", database_name: str = "default",
+                 batch_size: int = 64, max_concurrency: int = 4, flush_size: int = 1024,
+                 use_embedding_cache: bool = True, cache_max_entries: int = 100_000,
+                 vector_store: VectorStore = None, api_endpoint: str = None,
+                 endpoint_pool: EndpointPool = None, metrics: MetricsHub = None):
         """
         Initialize the embedding model instance.
 
         Args:
             embedding_model (str): Identifier for the Ollama embedding model.
             answer_model (str): Identifier for the Ollama generation model.
-            persist_directory (str): Directory where all Chroma data is persisted.
+            persist_directory (str): Directory where all Chroma data (and the embedding cache) is persisted.
             database_name (str): Name of the database to use (enables multiple isolated databases).
+            batch_size (int): Default number of texts sent per embedding request.
+            max_concurrency (int): Default number of embedding requests kept in flight.
+            flush_size (int): Default number of texts embedded before each write to the vector store.
+            use_embedding_cache (bool): Reuse vectors of texts already embedded with this model,
+                stored in "embedding_cache.sqlite3" inside persist_directory.
+            cache_max_entries (int): Number of cached vectors kept before LRU eviction.
+            vector_store (VectorStore): Storage backend; defaults to a ChromaVectorStore in
+                persist_directory. Use VectorStores.NumpyVectorStore for a fast-opening local index.
+            api_endpoint (str): Ollama server URL; defaults to OLLAMA_HOST or http://localhost:11434.
+                The client is shared with every model using the same endpoint.
+            endpoint_pool (EndpointPool): Spreads embedding and generation requests over several
+                Ollama servers instead of api_endpoint.
+            metrics (MetricsHub): Receives a CallEvent for every embedding and generation request.
         """
         self.embedding_model = embedding_model
         self.answer_model = answer_model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.flush_size = flush_size
+        self.api_endpoint = api_endpoint
+        self.endpoint_pool = endpoint_pool
+        self.metrics = metrics
 
         # Ensure the persist_directory exists.
         os.makedirs(persist_directory, exist_ok=True)
 
-        # Create a Settings object that uses the given persist_directory.
-        admin_settings = Settings(persist_directory=persist_directory, is_persistent=True)
+        if vector_store is None:
+            # Imported here so other backends don't pay for loading chromadb.
+            from VectorStores.ChromaVectorStore import ChromaVectorStore
+            vector_store = ChromaVectorStore(persist_directory, database_name)
+        self.store = vector_store
 
-        # Use AdminClient to ensure the requested database exists.
-        admin_client = AdminClient(admin_settings)
-        try:
-            admin_client.get_database(database_name)
-        except Exception:
-            admin_client.create_database(database_name, DEFAULT_TENANT)
-
-        # Instantiate the PersistentClient using the same persist_directory.
-        self.client = chromadb.PersistentClient(
-            path=persist_directory,
-            settings=admin_settings,
-            tenant=DEFAULT_TENANT,
-            database=database_name,
-        )
-        self.collection = self.client.get_or_create_collection(name="documents")
+        self.embedding_cache = None
+        if use_embedding_cache:
+            self.embedding_cache = EmbeddingCache(
+                os.path.join(persist_directory, "embedding_cache.sqlite3"), maxEntries=cache_max_entries)
+
+    @property
+    def client(self):
+        if self.endpoint_pool is not None:
+            return self.endpoint_pool.client
+        # Looked up on use, so opening a store doesn't import ollama and httpx.
+        return clientPool.ollamaClient(self.api_endpoint)
+
+    @property
+    def collection(self):
+        """The underlying Chroma collection, when the Chroma backend is used."""
+        return getattr(self.store, "collection", None)
 
     def createEmbedding(self, text: str):
         """
@@ -50,24 +83,269 @@ class OllamaEmbeddingModel:
         Returns:
             List[float]: The embedding vector.
         """
-        response = ollama.embeddings(model=self.embedding_model, prompt=text)
-        return response.embedding
+        return self.createEmbeddings([text])[0]
 
-    def add_texts(self, texts: list):
+    def createEmbeddings(self, texts: list):
         """
-        Adds a list of texts to the collection after generating their embeddings.
+        Creates embeddings for several texts with a single request to Ollama's embed endpoint.
+        Texts found in the embedding cache are not sent.
 
         Args:
-            texts (list): List of text strings.
+            texts (list): Texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding vector per text, in input order.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.embedding_cache is None:
+            return self._embed(texts)
+
+        started = time.perf_counter()
+        embeddings = self.embedding_cache.getMany(self.embedding_model, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing and self.metrics is not None:
+            self.metrics.emit(usageEvent("ollama", self.embedding_model, "embed", started, cacheHit=True))
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self._embed(missing_texts)
+            self.embedding_cache.putMany(self.embedding_model, missing_texts, computed)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        return embeddings
+
+    def _embed(self, texts):
+        """One embed request, reported to self.metrics when set."""
+        if self.metrics is None:
+            return self.client.embed(model=self.embedding_model, input=texts).embeddings
+        started = time.perf_counter()
+        try:
+            response = self.client.embed(model=self.embedding_model, input=texts)
+        except Exception as e:
+            self.metrics.emit(usageEvent("ollama", self.embedding_model, "embed", started, error=repr(e)))
+            raise
+        self.metrics.emit(usageEvent("ollama", self.embedding_model, "embed", started, ollamaUsage(response)))
+        return response.embeddings
+
+    def cache_stats(self):
         """
-        ids = []
-        embeddings = []
+        Returns:
+            dict: Hit/miss counters of the embedding cache, or None when it is disabled.
+        """
+        return self.embedding_cache.stats() if self.embedding_cache else None
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Returns the SHA-256 hex digest used to detect changed texts."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_id(text: str, source: str = None, key: str = None) -> str:
+        """
+        Derives a stable document id.
+
+        Without a key the id is content-addressed (source + text hash), so the same text always
+        maps to the same id. With a key (e.g. "file.txt#3") the id follows the key, and an edited
+        text keeps its id and gets updated in place.
+        """
+        if key is not None:
+            base = f"key\x1f{source or ''}\x1f{key}"
+        else:
+            base = f"text\x1f{source or ''}\x1f{OllamaEmbeddingModel.content_hash(text)}"
+        return hashlib.sha256(base.encode("utf-8")).hexdigest()[:32]
+
+    def _make_record(self, text, source=None, key=None, metadata=None):
+        record_metadata = dict(metadata or {})
+        record_metadata["content_hash"] = self.content_hash(text)
+        if source is not None:
+            record_metadata["source"] = source
+        return self.make_id(text, source, key), text, record_metadata
+
+    def _embed_and_write(self, records, batch_size=None, max_concurrency=None, flush_size=None, verbose=False):
+        """
+        Embeds and upserts (id, text, metadata) records.
+
+        Records are consumed in windows of flush_size: each window is split into requests of
+        batch_size texts, up to max_concurrency requests run at once, and the window is written
+        to the vector store before the next one is read, so memory stays bounded by flush_size.
+        """
+        batch_size = batch_size or self.batch_size
+        max_concurrency = max_concurrency or self.max_concurrency
+        flush_size = max(flush_size or self.flush_size, batch_size)
+
+        iterator = iter(records)
+        total = 0
+        requests = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            while True:
+                # Stores reject repeated ids in one call; the last occurrence wins.
+                window = {record[0]: record for record in islice(iterator, flush_size)}
+                if not window:
+                    break
+                ids = list(window)
+                texts = [window[i][1] for i in ids]
+                metadatas = [window[i][2] for i in ids]
+                batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+                embeddings = []
+                for batch_embeddings in executor.map(self.createEmbeddings, batches):
+                    embeddings.extend(batch_embeddings)
+                self.store.upsert(ids=ids, documents=texts, embeddings=embeddings, metadatas=metadatas)
+                total += len(ids)
+                requests += len(batches)
+                if verbose:
+                    elapsed = time.perf_counter() - start
+                    print(f"Indexed {total} texts in {elapsed:.1f}s ({total / elapsed:.1f} texts/s)")
+
+        elapsed = time.perf_counter() - start
+        return {
+            "texts": total,
+            "requests": requests,
+            "seconds": elapsed,
+            "texts_per_second": total / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def add_texts(self, texts, batch_size: int = None, max_concurrency: int = None, flush_size: int = None, verbose: bool = False):
+        """
+        Adds texts to the collection after generating their embeddings.
+
+        Ids are derived from the text content, so adding the same text again updates the
+        existing entry instead of colliding with it. Texts may be any iterable (e.g. a
+        generator over a large corpus); see _embed_and_write for how the work is batched.
+
+        Args:
+            texts (iterable): Text strings.
+            batch_size (int): Texts per embedding request (defaults to self.batch_size).
+            max_concurrency (int): Embedding requests in flight (defaults to self.max_concurrency).
+            flush_size (int): Texts per write to the vector store (defaults to self.flush_size).
+            verbose (bool): Print throughput after every flush.
+
+        Returns:
+            dict: Ingestion stats with "texts", "requests", "seconds" and "texts_per_second".
+        """
+        records = (self._make_record(text) for text in texts)
+        return self._embed_and_write(records, batch_size, max_concurrency, flush_size, verbose)
+
+    def _get_metadatas(self, ids: list, chunk_size: int = 1000):
+        """Returns {id: metadata} for the ids that are already in the collection."""
+        stored = {}
+        for start in range(0, len(ids), chunk_size):
+            result = self.store.get(ids=ids[start:start + chunk_size], include=["metadatas"])
+            for doc_id, metadata in zip(result["ids"], result["metadatas"]):
+                stored[doc_id] = metadata or {}
+        return stored
+
+    def _rewrite_metadatas(self, records, chunk_size: int = 1000):
+        """Upserts new metadata for (id, text, metadata) records, reusing their stored embeddings."""
+        for start in range(0, len(records), chunk_size):
+            chunk = {record[0]: record for record in records[start:start + chunk_size]}
+            result = self.store.get(ids=list(chunk), include=["documents", "embeddings"])
+            self.store.upsert(ids=result["ids"], embeddings=list(result["embeddings"]), documents=result["documents"],
+                              metadatas=[chunk[doc_id][2] for doc_id in result["ids"]])
+
+    def sync_texts(self, texts: list, source: str = None, keys: list = None, metadatas: list = None,
+                   remove_stale: bool = True, batch_size: int = None, max_concurrency: int = None,
+                   flush_size: int = None, verbose: bool = False):
+        """
+        Brings the collection in line with texts, embedding only what changed.
+
+        Texts whose id, content and metadata are already indexed are skipped, new or edited
+        texts are upserted, texts whose only change is their metadata (or source) get the new
+        metadata without being embedded again, and when a source is given, entries of that
+        source missing from texts are removed.
+
+        Args:
+            texts (list): Current text strings.
+            source (str): Optional source key (e.g. a file path) scoping the ids and stale removal.
+            keys (list): Optional stable key per text (e.g. chunk number) so edits update in place.
+            metadatas (list): Optional metadata dict per text.
+            remove_stale (bool): Delete entries of source that are not in texts.
+            batch_size, max_concurrency, flush_size, verbose: See add_texts.
+
+        Returns:
+            dict: Counts of "added", "updated", "metadata_updated", "unchanged" and "removed" texts,
+                plus the embedding stats.
+        """
+        texts = list(texts)
+        records = {}
         for i, text in enumerate(texts):
-            embedding = self.createEmbedding(text)
-            # Using a simple incremental id; adjust as needed.
-            ids.append(str(i))
-            embeddings.append(embedding)
-        self.collection.add(ids=ids, documents=texts, embeddings=embeddings)
+            record = self._make_record(
+                text, source,
+                keys[i] if keys is not None else None,
+                metadatas[i] if metadatas is not None else None)
+            records[record[0]] = record
+
+        stored = self._get_metadatas(list(records))
+        changed = [record for doc_id, record in records.items()
+                   if stored.get(doc_id, {}).get("content_hash") != record[2]["content_hash"]]
+        changed_ids = {record[0] for record in changed}
+        retagged = [record for doc_id, record in records.items()
+                    if doc_id in stored and doc_id not in changed_ids and stored[doc_id] != record[2]]
+        updated = sum(1 for record in changed if record[0] in stored)
+        stats = self._embed_and_write(changed, batch_size, max_concurrency, flush_size, verbose)
+        self._rewrite_metadatas(retagged)
+
+        removed = 0
+        if source is not None and remove_stale:
+            existing = self.store.get(where={"source": source}, include=[])["ids"]
+            stale = [doc_id for doc_id in existing if doc_id not in records]
+            for start in range(0, len(stale), 1000):
+                self.store.delete(ids=stale[start:start + 1000])
+            removed = len(stale)
+
+        stats.update({
+            "added": len(changed) - updated,
+            "updated": updated,
+            "metadata_updated": len(retagged),
+            "unchanged": len(records) - len(changed) - len(retagged),
+            "removed": removed,
+        })
+        return stats
+
+    def delete(self, ids: list = None, where: dict = None, texts: list = None, batch_size: int = 1000):
+        """
+        Deletes entries in batched calls, by ids, by a metadata where clause, or by exact text.
+
+        Texts are matched through the content_hash stored in every entry's metadata, so no
+        document scan is needed.
+
+        Args:
+            ids (list): Ids to delete.
+            where (dict): Metadata filter (Chroma syntax), e.g. {"source": "file.txt"}.
+            texts (list): Texts to delete (exact match).
+            batch_size (int): Ids or hashes per delete call.
+
+        Returns:
+            int: Number of deleted entries.
+        """
+        deleted = 0
+        if ids:
+            ids = list(ids)
+            for start in range(0, len(ids), batch_size):
+                chunk = ids[start:start + batch_size]
+                existing = self.store.get(ids=chunk, include=[])["ids"]
+                if existing:
+                    self.store.delete(ids=existing)
+                    deleted += len(existing)
+        if where is not None:
+            deleted += self._delete_where(where, batch_size)
+        if texts:
+            hashes = list({self.content_hash(text) for text in texts})
+            for start in range(0, len(hashes), batch_size):
+                chunk = hashes[start:start + batch_size]
+                deleted += self._delete_where({"content_hash": {"$in": chunk}}, batch_size)
+        return deleted
+
+    def _delete_where(self, where: dict, batch_size: int):
+        # Always read the first page: deleted entries drop out of the next read.
+        deleted = 0
+        while True:
+            page = self.store.get(where=where, limit=batch_size, include=[])["ids"]
+            if not page:
+                return deleted
+            self.store.delete(ids=page)
+            deleted += len(page)
 
     def delete_by_texts(self, texts: list):
         """
@@ -75,34 +353,104 @@ class OllamaEmbeddingModel:
 
         Args:
             texts (list): List of texts to delete.
+
+        Returns:
+            int: Number of deleted entries.
+        """
+        return self.delete(texts=texts)
+
+    def iter_records(self, page_size: int = 1000, include: list = ("documents", "metadatas"), where: dict = None):
+        """
+        Pages through the collection with limit/offset, holding one page in memory at a time.
+        Entries deleted while iterating may shift later pages.
+
+        Args:
+            page_size (int): Entries fetched per call.
+            include (list): Fields to fetch among "documents", "metadatas" and "embeddings".
+            where (dict): Optional metadata filter (Chroma syntax).
+
+        Yields:
+            dict: {"id": ...} plus one key per included field ("document", "metadata", "embedding").
+        """
+        include = list(include)
+        offset = 0
+        while True:
+            page = self.store.get(where=where, limit=page_size, offset=offset, include=include)
+            ids = page["ids"]
+            for i, doc_id in enumerate(ids):
+                record = {"id": doc_id}
+                for field in include:
+                    record[field[:-1]] = page[field][i]
+                yield record
+            if len(ids) < page_size:
+                return
+            offset += page_size
+
+    def iter_texts(self, page_size: int = 1000, where: dict = None):
         """
-        for text in texts:
-            self.collection.delete(filter={"documents": text})
+        Yields the stored texts page by page; see iter_records.
+        """
+        for record in self.iter_records(page_size, include=["documents"], where=where):
+            yield record["document"]
 
     def get_all_texts(self):
         """
         Retrieves all texts stored in the collection.
+        For large collections prefer iter_texts, which doesn't load everything at once.
 
         Returns:
             list: List of stored texts.
         """
-        results = self.collection.get()
-        return results.get("documents", [])
+        return list(self.iter_texts())
+
+    def search_many(self, queries: list, n_results: int = 5, where: dict = None,
+                    batch_size: int = None, max_concurrency: int = None):
+        """
+        Searches several queries at once: queries are embedded batch_size per request (up to
+        max_concurrency requests in flight) and each batch is answered by one vector store query.
+
+        Args:
+            queries (list): Query texts.
+            n_results (int): Number of results per query.
+            where (dict): Optional metadata filter (Chroma syntax).
+            batch_size (int): Queries per embedding request and store query (defaults to self.batch_size).
+            max_concurrency (int): Embedding requests in flight (defaults to self.max_concurrency).
+
+        Returns:
+            list: One dict per query with "ids", "documents", "distances" and "metadatas" lists,
+                ordered from the closest match.
+        """
+        queries = list(queries)
+        batch_size = batch_size or self.batch_size
+        max_concurrency = max_concurrency or self.max_concurrency
+        batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for embeddings in executor.map(self.createEmbeddings, batches):
+                batch_results = self.store.query(query_embeddings=embeddings, n_results=n_results, where=where)
+                for i in range(len(embeddings)):
+                    results.append({
+                        "ids": batch_results["ids"][i],
+                        "documents": batch_results["documents"][i],
+                        "distances": batch_results["distances"][i],
+                        "metadatas": batch_results["metadatas"][i],
+                    })
+        return results
 
-    def search(self, query: str, n_results: int = 5):
+    def search(self, query: str, n_results: int = 5, where: dict = None):
         """
         Searches for texts similar to the query by comparing embeddings.
 
         Args:
             query (str): Query text.
             n_results (int): Number of results to return.
+            where (dict): Optional metadata filter (Chroma syntax).
 
         Returns:
-            list: The first set of matching documents.
+            list: The matching documents, closest first. Use search_many for ids, distances and metadata.
         """
-        query_embedding = self.createEmbedding(query)
-        results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results)
-        return results.get("documents", [])[0]
+        return self.search_many([query], n_results=n_results, where=where)[0]["documents"]
 
     def generate_answer(self, question: str):
         """
@@ -119,5 +467,8 @@ class OllamaEmbeddingModel:
         documents = self.search(question)
         context = "\n".join(documents)
         prompt = f"Question: {question}\nContext:\n{context}\nAnswer:"
-        response = ollama.generate(model=self.answer_model, prompt=prompt)
+        started = time.perf_counter()
+        response = self.client.generate(model=self.answer_model, prompt=prompt)
+        if self.metrics is not None:
+            self.metrics.emit(usageEvent("ollama", self.answer_model, "generate", started, ollamaUsage(response)))
         return response["response"]
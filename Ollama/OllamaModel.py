@@ -1,15 +1,27 @@
-from ollama import Client
-from pydantic import BaseModel, create_model
 from typing import Union, List, Dict, Any, Callable
-import inspect
-import json
+import time
+from Auxiliars.BatchRunner import runBatch, runBatchAsync
+from Auxiliars.Streaming import StreamChunk, ollamaUsage
+from Auxiliars.StreamingJsonParser import StreamingJsonListParser
+from Auxiliars.CallPlan import CallPlan, compileCallPlan
+from Auxiliars.ClientPool import clientPool
+from Auxiliars.ToolRunner import executeTool, aexecuteTool
+from Auxiliars.Metrics import usageEvent
 
 class OllamaLLMModel:
     def __init__(self):
         self.modelName = None
         self.systemMessage = None
         self._api_endpoint = 'http://localhost:11434'
-        self.client = Client(host=self._api_endpoint)
+        self._endpoint_pool = None
+        # Optional Auxiliars.ResponseCache shared with the manager.
+        self.responseCache = None
+        # Optional Auxiliars.Metrics.MetricsHub receiving a CallEvent per backend call.
+        self.metrics = None
+        # keep_alive sent with every request ("5m", seconds, -1 forever); None defers to the lifecycle.
+        self.keepAlive = None
+        # Optional Ollama.OllamaModelLifecycle.ModelLifecycle tracking use and keep_alive of the model.
+        self.lifecycle = None
         
     @property
     def apiEndpoint(self):
@@ -17,8 +29,32 @@ class OllamaLLMModel:
     
     @apiEndpoint.setter
     def apiEndpoint(self, value):
+        # A single endpoint replaces any endpoint pool.
         self._api_endpoint = value
-        self.client = Client(host=self._api_endpoint)
+        self._endpoint_pool = None
+
+    @property
+    def endpointPool(self):
+        """Optional Auxiliars.EndpointPool routing the requests over several Ollama servers."""
+        return self._endpoint_pool
+
+    @endpointPool.setter
+    def endpointPool(self, pool):
+        self._endpoint_pool = pool
+
+    @property
+    def client(self):
+        if self._endpoint_pool is not None:
+            return self._endpoint_pool.client
+        # Looked up on use, so creating a model doesn't import ollama and httpx.
+        return clientPool.ollamaClient(self._api_endpoint)
+
+    @property
+    def asyncClient(self):
+        if self._endpoint_pool is not None:
+            return self._endpoint_pool.asyncClient
+        # Looked up per call: the shared AsyncClient belongs to the running event loop.
+        return clientPool.ollamaAsyncClient(self._api_endpoint)
 
     def sendMessage(
         self, 
@@ -26,107 +62,281 @@ class OllamaLLMModel:
         expectsOutputParser: bool = False, 
         outputDefinition: Dict = None, 
         tools: List[Callable] = None,
-        assistantFormat: bool = False
+        assistantFormat: bool = False,
+        maxConcurrency: int = 1,
+        onProgress: Callable[[int, int], None] = None,
+        callPlan: CallPlan = None
     ) -> Union[str, List[str], Dict, Any]:
-        
+        """
+        Send one message, or a batch of messages when userMessage is a list.
+
+        In batch mode up to maxConcurrency requests are kept in flight (useful with
+        OLLAMA_NUM_PARALLEL on the server), results come back in input order and a
+        failed item holds a BatchItemError instead of aborting the batch.
+        onProgress(completed, total) is called as each batch item finishes.
+        callPlan (from compileCallPlan) replaces outputDefinition and tools with its
+        precompiled schemas and prompts.
+        """
+        is_batch = not assistantFormat and isinstance(userMessage, list)
+        plan = self._prepareCall(expectsOutputParser, outputDefinition, tools, callPlan)
+
+        def send(msg):
+            return self._sendSingle(msg, plan, assistantFormat)
+
+        if not is_batch:
+            return send(userMessage)
+        return runBatch(send, userMessage, maxConcurrency=maxConcurrency, onProgress=onProgress)
+
+    async def asendMessage(
+        self, 
+        userMessage: Union[str, List[str]], 
+        expectsOutputParser: bool = False, 
+        outputDefinition: Dict = None, 
+        tools: List[Callable] = None,
+        assistantFormat: bool = False,
+        maxConcurrency: int = 1,
+        onProgress: Callable[[int, int], None] = None,
+        callPlan: CallPlan = None
+    ) -> Union[str, List[str], Dict, Any]:
+        """
+        Async version of sendMessage built on ollama.AsyncClient. Batches run as
+        coroutines on the current event loop instead of threads.
+        """
+        is_batch = not assistantFormat and isinstance(userMessage, list)
+        plan = self._prepareCall(expectsOutputParser, outputDefinition, tools, callPlan)
+
+        async def send(msg):
+            return await self._asendSingle(msg, plan, assistantFormat)
+
+        if not is_batch:
+            return await send(userMessage)
+        return await runBatchAsync(send, userMessage, maxConcurrency=maxConcurrency, onProgress=onProgress)
+
+    def sendMessageStream(
+        self,
+        userMessage: Union[str, List[Dict]],
+        expectsOutputParser: bool = False,
+        outputDefinition: Dict = None,
+        assistantFormat: bool = False
+    ):
+        """
+        Streams the reply to a single message as it is generated.
+
+        Yields StreamChunk events with the new text; the last one has done=True and carries
+        the full text, the parsed result (a dict with outputDefinition) and usage stats.
+        Tool calling needs the whole reply and is not available in streaming mode.
+        """
+        plan = self._prepareCall(expectsOutputParser, outputDefinition, None)
+        request = self._buildChatRequest(userMessage, plan, assistantFormat)
+        parts = []
+        started, firstTokenAt = time.perf_counter(), None
+        for part in self.client.chat(**request, stream=True):
+            text = part.message.content or ""
+            if text:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                parts.append(text)
+                yield StreamChunk(text)
+            if part.done:
+                self._emitCall(started, ollamaUsage(part), operation="stream", firstTokenAt=firstTokenAt)
+                fullText = "".join(parts)
+                yield StreamChunk(done=True, fullText=fullText,
+                                  result=self._parseContent(fullText, plan.outputModel), usage=ollamaUsage(part))
+
+    async def asendMessageStream(
+        self,
+        userMessage: Union[str, List[Dict]],
+        expectsOutputParser: bool = False,
+        outputDefinition: Dict = None,
+        assistantFormat: bool = False
+    ):
+        """
+        Async iterator version of sendMessageStream built on ollama.AsyncClient.
+        """
+        plan = self._prepareCall(expectsOutputParser, outputDefinition, None)
+        request = self._buildChatRequest(userMessage, plan, assistantFormat)
+        parts = []
+        started, firstTokenAt = time.perf_counter(), None
+        async for part in await self.asyncClient.chat(**request, stream=True):
+            text = part.message.content or ""
+            if text:
+                if firstTokenAt is None:
+                    firstTokenAt = time.perf_counter()
+                parts.append(text)
+                yield StreamChunk(text)
+            if part.done:
+                self._emitCall(started, ollamaUsage(part), operation="stream", firstTokenAt=firstTokenAt)
+                fullText = "".join(parts)
+                yield StreamChunk(done=True, fullText=fullText,
+                                  result=self._parseContent(fullText, plan.outputModel), usage=ollamaUsage(part))
+
+    def sendMessageRecords(
+        self,
+        userMessage: Union[str, List[Dict]],
+        outputDefinition: Dict,
+        assistantFormat: bool = False
+    ):
+        """
+        Asks for a list of outputDefinition records and yields each one (a repaired dict)
+        as soon as it is complete, instead of waiting for the whole reply.
+
+        The reply is constrained to {"items": [record, ...]}.
+        """
+        plan = self._prepareCall(True, outputDefinition, None)
+        request = self._buildChatRequest(userMessage, plan, assistantFormat)
+        request['format'] = plan.listOutputSchema
+        parser = StreamingJsonListParser(outputDefinition)
+        started, firstTokenAt = time.perf_counter(), None
+        for part in self.client.chat(**request, stream=True):
+            if firstTokenAt is None and part.message.content:
+                firstTokenAt = time.perf_counter()
+            if part.done:
+                self._emitCall(started, ollamaUsage(part), operation="records", firstTokenAt=firstTokenAt)
+            yield from parser.feed(part.message.content or "")
+        yield from parser.close()
+
+    async def asendMessageRecords(
+        self,
+        userMessage: Union[str, List[Dict]],
+        outputDefinition: Dict,
+        assistantFormat: bool = False
+    ):
+        """
+        Async iterator version of sendMessageRecords.
+        """
+        plan = self._prepareCall(True, outputDefinition, None)
+        request = self._buildChatRequest(userMessage, plan, assistantFormat)
+        request['format'] = plan.listOutputSchema
+        parser = StreamingJsonListParser(outputDefinition)
+        started, firstTokenAt = time.perf_counter(), None
+        async for part in await self.asyncClient.chat(**request, stream=True):
+            if firstTokenAt is None and part.message.content:
+                firstTokenAt = time.perf_counter()
+            if part.done:
+                self._emitCall(started, ollamaUsage(part), operation="records", firstTokenAt=firstTokenAt)
+            for record in parser.feed(part.message.content or ""):
+                yield record
+        for record in parser.close():
+            yield record
+
+    def _prepareCall(self, expectsOutputParser, outputDefinition, tools, callPlan=None):
+        if callPlan is not None:
+            return callPlan
+        # The compiled plan is cached, so batches and repeated calls reuse its schemas.
+        if expectsOutputParser and outputDefinition:
+            return compileCallPlan(outputDefinition=outputDefinition, systemMessage=self.systemMessage)
+        return compileCallPlan(tools=tools, systemMessage=self.systemMessage)
+
+    def _buildChatRequest(self, msg, plan, assistantFormat):
+        messages = []
+        if self.systemMessage:
+            messages.append({'role': 'system', 'content': self.systemMessage})
         if assistantFormat:
-            is_batch = False
+            for roleContentDict in msg:
+                messages.append(roleContentDict)
         else:
-            is_batch = isinstance(userMessage, list)
-        
-        messages_list = userMessage if is_batch else [userMessage]
-
-        responses = []
-        for msg in messages_list:
-            messages = []
-            if self.systemMessage:
-                messages.append({'role': 'system', 'content': self.systemMessage})
-            if assistantFormat:
-                for roleContentDict in msg:
-                    messages.append(roleContentDict)
-            else:
-                messages.append({'role': 'user', 'content': msg})
-
-            if expectsOutputParser and outputDefinition:
-                DynamicModel = self._create_pydantic_model(outputDefinition)
-                response = self.client.chat(
-                    model=self.modelName,
-                    messages=messages,
-                    format=DynamicModel.model_json_schema()
-                )
-                parsed = DynamicModel.model_validate_json(response.message.content)
-                responses.append(parsed.dict())
-                
-            elif tools:
-                tool_schemas = [self._generate_tool_schema(func) for func in tools]
-                system_msg = self._build_tool_system_message(tool_schemas)
-                messages = [{'role': 'system', 'content': system_msg}] + messages#[1:]
-                
-                FunctionCallModel = self._create_functioncall_model()
-                response = self.client.chat(
-                    model=self.modelName,
-                    messages=messages,
-                    format=FunctionCallModel.model_json_schema()
-                )
-                func_call = FunctionCallModel.model_validate_json(response.message.content)
-                result = self._execute_tool(tools, func_call)
-                responses.append(result)
-                
-            else:
-                response = self.client.chat(
-                    model=self.modelName,
-                    messages=messages
-                )
-                responses.append(response.message['content'])
-                
-        return responses if is_batch else responses[0]
-
-    def _create_pydantic_model(self, output_def):
-        fields = {}
-        for key, (type_, default) in output_def.items():
-            fields[key] = (type_, Ellipsis if default is Ellipsis else default)
-        return create_model('DynamicModel', **fields)
-
-    def _generate_tool_schema(self, func):
-        sig = inspect.signature(func)
-        params = {
-            'type': 'object',
-            'properties': {},
-            'required': []
-        }
-        for name, param in sig.parameters.items():
-            param_type = param.annotation if param.annotation != inspect.Parameter.empty else str
-            params['properties'][name] = {'type': param_type.__name__}
-            if param.default == inspect.Parameter.empty:
-                params['required'].append(name)
-        return {
-            'name': func.__name__,
-            'description': func.__doc__.strip() if func.__doc__ else "",
-            'parameters': params
-        }
-
-    def _build_tool_system_message(self, tool_schemas):
-        base_msg = self.systemMessage or "You are a helpful assistant."
-        tools_desc = "\n".join(
-            [f"{tool['name']}: {tool['description']}\nParameters: {json.dumps(tool['parameters'])}" 
-             for tool in tool_schemas]
-        )
-        return f"{base_msg}\n\nAvailable tools:\n{tools_desc}\n\nRespond with JSON containing 'function' and 'arguments'."
-
-    def _create_functioncall_model(self):
-        class FunctionCall(BaseModel):
-            function: str
-            arguments: dict
-        return FunctionCall
+            messages.append({'role': 'user', 'content': msg})
 
-    def _execute_tool(self, tools, func_call):
+        request = self._baseRequest(messages)
+        if plan.outputModel is not None:
+            request['format'] = plan.outputSchema
+        elif plan.tools:
+            request['messages'] = [{'role': 'system', 'content': plan.toolSystemMessage}] + messages#[1:]
+            request['format'] = plan.functionCallSchema
+        return request
+
+    def _baseRequest(self, messages):
+        request = {'model': self.modelName, 'messages': messages}
+        keepAlive = self.keepAlive
+        if self.lifecycle is not None:
+            self.lifecycle.touch(self.modelName)
+            if keepAlive is None:
+                keepAlive = self.lifecycle.keepAliveFor(self.modelName)
+        if keepAlive is not None:
+            request['keep_alive'] = keepAlive
+        return request
+
+    def _cacheKey(self, request):
+        if self.responseCache is None:
+            return None
+        # keep_alive doesn't change the reply.
+        return self.responseCache.makeKey({'backend': 'ollama', **{k: v for k, v in request.items() if k != 'keep_alive'}})
+
+    def _emitCall(self, started, usage=None, operation="chat", **fields):
+        if self.metrics is not None:
+            self.metrics.emit(usageEvent("ollama", self.modelName, operation, started, usage, **fields))
+
+    def _chatContent(self, request):
+        """Runs a chat request and returns the reply text, going through the response cache if set."""
+        started = time.perf_counter()
+        key = self._cacheKey(request)
+        if key is not None:
+            cached = self.responseCache.get(key)
+            if cached is not None:
+                self._emitCall(started, cacheHit=True)
+                return cached
+        try:
+            response = self.client.chat(**request)
+        except Exception as e:
+            self._emitCall(started, error=repr(e))
+            raise
+        self._emitCall(started, ollamaUsage(response))
+        content = response.message['content']
+        if key is not None:
+            self.responseCache.put(key, content)
+        return content
+
+    async def _achatContent(self, request):
+        started = time.perf_counter()
+        key = self._cacheKey(request)
+        if key is not None:
+            cached = self.responseCache.get(key)
+            if cached is not None:
+                self._emitCall(started, cacheHit=True)
+                return cached
         try:
-            tool = next(t for t in tools if t.__name__ == func_call.function)
-            return tool(**func_call.arguments)
-        except StopIteration:
-            raise ValueError(f"Function {func_call.function} not found")
+            response = await self.asyncClient.chat(**request)
         except Exception as e:
-            raise RuntimeError(f"Error executing {func_call.function}: {str(e)}")
+            self._emitCall(started, error=repr(e))
+            raise
+        self._emitCall(started, ollamaUsage(response))
+        content = response.message['content']
+        if key is not None:
+            self.responseCache.put(key, content)
+        return content
+
+    def _parseContent(self, content, DynamicModel):
+        if DynamicModel is not None:
+            parsed = DynamicModel.model_validate_json(content)
+            return parsed.dict()
+        return content
+
+    def _sendSingle(self, msg, plan, assistantFormat):
+        request = self._buildChatRequest(msg, plan, assistantFormat)
+        content = self._chatContent(request)
+        if plan.outputModel is None and plan.tools:
+            func_call = plan.functionCallModel.model_validate_json(content)
+            return self._execute_tool(plan.dispatch, func_call)
+        return self._parseContent(content, plan.outputModel)
+
+    async def _asendSingle(self, msg, plan, assistantFormat):
+        request = self._buildChatRequest(msg, plan, assistantFormat)
+        content = await self._achatContent(request)
+        if plan.outputModel is None and plan.tools:
+            func_call = plan.functionCallModel.model_validate_json(content)
+            return await self._aexecute_tool(plan.dispatch, func_call)
+        return self._parseContent(content, plan.outputModel)
+
+    def _dispatch(self, tools):
+        # tools is either a list of functions or a CallPlan dispatch table.
+        return tools if isinstance(tools, dict) else {t.__name__: t for t in tools}
+
+    def _execute_tool(self, tools, func_call):
+        return executeTool(self._dispatch(tools), func_call.function, func_call.arguments)
+
+    async def _aexecute_tool(self, tools, func_call):
+        """Async tools are awaited, plain functions run in a worker thread so they don't block the loop."""
+        return await aexecuteTool(self._dispatch(tools), func_call.function, func_call.arguments)
         
 
 if __name__ == "__main__":
@@ -144,6 +354,9 @@ if __name__ == "__main__":
     # osm.modelName = 'deepseek-r1:7b'
     # osm.systemMessage = "Tell the main color of the fruit."
     # print(osm.sendMessage(["banana", "apple"]))
+    # # Same batch with 4 requests in flight (set OLLAMA_NUM_PARALLEL on the server)
+    # print(osm.sendMessage(["banana", "apple", "grape", "kiwi"], maxConcurrency=4,
+    #                       onProgress=lambda done, total: print(f"{done}/{total}")))
 
     # JSON parsing
     # osm2 = OllamaLLMModel()
@@ -179,4 +392,10 @@ if __name__ == "__main__":
     # )
     # print(response)  # Should return 325738
 
+    # Async usage
+    # import asyncio
+    # osm4 = OllamaLLMModel()
+    # osm4.modelName = 'deepseek-r1:7b'
+    # print(asyncio.run(osm4.asendMessage(["banana", "apple"], maxConcurrency=2)))
+
 
@@ -0,0 +1,311 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Union
+from Auxiliars.BatchRunner import BatchItemError, runBatch
+from Auxiliars.ClientPool import clientPool
+from Auxiliars.Metrics import CallEvent
+
+logger = logging.getLogger(__name__)
+
+
+def fullModelName(model: str) -> str:
+    """Ollama names a model without a tag as model:latest."""
+    return model if ":" in model else f"{model}:latest"
+
+
+class ModelLifecycle:
+    """
+    Keeps the models of one Ollama server, or of every server of an EndpointPool, ready to serve.
+
+    The local inventory (/api/tags) of each server is cached for inventoryTtl seconds, so
+    presence checks are a dict lookup. ensure() pulls the missing models concurrently with
+    streamed progress, warm() loads a model with an empty request so the first real request
+    doesn't pay for the load, and keep_alive is tracked per model for the requests of
+    OllamaLLMModel. With a pool, pulls, loads and unloads are done on each endpoint, since
+    any of them may serve the next request. Models unused for idleSeconds, or the least
+    recently used ones when the loaded models of a server exceed memoryBudget bytes, are
+    unloaded by enforce(), which a background thread runs every checkInterval seconds.
+    """
+    def __init__(self, host: str = None, client=None, inventoryTtl: float = 30.0,
+                 defaultKeepAlive: Union[str, float] = None, memoryBudget: int = None,
+                 idleSeconds: float = None, checkInterval: float = None, endpointPool=None,
+                 metrics=None):
+        """
+        :param host: Ollama server URL; None lets ollama read OLLAMA_HOST.
+        :param client: (Optional) Client to use instead of the shared one of host.
+        :param inventoryTtl: Seconds the list of local models is trusted.
+        :param defaultKeepAlive: keep_alive of models without their own ("5m", seconds, -1 forever);
+                                 None leaves the server default.
+        :param memoryBudget: (Optional) Bytes the loaded models may take before the least recently
+                             used ones are unloaded.
+        :param idleSeconds: (Optional) Unload models not used for this long.
+        :param checkInterval: Seconds between background enforce() runs; None disables the thread.
+        :param endpointPool: (Optional) Auxiliars.EndpointPool whose endpoints are all managed,
+                             instead of host.
+        :param metrics: (Optional) Auxiliars.Metrics.MetricsHub receiving a CallEvent for every
+                        failed background check.
+        """
+        self.host = host
+        self._client = client
+        self.endpointPool = endpointPool
+        self.metrics = metrics
+        self.inventoryTtl = inventoryTtl
+        self.defaultKeepAlive = defaultKeepAlive
+        self.memoryBudget = memoryBudget
+        self.idleSeconds = idleSeconds
+        self.lock = threading.Lock()
+        # Per server: {model name: size} and when it was listed.
+        self._inventory: Dict[str, Dict[str, int]] = {}
+        self._inventoryAt: Dict[str, float] = {}
+        self.keepAlive: Dict[str, Union[str, float]] = {}
+        self.lastUsed: Dict[str, float] = {}
+        self.pinned = set()
+        self._pullLocks: Dict[str, threading.Lock] = {}
+
+        self.stopEvent = threading.Event()
+        self.checkThread = None
+        if checkInterval:
+            self.checkThread = threading.Thread(target=self._checkLoop, args=(checkInterval,), daemon=True)
+            self.checkThread.start()
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else clientPool.ollamaClient(self.host)
+
+    def servers(self) -> List[tuple]:
+        """(url, client) of every managed server: each endpoint of the pool, or the single host."""
+        if self.endpointPool is not None:
+            return [(e.url, clientPool.ollamaClient(e.url)) for e in self.endpointPool.endpoints]
+        return [(self.host, self.client)]
+
+    # Inventory
+
+    def inventory(self, refresh: bool = False) -> Dict[str, int]:
+        """:return: {model name: size in bytes} of the models available on every server."""
+        inventories = [self._serverInventory(url, client, refresh) for url, client in self.servers()]
+        return {name: size for name, size in inventories[0].items()
+                if all(name in models for models in inventories[1:])}
+
+    def _serverInventory(self, url, client, refresh=False) -> Dict[str, int]:
+        with self.lock:
+            models = self._inventory.get(url)
+            if not refresh and models is not None and time.monotonic() - self._inventoryAt[url] < self.inventoryTtl:
+                return models
+        models = {m.model: m.size for m in client.list().models}
+        with self.lock:
+            self._inventory[url], self._inventoryAt[url] = models, time.monotonic()
+        return models
+
+    def invalidate(self, url=None):
+        """Forgets the inventory of the server at url, or of every server."""
+        with self.lock:
+            if url is None:
+                self._inventory.clear()
+            else:
+                self._inventory.pop(url, None)
+
+    def exists(self, model: str, refresh: bool = False) -> bool:
+        """Whether model is available on every server."""
+        return fullModelName(model) in self.inventory(refresh)
+
+    # Pulls
+
+    def pull(self, model: str, onProgress: Callable[[str, str, int, int], None] = None) -> bool:
+        """
+        Pulls model on every server that doesn't have it yet. Errors are raised, not swallowed.
+
+        :param onProgress: (Optional) Called as onProgress(model, status, completed, total) for
+                           every progress event streamed by a server (sizes in bytes, 0 if unknown).
+        :return: True when the model was downloaded somewhere.
+        """
+        pulled = False
+        for url, client in self.servers():
+            pulled = self._pullOn(url, client, model, onProgress) or pulled
+        return pulled
+
+    def _pullOn(self, url, client, model, onProgress):
+        name = fullModelName(model)
+        with self.lock:
+            pullLock = self._pullLocks.setdefault((url, name), threading.Lock())
+        # A second caller for the same model waits for the first pull instead of starting another.
+        with pullLock:
+            if name in self._serverInventory(url, client):
+                return False
+            for progress in client.pull(model, stream=True):
+                if onProgress:
+                    onProgress(model, progress.status, progress.completed or 0, progress.total or 0)
+            self.invalidate(url)
+            return True
+
+    def ensure(self, models: List[str], onProgress: Callable[[str, str, int, int], None] = None,
+               maxConcurrency: int = 2) -> List[str]:
+        """
+        Pulls every missing model, up to maxConcurrency at a time.
+
+        :return: The models that were downloaded.
+        :raises RuntimeError: When a pull failed, after the other pulls finished.
+        """
+        models = list(dict.fromkeys(models))
+        results = runBatch(lambda model: self.pull(model, onProgress), models, maxConcurrency=maxConcurrency)
+        failed = [r for r in results if isinstance(r, BatchItemError)]
+        if failed:
+            raise RuntimeError("Could not pull " + ", ".join(f"{e.item} ({e.error})" for e in failed)) from failed[0].error
+        return [model for model, pulled in zip(models, results) if pulled]
+
+    # Loading and keep-alive
+
+    def setKeepAlive(self, model: str, keepAlive: Union[str, float], pin: bool = False):
+        """
+        Sets the keep_alive sent with model's requests. Pinned models are never unloaded by enforce().
+        """
+        name = fullModelName(model)
+        with self.lock:
+            self.keepAlive[name] = keepAlive
+            if pin:
+                self.pinned.add(name)
+            else:
+                self.pinned.discard(name)
+
+    def keepAliveFor(self, model: str):
+        with self.lock:
+            return self.keepAlive.get(fullModelName(model), self.defaultKeepAlive)
+
+    def touch(self, model: str):
+        """Records that model is about to serve a request."""
+        with self.lock:
+            self.lastUsed[fullModelName(model)] = time.monotonic()
+
+    def warm(self, model: str, keepAlive: Union[str, float] = None, embedding: bool = False) -> float:
+        """
+        Loads model into memory with an empty request, on every server.
+
+        :param keepAlive: (Optional) Also set model's keep_alive.
+        :param embedding: Whether model is an embedding model (loaded through /api/embed).
+        :return: Seconds the load took.
+        """
+        if keepAlive is not None:
+            self.setKeepAlive(model, keepAlive)
+        keepAlive = self.keepAliveFor(model)
+        started = time.perf_counter()
+        for _, client in self.servers():
+            if embedding:
+                client.embed(model=model, input=[], keep_alive=keepAlive)
+            else:
+                client.generate(model=model, prompt="", keep_alive=keepAlive)
+        self.touch(model)
+        if self.memoryBudget is not None:
+            self.enforce(protect=(model,))
+        return time.perf_counter() - started
+
+    def prepare(self, models: List[str], keepAlive: Union[str, float] = None,
+                onProgress: Callable[[str, str, int, int], None] = None, embedding: bool = False):
+        """Pulls the missing models, then warms each of them."""
+        self.ensure(models, onProgress)
+        for model in models:
+            self.warm(model, keepAlive, embedding)
+
+    def unload(self, model: str):
+        """Asks every server to release model now."""
+        for _, client in self.servers():
+            self._unloadOn(client, model)
+        with self.lock:
+            self.lastUsed.pop(fullModelName(model), None)
+
+    def _unloadOn(self, client, model):
+        client.generate(model=model, prompt="", keep_alive=0)
+
+    def loaded(self) -> List[dict]:
+        """The models currently in memory (/api/ps), with the url of the server holding them."""
+        return [loaded for url, client in self.servers() for loaded in self._loadedOn(url, client)]
+
+    @staticmethod
+    def _loadedOn(url, client):
+        return [{"model": m.model, "size": m.size, "size_vram": m.size_vram, "expires_at": m.expires_at, "url": url}
+                for m in client.ps().models]
+
+    def enforce(self, protect=()) -> List[str]:
+        """
+        Unloads idle models, then least recently used ones until the memory budget of each
+        server is met. Pinned models and protect are kept.
+
+        :return: The unloaded models.
+        """
+        if self.memoryBudget is None and self.idleSeconds is None:
+            return []
+        unloaded, remaining = [], set()
+        for url, client in self.servers():
+            dropped, kept = self._enforceOn(url, client, protect)
+            unloaded.extend(dropped)
+            remaining |= kept
+        with self.lock:
+            # A model still loaded on another server keeps its record there.
+            for model in set(unloaded) - remaining:
+                self.lastUsed.pop(model, None)
+        return list(dict.fromkeys(unloaded))
+
+    def _enforceOn(self, url, client, protect):
+        """:return: (models unloaded from the server at url, models it still holds)."""
+        loaded = self._loadedOn(url, client)
+        keep = {fullModelName(m) for m in protect}
+        now = time.monotonic()
+        with self.lock:
+            keep |= self.pinned
+            tracked = {m["model"] for m in loaded if m["model"] in self.lastUsed}
+            # Models loaded by someone else have no record: the first to go over budget, but never idle.
+            lastUsed = {m["model"]: self.lastUsed.get(m["model"], 0.0) for m in loaded}
+        candidates = sorted((m for m in loaded if m["model"] not in keep), key=lambda m: lastUsed[m["model"]])
+        unloaded = []
+        total = sum(m["size"] for m in loaded)
+        for m in candidates:
+            idle = (self.idleSeconds is not None and m["model"] in tracked
+                    and now - lastUsed[m["model"]] >= self.idleSeconds)
+            overBudget = self.memoryBudget is not None and total > self.memoryBudget
+            if not idle and not overBudget:
+                continue
+            self._unloadOn(client, m["model"])
+            total -= m["size"]
+            unloaded.append(m["model"])
+        return unloaded, {m["model"] for m in loaded} - set(unloaded)
+
+    def _checkLoop(self, interval):
+        while not self.stopEvent.wait(interval):
+            started = time.perf_counter()
+            try:
+                self.enforce()
+            except Exception as e:
+                # The thread keeps going; the failure is reported like a failed call.
+                if self.metrics is not None:
+                    self.metrics.emit(CallEvent("ollama", "", "lifecycle_check",
+                                                latency=time.perf_counter() - started, error=repr(e)))
+                else:
+                    logger.exception("Model lifecycle check failed")
+
+    def stop(self):
+        """Stops the background check thread."""
+        self.stopEvent.set()
+        if self.checkThread is not None:
+            self.checkThread.join()
+            self.checkThread = None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "inventory": {url: len(models) for url, models in self._inventory.items()},
+                "keep_alive": dict(self.keepAlive),
+                "pinned": sorted(self.pinned),
+                "tracked": len(self.lastUsed),
+            }
+
+
+_lifecycles = {}
+_lifecyclesLock = threading.Lock()
+
+
+def modelLifecycle(host: str = None) -> ModelLifecycle:
+    """The shared ModelLifecycle of host, so presence checks reuse one cached inventory."""
+    with _lifecyclesLock:
+        lifecycle = _lifecycles.get(host)
+        if lifecycle is None:
+            lifecycle = _lifecycles[host] = ModelLifecycle(host)
+        return lifecycle
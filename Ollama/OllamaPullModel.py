@@ -1,34 +1,25 @@
-from ollama import pull, list
+from Ollama.OllamaModelLifecycle import modelLifecycle
 
-def checkModelExists(model_name):
+def checkModelExists(model_name, host=None):
     """
     Check if the model exists in the local system.
+    The list of local models is cached by the host's ModelLifecycle.
     """
-    try:
-        #Check if model is already downloaded
-        modelsDownloaded = list()
-        for modelL in modelsDownloaded:
-            for model in modelL[1]:
-                if model_name in model.model:
-                    return True
-    except:
-        pass
-    return False
+    return modelLifecycle(host).exists(model_name)
 
-def downloadModel(model_name):
+def downloadModel(model_name, host=None):
     """
-    Download the model if it doesn't exist.
+    Download the model, printing the pull progress. Errors are raised.
     """
-    try:
-        #Pull model
-        print(f"Downloading model {model_name}")
-        pull(model_name)
-    except:
-        pass
+    print(f"Downloading model {model_name}")
+    def progress(model, status, completed, total):
+        print(f"\r{model}: {status} {completed * 100 // total if total else ''}{'%' if total else ''}".ljust(60), end="")
+    modelLifecycle(host).pull(model_name, onProgress=progress)
+    print()
 
-def pull_model(model_name):
-    modelAlreadyDownloaded = checkModelExists(model_name)
+def pull_model(model_name, host=None):
+    modelAlreadyDownloaded = checkModelExists(model_name, host)
     if not modelAlreadyDownloaded:
-        downloadModel(model_name)
+        downloadModel(model_name, host)
 
-#### pull_model('nomic-embed-text')
\ No newline at end of file
+#### pull_model('nomic-embed-text')
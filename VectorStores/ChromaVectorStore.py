@@ -0,0 +1,65 @@
+import os
+from typing import Dict, List
+import chromadb
+from chromadb.config import DEFAULT_TENANT, Settings
+from chromadb import AdminClient
+from VectorStores.VectorStore import VectorStore
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore backed by a persistent Chroma collection."""
+    def __init__(self, persist_directory: str = "chromadb", database_name: str = "default", collection_name: str = "documents"):
+        """
+        Args:
+            persist_directory (str): Directory where all Chroma data is persisted.
+            database_name (str): Name of the database to use (enables multiple isolated databases).
+            collection_name (str): Name of the collection inside the database.
+        """
+        # Ensure the persist_directory exists.
+        os.makedirs(persist_directory, exist_ok=True)
+
+        # Create a Settings object that uses the given persist_directory.
+        settings = Settings(persist_directory=persist_directory, is_persistent=True)
+
+        # Open the database directly; the AdminClient round trip is only paid when it
+        # doesn't exist yet, not every time an existing store is opened.
+        try:
+            self.client = self._open(persist_directory, settings, database_name)
+        except Exception:
+            admin_client = AdminClient(settings)
+            try:
+                admin_client.get_database(database_name)
+            except Exception:
+                admin_client.create_database(database_name, DEFAULT_TENANT)
+            self.client = self._open(persist_directory, settings, database_name)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+
+    @staticmethod
+    def _open(persist_directory, settings, database_name):
+        return chromadb.PersistentClient(
+            path=persist_directory,
+            settings=settings,
+            tenant=DEFAULT_TENANT,
+            database=database_name,
+        )
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def get(self, ids: List[str] = None, where: Dict = None, limit: int = None, offset: int = None,
+            include: List[str] = ("documents", "metadatas")) -> Dict:
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset, include=list(include))
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Dict = None) -> Dict:
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+
+    def count(self) -> int:
+        return self.collection.count()
@@ -0,0 +1,369 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+import numpy as np
+from VectorStores.VectorStore import VectorStore, matches_where
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Lightweight local VectorStore for short-lived workers.
+
+    Layout of the store directory:
+        vectors.f32      float32 rows, appended on every write and memory-mapped read-only
+        norms.f32        squared L2 norm of every row, used for vectorized distance math
+        records.sqlite3  id, document and JSON metadata of every live row
+        ivf_*.npy        optional IVF (inverted file) index: k-means centroids plus the rows
+                         of each centroid's list, loaded with mmap as well
+
+    Opening a store only maps these files, so it takes milliseconds whatever the size.
+    Updates append a new row and drop the old one from records.sqlite3; compact() reclaims
+    the dead rows. Queries below exact_threshold live rows, or with a where filter, are
+    answered by exact brute force; larger stores probe the n_probe nearest IVF lists plus
+    the rows written since the index was built.
+    """
+    BLOCK_ROWS = 65536
+
+    def __init__(self, path: str, exact_threshold: int = 20_000, n_probe: int = 8, auto_index: bool = True):
+        """
+        Args:
+            path (str): Directory holding the store files (created if needed).
+            exact_threshold (int): Live row count below which queries are always exact.
+            n_probe (int): IVF lists scanned per query; higher means better recall, slower queries.
+            auto_index (bool): Build the IVF index on the first query above exact_threshold, and
+                rebuild it once a quarter of the rows were written after the last build.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.exact_threshold = exact_threshold
+        self.n_probe = n_probe
+        self.auto_index = auto_index
+        self.lock = threading.RLock()
+
+        self.db = sqlite3.connect(os.path.join(path, "records.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+        dim = self._get_meta("dim")
+        self.dim = int(dim) if dim is not None else None
+        self._open_arrays()
+        self._load_index()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _open_arrays(self):
+        rows = 0
+        if self.dim:
+            row_bytes = 4 * self.dim
+            vectors_file = self._file("vectors.f32")
+            if os.path.exists(vectors_file):
+                rows = os.path.getsize(vectors_file) // row_bytes
+                # Drop a partially written trailing row left by an interrupted write.
+                if os.path.getsize(vectors_file) != rows * row_bytes:
+                    with open(vectors_file, "r+b") as f:
+                        f.truncate(rows * row_bytes)
+            norms_file = self._file("norms.f32")
+            if os.path.exists(norms_file) and os.path.getsize(norms_file) != rows * 4:
+                with open(norms_file, "r+b") as f:
+                    f.truncate(rows * 4)
+        self.rows = rows
+        self._map_arrays()
+        self.alive = np.zeros(rows, dtype=bool)
+        live_rows = np.array([row for (row,) in self.db.execute("SELECT row FROM records")], dtype=np.int64)
+        self.alive[live_rows[live_rows < rows]] = True
+
+    def _map_arrays(self):
+        if self.rows:
+            self.vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+            self.norms = np.memmap(self._file("norms.f32"), dtype=np.float32, mode="r", shape=(self.rows,))
+        else:
+            self.vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+            self.norms = np.empty(0, dtype=np.float32)
+
+    def _load_index(self):
+        self.centroids = None
+        index_rows = self._get_meta("index_rows")
+        if index_rows is None or not os.path.exists(self._file("ivf_centroids.npy")):
+            return
+        self.index_rows = int(index_rows)
+        self.centroids = np.load(self._file("ivf_centroids.npy"), mmap_mode="r")
+        self.list_rows = np.load(self._file("ivf_rows.npy"), mmap_mode="r")
+        self.list_offsets = np.load(self._file("ivf_offsets.npy"))
+        self.centroid_norms = (np.asarray(self.centroids) ** 2).sum(axis=1)
+
+    def _drop_index(self):
+        self.centroids = None
+        self.db.execute("DELETE FROM meta WHERE key = 'index_rows'")
+        for name in ("ivf_centroids.npy", "ivf_rows.npy", "ivf_offsets.npy"):
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+
+    def _rows_for_ids(self, ids):
+        rows = []
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            rows.extend(row for (row,) in self.db.execute(
+                f"SELECT row FROM records WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return rows
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        if not ids:
+            return
+        vectors = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_meta("dim", self.dim)
+            if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected embeddings of dimension {self.dim}, got shape {vectors.shape}")
+
+            old_rows = self._rows_for_ids(list(ids))
+            start = self.rows
+            with open(self._file("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._file("norms.f32"), "ab") as f:
+                f.write((vectors * vectors).sum(axis=1).astype(np.float32).tobytes())
+
+            for chunk_start in range(0, len(ids), 900):
+                chunk = list(ids[chunk_start:chunk_start + 900])
+                self.db.execute(f"DELETE FROM records WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            self.db.executemany(
+                "INSERT INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(start + i, doc_id, documents[i] if documents else None,
+                  json.dumps(metadatas[i]) if metadatas and metadatas[i] is not None else None)
+                 for i, doc_id in enumerate(ids)]
+            )
+            self.db.commit()
+
+            self.rows = start + len(ids)
+            self._map_arrays()
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            self.alive[old_rows] = False
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        with self.lock:
+            rows = self._rows_for_ids(list(ids))
+            for start in range(0, len(ids), 900):
+                chunk = list(ids[start:start + 900])
+                self.db.execute(f"DELETE FROM records WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            self.db.commit()
+            self.alive[rows] = False
+
+    def _iter_records(self, ids=None, where=None):
+        if ids is None:
+            cursor = self.db.execute("SELECT row, id, document, metadata FROM records ORDER BY row")
+        else:
+            rows = []
+            for start in range(0, len(ids), 900):
+                chunk = list(ids[start:start + 900])
+                rows.extend(self.db.execute(
+                    f"SELECT row, id, document, metadata FROM records WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+            cursor = sorted(rows)
+        for row, doc_id, document, metadata in cursor:
+            metadata = json.loads(metadata) if metadata else None
+            if where is None or matches_where(metadata, where):
+                yield row, doc_id, document, metadata
+
+    def get(self, ids: List[str] = None, where: Dict = None, limit: int = None, offset: int = None,
+            include: List[str] = ("documents", "metadatas")) -> Dict:
+        result = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        rows = []
+        offset = offset or 0
+        with self.lock:
+            for position, (row, doc_id, document, metadata) in enumerate(self._iter_records(ids, where)):
+                if position < offset:
+                    continue
+                if limit is not None and len(rows) >= limit:
+                    break
+                rows.append(row)
+                result["ids"].append(doc_id)
+                result["documents"].append(document)
+                result["metadatas"].append(metadata)
+            if "embeddings" in include:
+                result["embeddings"] = np.array(self.vectors[rows]) if rows else np.empty((0, self.dim or 0), np.float32)
+        for field in ("documents", "metadatas", "embeddings"):
+            if field not in include:
+                result[field] = None
+        return result
+
+    def count(self) -> int:
+        with self.lock:
+            return int(self.alive.sum())
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Dict = None) -> Dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        with self.lock:
+            if self.dim is None or self.rows == 0:
+                empty = [[] for _ in range(len(queries))]
+                return {"ids": empty, "documents": empty, "metadatas": empty, "distances": empty}
+            if self.auto_index and where is None and self._needs_index():
+                self.build_index()
+            vectors, norms, alive = self.vectors, self.norms, self.alive.copy()
+            use_index = self.centroids is not None and where is None and alive.sum() >= self.exact_threshold
+            if use_index:
+                index = (self.centroids, self.centroid_norms, self.list_rows, self.list_offsets, self.index_rows)
+            if where is not None:
+                mask = np.zeros_like(alive)
+                mask[[row for row, _, _, _ in self._iter_records(where=where)]] = True
+                alive &= mask
+
+        if use_index:
+            distances, rows = self._ivf_search(queries, n_results, vectors, norms, alive, *index)
+        else:
+            distances, rows = self._exact_search(queries, n_results, vectors, norms, np.flatnonzero(alive))
+        return self._query_result(distances, rows)
+
+    def _needs_index(self):
+        live = int(self.alive.sum())
+        if live < self.exact_threshold:
+            return False
+        if self.centroids is None:
+            return True
+        return self.rows - self.index_rows > 0.25 * self.index_rows
+
+    @staticmethod
+    def _top_k(distances, rows, k):
+        # distances: (queries, candidates), rows: (queries, candidates) row numbers.
+        if distances.shape[1] > k:
+            keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            distances = np.take_along_axis(distances, keep, axis=1)
+            rows = np.take_along_axis(rows, keep, axis=1)
+        order = np.argsort(distances, axis=1, kind="stable")
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def _exact_search(self, queries, k, vectors, norms, candidates):
+        query_norms = (queries * queries).sum(axis=1)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(candidates), self.BLOCK_ROWS):
+            block = candidates[start:start + self.BLOCK_ROWS]
+            # ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2, one matrix product per block.
+            distances = query_norms[:, None] - 2.0 * (queries @ vectors[block].T) + norms[block][None, :]
+            block_rows = np.broadcast_to(block, distances.shape)
+            best_distances, best_rows = self._top_k(
+                np.concatenate([best_distances, distances], axis=1),
+                np.concatenate([best_rows, block_rows], axis=1), k)
+        return best_distances, best_rows
+
+    def _ivf_search(self, queries, k, vectors, norms, alive, centroids, centroid_norms, list_rows, list_offsets, index_rows):
+        query_norms = (queries * queries).sum(axis=1)
+        centroid_distances = query_norms[:, None] - 2.0 * (queries @ np.asarray(centroids).T) + centroid_norms[None, :]
+        n_probe = min(self.n_probe, len(centroid_distances[0]))
+        probes = np.argpartition(centroid_distances, n_probe - 1, axis=1)[:, :n_probe]
+        # Rows written after the index was built are not in any list and are always scanned.
+        tail = np.arange(index_rows, len(alive), dtype=np.int64)
+
+        all_distances, all_rows = [], []
+        for i, query in enumerate(queries):
+            candidates = np.concatenate(
+                [np.asarray(list_rows[list_offsets[p]:list_offsets[p + 1]]) for p in probes[i]] + [tail])
+            candidates = np.sort(candidates[alive[candidates]])
+            distances, rows = self._exact_search(query[None, :], k, vectors, norms, candidates)
+            all_distances.append(distances[0])
+            all_rows.append(rows[0])
+        return all_distances, all_rows
+
+    def _query_result(self, distances, rows):
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self.lock:
+            for query_distances, query_rows in zip(distances, rows):
+                records = {}
+                query_rows = [int(row) for row in query_rows]
+                for start in range(0, len(query_rows), 900):
+                    chunk = query_rows[start:start + 900]
+                    for row, doc_id, document, metadata in self.db.execute(
+                            f"SELECT row, id, document, metadata FROM records WHERE row IN ({','.join('?' * len(chunk))})", chunk):
+                        records[row] = (doc_id, document, json.loads(metadata) if metadata else None)
+                kept = [(row, float(distance)) for row, distance in zip(query_rows, query_distances) if row in records]
+                result["ids"].append([records[row][0] for row, _ in kept])
+                result["documents"].append([records[row][1] for row, _ in kept])
+                result["metadatas"].append([records[row][2] for row, _ in kept])
+                result["distances"].append([distance for _, distance in kept])
+        return result
+
+    def build_index(self, n_lists: int = None, iterations: int = 10, sample_size: int = 100_000, seed: int = 0):
+        """
+        Builds the IVF index with k-means over a sample of the live rows and stores it next
+        to the vectors.
+
+        Args:
+            n_lists (int): Number of inverted lists (defaults to 4 * sqrt(live rows)).
+            iterations (int): k-means iterations.
+            sample_size (int): Rows used to train the centroids.
+            seed (int): Random seed, for reproducible indexes.
+        """
+        with self.lock:
+            live = np.flatnonzero(self.alive)
+            if len(live) == 0:
+                return
+            rng = np.random.default_rng(seed)
+            n_lists = min(n_lists or max(1, int(4 * np.sqrt(len(live)))), len(live))
+            sample = np.sort(rng.choice(live, min(sample_size, len(live)), replace=False))
+            training = np.array(self.vectors[sample])
+            centroids = training[rng.choice(len(training), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = self._nearest_centroid(training, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, training)
+                counts = np.bincount(assignment, minlength=n_lists)
+                # Empty lists keep their previous centroid.
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+
+            assignment = np.concatenate([
+                self._nearest_centroid(np.asarray(self.vectors[live[start:start + self.BLOCK_ROWS]]), centroids)
+                for start in range(0, len(live), self.BLOCK_ROWS)])
+            order = np.argsort(assignment, kind="stable")
+            list_rows = live[order]
+            list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+
+            for name, array in (("ivf_centroids.npy", centroids), ("ivf_rows.npy", list_rows), ("ivf_offsets.npy", list_offsets)):
+                tmp = self._file(name + ".tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp, self._file(name))
+            self._set_meta("index_rows", self.rows)
+            self.db.commit()
+            self._load_index()
+
+    def _nearest_centroid(self, vectors, centroids):
+        distances = -2.0 * (vectors @ centroids.T) + (centroids * centroids).sum(axis=1)[None, :]
+        return np.argmin(distances, axis=1)
+
+    def compact(self):
+        """Rewrites the vector files without deleted or replaced rows and drops the IVF index."""
+        with self.lock:
+            live = np.flatnonzero(self.alive)
+            if len(live) == self.rows:
+                return
+            for name, source in (("vectors.f32", self.vectors), ("norms.f32", self.norms)):
+                tmp = self._file(name + ".tmp")
+                with open(tmp, "wb") as f:
+                    for start in range(0, len(live), self.BLOCK_ROWS):
+                        f.write(np.ascontiguousarray(source[live[start:start + self.BLOCK_ROWS]]).tobytes())
+                os.replace(tmp, self._file(name))
+            # Renumber in ascending order so new numbers never collide with pending old ones.
+            self.db.executemany("UPDATE records SET row = ? WHERE row = ?",
+                                [(new_row, int(old_row)) for new_row, old_row in enumerate(live)])
+            self._drop_index()
+            self.db.commit()
+            self._open_arrays()
@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+
+class VectorStore(ABC):
+    """
+    Storage interface used by OllamaEmbeddingModel.
+
+    Results follow Chroma's shapes so every backend is interchangeable:
+    get() returns {"ids": [...], "documents": [...], "metadatas": [...], "embeddings": [...]}
+    with only the requested fields filled, and query() returns the same keys plus
+    "distances", each holding one list per query embedding. Distances are squared L2.
+    A backend missing one of the methods can't be instantiated.
+    """
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        """Inserts new entries and replaces entries whose id already exists."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, ids: List[str] = None, where: Dict = None, limit: int = None, offset: int = None,
+            include: List[str] = ("documents", "metadatas")) -> Dict:
+        """Fetches entries by ids and/or a metadata where clause, in insertion order."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Removes the given ids, ignoring ids that don't exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Dict = None) -> Dict:
+        """Returns the n_results nearest entries to each query embedding."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+def matches_where(metadata: Dict, where: Dict) -> bool:
+    """
+    Evaluates a Chroma-style metadata filter ($eq, $ne, $gt, $gte, $lt, $lte, $in, $nin,
+    $and, $or) against one metadata dict, for backends without a native filter engine.
+    """
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand, key in metadata):
+                    return False
+        elif metadata.get(key) != condition or key not in metadata:
+            return False
+    return True
+
+
+def _compare(value, operator, operand, present):
+    if operator == "$eq":
+        return present and value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return present and value in operand
+    if operator == "$nin":
+        return value not in operand
+    if not present or value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported where operator: {operator}")
@@ -0,0 +1,40 @@
+import time
+import unittest
+from Auxiliars.BatchRunner import BatchItemError, runBatch
+
+
+def slowSquare(n):
+    # Later items finish first, so completion order is the reverse of input order.
+    time.sleep(0.01 * (5 - n))
+    return n * n
+
+
+def failOnThree(n):
+    if n == 3:
+        raise ValueError("three")
+    return n
+
+
+class RunBatchTest(unittest.TestCase):
+    def test_results_keep_input_order(self):
+        self.assertEqual(runBatch(slowSquare, range(5), maxConcurrency=5), [0, 1, 4, 9, 16])
+
+    def test_sequential_and_concurrent_runs_agree(self):
+        self.assertEqual(runBatch(slowSquare, range(5)), runBatch(slowSquare, range(5), maxConcurrency=3))
+
+    def test_failed_item_holds_a_batch_item_error(self):
+        results = runBatch(failOnThree, range(5), maxConcurrency=2)
+        self.assertEqual(results[:3] + results[4:], [0, 1, 2, 4])
+        error = results[3]
+        self.assertIsInstance(error, BatchItemError)
+        self.assertEqual((error.index, error.item), (3, 3))
+        self.assertIsInstance(error.error, ValueError)
+
+    def test_progress_reaches_the_total(self):
+        progress = []
+        runBatch(slowSquare, range(5), maxConcurrency=3, onProgress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(i, 5) for i in range(1, 6)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import copy
+import unittest
+from types import SimpleNamespace
+from Auxiliars.CallPlan import compileCallPlan
+from ChatGPT.ChatGPTModel import ChatGPTModel
+
+
+def add(a: int, b: int) -> int:
+    """Adds two numbers."""
+    return a + b
+
+
+def reply(content=None, toolCalls=None):
+    message = SimpleNamespace(content=content, tool_calls=toolCalls)
+    choice = SimpleNamespace(message=message, finish_reason="tool_calls" if toolCalls else "stop")
+    return SimpleNamespace(choices=[choice], usage=None)
+
+
+def toolCall(id, name, arguments):
+    return SimpleNamespace(id=id, type="function", function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class FakeCompletions:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    def create(self, **params):
+        self.requests.append(copy.deepcopy(params))
+        return self.replies.pop(0)
+
+
+class ToolBudgetTest(unittest.TestCase):
+    def setUp(self):
+        # The OpenAI tool schemas need function_schema; the loop only passes them through.
+        compileCallPlan(tools=[add]).__dict__["openaiToolSchemas"] = [{"type": "function", "function": {"name": "add"}}]
+        self.completions = FakeCompletions([
+            reply(toolCalls=[toolCall("call_1", "add", '{"a": 1, "b": 2}'), toolCall("call_2", "add", '{"a": 3, "b": 4}')]),
+            reply(content="done"),
+        ])
+        self.model = ChatGPTModel(modelName="gpt", apiKey="k", maxToolSteps=0)
+        self.model.client = SimpleNamespace(chat=SimpleNamespace(completions=self.completions))
+
+    def test_pending_tool_calls_are_answered_when_the_budget_is_exhausted(self):
+        self.assertEqual(self.model.sendMessage("sum", tools=[add]), "done")
+        final = self.completions.requests[-1]
+        self.assertEqual(final["tool_choice"], "none")
+        answered = [m["tool_call_id"] for m in final["messages"] if m["role"] == "tool"]
+        self.assertEqual(answered, ["call_1", "call_2"])
+
+    def test_caller_messages_are_not_modified(self):
+        messages = [{"role": "user", "content": "sum"}]
+        self.model.maxToolSteps = 1
+        self.model.sendMessage("sum", tools=[add], FunctionCallMessages=messages)
+        self.assertEqual(messages, [{"role": "user", "content": "sum"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
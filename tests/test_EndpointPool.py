@@ -0,0 +1,84 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from Auxiliars.ClientPool import clientPool
+from Auxiliars.EndpointPool import EndpointPool
+
+
+class FakeServer:
+    def __init__(self, url, down=False):
+        self.url = url
+        self.down = down
+        self.calls = 0
+
+    def chat(self, model=None, messages=None):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError(f"{self.url} is down")
+        return self.url
+
+    def ps(self):
+        if self.down:
+            raise ConnectionError(f"{self.url} is down")
+        return SimpleNamespace(models=[SimpleNamespace(model="m:latest")])
+
+
+class EndpointPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.servers = {url: FakeServer(url) for url in ("http://a", "http://b")}
+        patcher = mock.patch.object(clientPool, "ollamaClient", side_effect=lambda url: self.servers[url])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def makePool(self, **options):
+        return EndpointPool(list(self.servers), healthCheckInterval=None, **options)
+
+    def test_least_outstanding_endpoint_is_picked(self):
+        pool = self.makePool()
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertNotEqual(first, second)
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+
+    def test_weight_scales_the_share_of_requests(self):
+        pool = EndpointPool([("http://a", 2.0), "http://b"], healthCheckInterval=None)
+        picked = [pool.acquire().url for _ in range(3)]
+        self.assertEqual(sorted(picked), ["http://a", "http://a", "http://b"])
+
+    def test_failing_node_is_retried_elsewhere_and_ejected(self):
+        self.servers["http://a"].down = True
+        pool = self.makePool(failureThreshold=2, ejectSeconds=60)
+        for _ in range(4):
+            self.assertEqual(pool.client.chat(messages=[]), "http://b")
+        self.assertEqual(self.servers["http://a"].calls, 2)
+        self.assertFalse(pool.endpoints[0].healthy)
+
+    def test_endpoint_holding_the_model_is_preferred(self):
+        pool = self.makePool()
+        pool.endpoints[1].loadedModels.add("m:latest")
+        self.assertEqual(pool.client.chat(model="m", messages=[]), "http://b")
+
+    def test_ejected_node_comes_back(self):
+        self.servers["http://a"].down = True
+        pool = self.makePool(failureThreshold=1, ejectSeconds=0.05)
+        pool.client.chat(model="m", messages=[])
+        self.assertFalse(pool.endpoints[0].healthy)
+        self.servers["http://a"].down = False
+        time.sleep(0.1)
+        self.assertTrue(pool.endpoints[0].healthy)
+
+    def test_health_check_revives_a_node_and_records_its_models(self):
+        self.servers["http://a"].down = True
+        pool = self.makePool(failureThreshold=1, ejectSeconds=60)
+        pool.checkHealth()
+        self.assertFalse(pool.endpoints[0].healthy)
+        self.servers["http://a"].down = False
+        pool.checkHealth()
+        self.assertTrue(pool.endpoints[0].healthy)
+        self.assertTrue(pool.endpoints[0].hasModel("m"))
+
+
+if __name__ == "__main__":
+    unittest.main()
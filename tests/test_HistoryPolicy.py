@@ -0,0 +1,40 @@
+import unittest
+from Auxiliars.HistoryPolicy import SummarizingPolicy
+
+
+def failingSummary(messages):
+    raise ConnectionError("server down")
+
+
+def conversation(turns):
+    history = [{'role': 'system', 'content': "Be brief."}]
+    for i in range(turns):
+        history.append({'role': 'user', 'content': f"question {i} " * 10})
+        history.append({'role': 'assistant', 'content': f"answer {i} " * 10})
+    return history
+
+
+class SummarizingPolicyTest(unittest.TestCase):
+    def collect(self, policy, history):
+        # The first apply starts the summary, the second collects it.
+        history = policy.apply(history)
+        policy.pending[1].exception()
+        return policy.apply(history)
+
+    def test_failed_summary_is_raised(self):
+        policy = SummarizingPolicy(failingSummary, maxTokens=50)
+        with self.assertRaises(ConnectionError):
+            self.collect(policy, conversation(4))
+        policy.close()
+
+    def test_failed_summary_goes_to_on_error(self):
+        errors = []
+        policy = SummarizingPolicy(failingSummary, maxTokens=50, onError=errors.append)
+        history = conversation(4)
+        self.assertEqual(self.collect(policy, history), history)
+        self.assertIsInstance(errors[0], ConnectionError)
+        policy.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
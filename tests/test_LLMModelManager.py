@@ -0,0 +1,176 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from Auxiliars.CallPlan import CallPlan
+from Auxiliars.Streaming import StreamChunk
+from LLMModelManager import LLMModelManager
+
+
+class SlowModel:
+    modelName = "fake"
+
+    def sendMessage(self, message, **kwargs):
+        time.sleep(0.05)
+        return f"reply to {message}"
+
+
+class WaitResponseTest(unittest.TestCase):
+    def test_wait_response_before_finish_job_stores_result(self):
+        manager = LLMModelManager(modelName="fake", warmUp=False)
+        manager.model = SlowModel()
+        finishJob = manager._finishJob
+
+        def delayedFinishJob(future, callback):
+            # Done callbacks run after the waiters of the future woke up.
+            time.sleep(0.1)
+            finishJob(future, callback)
+
+        manager._finishJob = delayedFinishJob
+        try:
+            jobId = manager.sendMessageAsync("hi", assistantFormat=False)
+            self.assertEqual(manager.waitResponse(jobId), "reply to hi")
+            time.sleep(0.2)
+            self.assertIsNone(manager.jobStatus(jobId))
+            self.assertEqual(len(manager.results), 0)
+        finally:
+            manager.shutdown()
+
+
+class OverlapModel:
+    """Records the most turns it ever served at the same time."""
+    modelName = "fake"
+
+    def __init__(self):
+        self.active = 0
+        self.maxActive = 0
+        self.lock = threading.Lock()
+
+    def sendMessage(self, message, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.maxActive = max(self.maxActive, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return "ok"
+
+
+class ConversationTurnTest(unittest.TestCase):
+    def test_conversation_turns_do_not_overlap(self):
+        manager = LLMModelManager(modelName="fake", conversation_mode=True, warmUp=False)
+        manager.model = OverlapModel()
+        threads = [threading.Thread(target=manager.sendMessage, args=("hi",)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(manager.model.maxActive, 1)
+
+
+class PlanRecordingModel:
+    modelName = "fake"
+
+    def __init__(self):
+        self.plans = []
+
+    def sendMessage(self, message, **kwargs):
+        self.plans.append(kwargs.get("callPlan"))
+        return "ok"
+
+
+class CallPlanTest(unittest.TestCase):
+    def test_call_plan_reaches_the_backend(self):
+        manager = LLMModelManager(modelName="fake", assistantFormat=False, warmUp=False)
+        manager.model = PlanRecordingModel()
+        plan = CallPlan(outputDefinition={"name": (str, "")})
+        try:
+            manager.sendMessage("hi", callPlan=plan)
+            manager.submit("hi", callPlan=plan).result()
+        finally:
+            manager.shutdown()
+        self.assertEqual(manager.model.plans, [plan, plan])
+
+
+class TruncatedStreamModel:
+    """Streams a reply that ends without its done chunk."""
+    modelName = "fake"
+
+    def __init__(self):
+        self.sent = 0
+
+    def sendMessageStream(self, message, **kwargs):
+        yield StreamChunk("partial")
+
+    def sendMessage(self, message, **kwargs):
+        self.sent += 1
+        return "ok"
+
+
+class OnTokenTest(unittest.TestCase):
+    def test_truncated_stream_raises_instead_of_resending(self):
+        manager = LLMModelManager(modelName="fake", warmUp=False)
+        manager.model = TruncatedStreamModel()
+        tokens = []
+        with self.assertRaises(RuntimeError):
+            manager.sendMessage("hi", onToken=tokens.append)
+        self.assertEqual(tokens, ["partial"])
+        self.assertEqual(manager.model.sent, 0)
+
+
+class RecordingModel:
+    """Records whether the warm-up had finished when each request arrived."""
+    modelName = "fake"
+
+    def __init__(self, warmUp):
+        self.warmUp = warmUp
+        self.warmedAtCall = []
+
+    def sendMessage(self, message, **kwargs):
+        self.warmedAtCall.append(self.warmUp.done())
+        return "ok"
+
+    async def asendMessage(self, message, **kwargs):
+        self.warmedAtCall.append(self.warmUp.done())
+        return "ok"
+
+    def sendMessageStream(self, message, **kwargs):
+        self.warmedAtCall.append(self.warmUp.done())
+        return iter(())
+
+    async def asendMessageStream(self, message, **kwargs):
+        self.warmedAtCall.append(self.warmUp.done())
+        if False:
+            yield None
+
+
+class WarmUpTest(unittest.TestCase):
+    def makeManager(self):
+        manager = LLMModelManager(modelName="fake", assistantFormat=False, warmUp=False)
+        warmUp = Future()
+        manager.warmUpFuture = warmUp
+        manager.model = RecordingModel(warmUp)
+        threading.Timer(0.05, warmUp.set_result, (0.05,)).start()
+        return manager
+
+    def test_sync_requests_wait_for_warm_up(self):
+        manager = self.makeManager()
+        manager.sendMessage("hi")
+        manager.sendMessageStream("hi")
+        self.assertEqual(manager.model.warmedAtCall, [True, True])
+
+    def test_async_requests_wait_for_warm_up(self):
+        manager = self.makeManager()
+
+        async def run():
+            await manager.asendMessage("hi")
+            async for _ in manager.asendMessageStream("hi"):
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(manager.model.warmedAtCall, [True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+from Auxiliars.BatchRunner import runBatch
+from Auxiliars.Metrics import CallEvent, MetricsHub, callContext
+
+
+def brokenSink(event):
+    raise ValueError("disk full")
+
+
+class MetricsTest(unittest.TestCase):
+    def test_call_context_reaches_batch_threads(self):
+        with callContext(queueWait=1.5):
+            events = runBatch(lambda i: CallEvent("ollama", "m", "chat", latency=0.1), range(4), maxConcurrency=4)
+        self.assertEqual([event.queueWait for event in events], [1.5] * 4)
+
+    def test_failing_sink_is_logged_and_others_still_run(self):
+        received = []
+        hub = MetricsHub([brokenSink, received.append])
+        event = CallEvent("ollama", "m", "chat", latency=0.1)
+        with self.assertLogs("Auxiliars.Metrics", level="ERROR") as logs:
+            hub.emit(event)
+        self.assertIn("brokenSink", logs.output[0])
+        self.assertEqual(received, [event])
+
+
+if __name__ == "__main__":
+    unittest.main()
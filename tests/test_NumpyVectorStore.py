@@ -0,0 +1,80 @@
+import importlib.util
+import tempfile
+import unittest
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+if HAS_NUMPY:
+    import numpy as np
+    from VectorStores.NumpyVectorStore import NumpyVectorStore
+
+
+@unittest.skipUnless(HAS_NUMPY, "needs numpy")
+class NumpyVectorStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = NumpyVectorStore(self.directory.name)
+        self.store.upsert(["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], ["A", "B", "C"],
+                          [{"n": 1}, {"n": 2}, {"n": 3}])
+
+    def nearest(self, store, vector, n_results=1):
+        return store.query([vector], n_results=n_results)["ids"][0]
+
+    def test_upsert_replaces_an_existing_id(self):
+        self.store.upsert(["a"], [[5, 5]], ["A2"], [{"n": 10}])
+        self.assertEqual(self.store.count(), 3)
+        self.assertEqual(self.store.get(ids=["a"])["documents"], ["A2"])
+        self.assertEqual(self.nearest(self.store, [5, 5]), ["a"])
+        self.assertEqual(self.nearest(self.store, [1, 0]), ["c"])
+
+    def test_delete_removes_from_get_and_query(self):
+        self.store.delete(["b"])
+        self.assertEqual(self.store.count(), 2)
+        self.assertEqual(self.store.get(ids=["b"])["ids"], [])
+        self.assertNotIn("b", self.nearest(self.store, [0, 1], n_results=3))
+
+    def test_where_filters_the_query(self):
+        result = self.store.query([[1, 0]], n_results=3, where={"n": 2})
+        self.assertEqual(result["ids"], [["b"]])
+
+    def test_compact_drops_dead_rows_and_keeps_results(self):
+        self.store.upsert(["a"], [[5, 5]], ["A2"], [{"n": 10}])
+        self.store.delete(["b"])
+        self.store.compact()
+        self.assertEqual(self.store.rows, 2)
+        self.assertEqual(self.store.get()["ids"], ["c", "a"])
+        np.testing.assert_array_equal(self.store.get(ids=["a"], include=["embeddings"])["embeddings"], [[5, 5]])
+        self.assertEqual(self.nearest(self.store, [5, 5]), ["a"])
+
+    def test_reopened_store_sees_the_same_data(self):
+        self.store.upsert(["a"], [[5, 5]], ["A2"], [{"n": 10}])
+        self.store.delete(["b"])
+        reopened = NumpyVectorStore(self.directory.name)
+        self.assertEqual(reopened.count(), 2)
+        self.assertEqual(reopened.get(ids=["a"])["documents"], ["A2"])
+        self.assertEqual(self.nearest(reopened, [5, 5]), ["a"])
+
+
+@unittest.skipUnless(HAS_NUMPY, "needs numpy")
+class IvfRecallTest(unittest.TestCase):
+    def test_ivf_recall_against_exact_search(self):
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(32, 16)) * 10
+        data = (centers[rng.integers(0, 32, 4000)] + rng.normal(size=(4000, 16))).astype(np.float32)
+        queries = (centers[rng.integers(0, 32, 50)] + rng.normal(size=(50, 16))).astype(np.float32)
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = NumpyVectorStore(directory, exact_threshold=1000, n_probe=8, auto_index=False)
+            store.upsert([str(i) for i in range(len(data))], data, None, None)
+            store.build_index(n_lists=32)
+            self.assertIsNotNone(store.centroids)
+            found = store.query(queries, n_results=10)["ids"]
+
+        distances = ((queries[:, None, :] - data[None, :, :]) ** 2).sum(axis=2)
+        exact = np.argsort(distances, axis=1)[:, :10]
+        recall = np.mean([len(set(map(int, ids)) & set(truth)) / 10 for ids, truth in zip(found, exact)])
+        self.assertGreaterEqual(recall, 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from Auxiliars.CallPlan import compileCallPlan
+from Auxiliars.HistoryPolicy import SummarizingPolicy
+from Ollama.OllamaConversationModel import OllamaConversationLLMModel
+
+
+def lookup(query: str):
+    """Looks something up."""
+    return query
+
+
+class TurnMessagesTest(unittest.TestCase):
+    def setUp(self):
+        self.plan = compileCallPlan(tools=[lookup])
+        self.summary = {'role': 'system', 'content': SummarizingPolicy.SUMMARY_PREFIX + "They met in Lisbon."}
+        self.user = {'role': 'user', 'content': "Where did they meet?"}
+
+    def test_tool_prompt_replaces_the_system_prompt(self):
+        model = OllamaConversationLLMModel(modelName="fake")
+        model.history = [{'role': 'system', 'content': "Be brief."}, self.summary, self.user]
+        messages = model._turnMessages(self.plan)
+        self.assertEqual(messages, [{'role': 'system', 'content': self.plan.agentSystemMessage}, self.summary, self.user])
+        self.assertEqual(model.history[0]['content'], "Be brief.")
+
+    def test_summary_is_kept_without_a_system_prompt(self):
+        model = OllamaConversationLLMModel(modelName="fake")
+        model.history = [self.summary, self.user]
+        messages = model._turnMessages(self.plan)
+        self.assertEqual(messages, [{'role': 'system', 'content': self.plan.agentSystemMessage}, self.summary, self.user])
+
+
+class ClearHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.system = {'role': 'system', 'content': "Be brief."}
+        self.summary = {'role': 'system', 'content': SummarizingPolicy.SUMMARY_PREFIX + "They met in Lisbon."}
+        self.user = {'role': 'user', 'content': "Where did they meet?"}
+
+    def test_system_prompt_is_kept_and_summary_dropped(self):
+        model = OllamaConversationLLMModel(modelName="fake")
+        model.history = [self.system, self.summary, self.user]
+        model.clear_history()
+        self.assertEqual(model.history, [self.system])
+
+    def test_summary_is_not_taken_for_the_system_prompt(self):
+        model = OllamaConversationLLMModel(modelName="fake")
+        model.history = [self.summary, self.user]
+        model.clear_history()
+        self.assertEqual(model.history, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
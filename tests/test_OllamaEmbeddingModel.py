@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from Ollama.OllamaEmbeddingModel import OllamaEmbeddingModel
+from VectorStores.VectorStore import VectorStore, matches_where
+
+
+class MemoryStore(VectorStore):
+    def __init__(self):
+        self.entries = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for entry in zip(ids, embeddings, documents, metadatas):
+            self.entries[entry[0]] = entry[1:]
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        selected = [i for i in (ids if ids is not None else self.entries) if i in self.entries
+                    and (where is None or matches_where(self.entries[i][2], where))]
+        result = {"ids": selected}
+        for index, field in enumerate(("embeddings", "documents", "metadatas")):
+            if field in include:
+                result[field] = [self.entries[i][index] for i in selected]
+        return result
+
+    def delete(self, ids):
+        for i in ids:
+            self.entries.pop(i, None)
+
+    def query(self, query_embeddings, n_results=10, where=None):
+        raise NotImplementedError
+
+    def count(self):
+        return len(self.entries)
+
+
+class SyncTextsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = MemoryStore()
+        self.model = OllamaEmbeddingModel("embed", "answer", persist_directory=self.directory.name,
+                                          use_embedding_cache=False, vector_store=self.store)
+        self.embedded = []
+
+        def createEmbeddings(texts):
+            self.embedded.extend(texts)
+            return [[float(len(text))] for text in texts]
+
+        self.model.createEmbeddings = createEmbeddings
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_metadata_change_is_written_without_embedding(self):
+        texts = ["alpha", "beta"]
+        self.model.sync_texts(texts, source="doc", keys=[0, 1], metadatas=[{"page": 1}, {"page": 2}])
+        self.embedded.clear()
+
+        stats = self.model.sync_texts(texts, source="doc", keys=[0, 1], metadatas=[{"page": 1}, {"page": 3}])
+
+        self.assertEqual(self.embedded, [])
+        self.assertEqual((stats["metadata_updated"], stats["unchanged"], stats["updated"]), (1, 1, 0))
+        pages = sorted(metadata["page"] for metadata in self.store.get(include=["metadatas"])["metadatas"])
+        self.assertEqual(pages, [1, 3])
+
+    def test_unchanged_texts_are_skipped(self):
+        self.model.sync_texts(["alpha"], source="doc", keys=[0], metadatas=[{"page": 1}])
+        self.embedded.clear()
+        stats = self.model.sync_texts(["alpha"], source="doc", keys=[0], metadatas=[{"page": 1}])
+        self.assertEqual(self.embedded, [])
+        self.assertEqual((stats["metadata_updated"], stats["unchanged"]), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
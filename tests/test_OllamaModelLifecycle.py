@@ -0,0 +1,98 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from Auxiliars.ClientPool import clientPool
+from Auxiliars.EndpointPool import EndpointPool
+from Auxiliars.Metrics import MetricsHub
+from LLMModelManager import LLMModelManager
+from Ollama.OllamaModelLifecycle import ModelLifecycle
+
+
+class FakeOllamaClient:
+    """Answers list, pull, generate and ps like one Ollama server."""
+    def __init__(self, models=()):
+        self.models = {name: 100 for name in models}
+        self.pulled = []
+        self.generated = []
+
+    def list(self):
+        return SimpleNamespace(models=[SimpleNamespace(model=name, size=size) for name, size in self.models.items()])
+
+    def pull(self, model, stream=False):
+        self.pulled.append(model)
+        self.models[f"{model}:latest"] = 100
+        yield SimpleNamespace(status="success", completed=100, total=100)
+
+    def generate(self, model, prompt, keep_alive=None):
+        self.generated.append(model)
+
+    def ps(self):
+        raise ConnectionError("server down")
+
+
+class EndpointPoolLifecycleTest(unittest.TestCase):
+    def setUp(self):
+        self.clients = {"http://a": FakeOllamaClient(["m:latest"]), "http://b": FakeOllamaClient()}
+        patcher = mock.patch.object(clientPool, "ollamaClient", side_effect=lambda url: self.clients[url])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lifecycle = ModelLifecycle(endpointPool=EndpointPool(list(self.clients), healthCheckInterval=None))
+
+    def test_missing_model_is_pulled_on_every_endpoint_lacking_it(self):
+        self.assertFalse(self.lifecycle.exists("m"))
+        self.assertEqual(self.lifecycle.ensure(["m"]), ["m"])
+        self.assertEqual([c.pulled for c in self.clients.values()], [[], ["m"]])
+        self.assertTrue(self.lifecycle.exists("m"))
+
+    def test_warm_loads_the_model_on_every_endpoint(self):
+        self.lifecycle.warm("m")
+        self.assertEqual([c.generated for c in self.clients.values()], [["m"], ["m"]])
+
+
+class CheckLoopTest(unittest.TestCase):
+    def test_failed_check_is_reported_to_metrics(self):
+        events = []
+        lifecycle = ModelLifecycle(client=FakeOllamaClient(), idleSeconds=1, checkInterval=0.01,
+                                   metrics=MetricsHub([events.append]))
+        deadline = time.monotonic() + 2
+        while not events and time.monotonic() < deadline:
+            time.sleep(0.01)
+        lifecycle.stop()
+        self.assertEqual(events[0].operation, "lifecycle_check")
+        self.assertIn("server down", events[0].error)
+
+
+class FakeLifecycle:
+    def __init__(self):
+        self.warmed = []
+
+    def ensure(self, models, onProgress=None):
+        return []
+
+    def warm(self, model, keepAlive=None):
+        self.warmed.append(model)
+        return 0.0
+
+    def touch(self, model):
+        pass
+
+    def keepAliveFor(self, model):
+        return None
+
+
+class DefaultWarmUpTest(unittest.TestCase):
+    def test_ollama_manager_warms_up_by_default(self):
+        lifecycle = FakeLifecycle()
+        manager = LLMModelManager(modelName="m", lifecycle=lifecycle)
+        manager.warmUpFuture.result(timeout=2)
+        self.assertEqual(lifecycle.warmed, ["m"])
+
+    def test_warm_up_can_be_disabled(self):
+        lifecycle = FakeLifecycle()
+        manager = LLMModelManager(modelName="m", lifecycle=lifecycle, warmUp=False)
+        self.assertIsNone(manager.warmUpFuture)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import time
+import unittest
+from email.utils import formatdate
+from types import SimpleNamespace
+from Auxiliars.RateLimiter import RateLimitScheduler, TokenBucket, retryAfterSeconds
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_full_bucket_serves_at_once_then_waits_for_the_refill(self):
+        bucket = TokenBucket(perMinute=60)
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(2), 2.0, delta=0.05)
+
+    def test_refund_gives_units_back(self):
+        bucket = TokenBucket(perMinute=60)
+        bucket.reserve(60)
+        bucket.refund(30)
+        self.assertEqual(bucket.reserve(30), 0.0)
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_seconds_and_milliseconds(self):
+        self.assertEqual(retryAfterSeconds(APIError(429, {"retry-after": "3"})), 3.0)
+        self.assertEqual(retryAfterSeconds(APIError(429, {"retry-after-ms": "1500", "retry-after": "3"})), 1.5)
+
+    def test_http_date(self):
+        delay = retryAfterSeconds(APIError(429, {"retry-after": formatdate(time.time() + 30, usegmt=True)}))
+        self.assertAlmostEqual(delay, 30, delta=2)
+
+    def test_missing_header(self):
+        self.assertIsNone(retryAfterSeconds(APIError(429)))
+        self.assertIsNone(retryAfterSeconds(ValueError("no response")))
+
+
+class SchedulerTest(unittest.TestCase):
+    def test_rate_limit_is_retried_after_the_requested_delay(self):
+        scheduler = RateLimitScheduler(baseDelay=0.001)
+        attempts = []
+
+        def send(params):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise APIError(429, {"retry-after-ms": "100"})
+            return "ok"
+
+        self.assertEqual(scheduler.call(send, {"messages": []}), "ok")
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.1)
+        self.assertEqual(scheduler.stats()["rate_limited"], 1)
+
+    def test_fatal_error_is_raised_at_once(self):
+        scheduler = RateLimitScheduler(baseDelay=0.001)
+        attempts = []
+
+        def send(params):
+            attempts.append(params)
+            raise APIError(400)
+
+        with self.assertRaises(APIError):
+            scheduler.call(send, {"messages": []})
+        self.assertEqual(len(attempts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
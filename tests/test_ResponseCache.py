@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+from Auxiliars.ResponseCache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.key = ResponseCache.makeKey({"model": "m", "messages": [{"role": "user", "content": "hi"}]})
+
+    def test_key_ignores_dict_order(self):
+        other = ResponseCache.makeKey({"messages": [{"content": "hi", "role": "user"}], "model": "m"})
+        self.assertEqual(other, self.key)
+        self.assertNotEqual(ResponseCache.makeKey({"model": "m2", "messages": []}), self.key)
+
+    def test_miss_then_hit(self):
+        cache = ResponseCache()
+        self.assertIsNone(cache.get(self.key))
+        cache.put(self.key, "hello")
+        self.assertEqual(cache.get(self.key), "hello")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache(maxMemoryEntries=2)
+        for name in ("a", "b"):
+            cache.put(name, name)
+        cache.get("a")
+        cache.put("c", "c")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a")
+
+    def test_expired_and_cleared_entries_are_misses(self):
+        cache = ResponseCache(ttl=0.05)
+        cache.put(self.key, "hello")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(self.key))
+        cache = ResponseCache()
+        cache.put(self.key, "hello")
+        cache.clear()
+        self.assertIsNone(cache.get(self.key))
+
+    def test_disk_tier_survives_a_new_instance(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "responses.sqlite")
+            first = ResponseCache(path=path)
+            first.put(self.key, {"answer": 42})
+            first.connection.close()
+            cache = ResponseCache(path=path)
+            self.assertEqual(cache.get(self.key), {"answer": 42})
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+            cache.connection.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import importlib.util
+import json
+import unittest
+from Auxiliars.OutputParser import JsonOutputParser
+from Auxiliars.StreamingJsonParser import StreamingJsonListParser
+
+DEFINITION = {"name": (str, ""), "tags": (list, []), "age": (int, 0)}
+
+
+def streamed(reply, size=3, definition=DEFINITION):
+    parser = StreamingJsonListParser(definition)
+    records = []
+    for start in range(0, len(reply), size):
+        records.extend(parser.feed(reply[start:start + size]))
+    return records + parser.close()
+
+
+class StreamingJsonListParserTest(unittest.TestCase):
+    def test_single_object_with_capitalised_list_field(self):
+        reply = '{"Name": "solo", "Tags": ["x"], "age": 3}'
+        expected = JsonOutputParser().parseOutput(reply, DEFINITION)
+        self.assertEqual(expected, {"name": "solo", "tags": ["x"], "age": 3})
+        self.assertEqual(streamed(reply), [expected])
+
+    @unittest.skipUnless(importlib.util.find_spec("Levenshtein"), "needs Levenshtein")
+    def test_single_object_with_misspelled_list_field(self):
+        reply = '{"name": "solo", "tagz": ["x"], "age": 3}'
+        self.assertEqual(streamed(reply), [{"name": "solo", "tags": ["x"], "age": 3}])
+
+    @unittest.skipUnless(importlib.util.find_spec("Levenshtein"), "needs Levenshtein")
+    def test_single_object_with_unknown_list_field(self):
+        reply = '{"name": "solo", "citations": ["a"], "age": 3}'
+        self.assertEqual(streamed(reply), [{"name": "solo", "tags": [], "age": 3}])
+
+    @unittest.skipUnless(importlib.util.find_spec("Levenshtein"), "needs Levenshtein")
+    def test_objects_in_unknown_list_field_are_not_records(self):
+        reply = '{"name": "solo", "citations": [{"a": 1}], "age": 3}'
+        self.assertEqual(streamed(reply), [{"name": "solo", "tags": [], "age": 3}])
+
+    def test_objects_in_list_field_without_definition(self):
+        reply = '{"name": "solo", "citations": [{"a": 1}], "age": 3}'
+        self.assertEqual(streamed(reply, definition=None), [json.loads(reply)])
+
+    def test_wrapped_record_list(self):
+        records = [{"name": "a", "tags": ["x"], "age": 1}, {"name": "b", "tags": [], "age": 2}]
+        self.assertEqual(streamed(json.dumps({"items": records})), records)
+
+    def test_bare_record_list(self):
+        records = [{"name": "a", "tags": ["x"], "age": 1}]
+        self.assertEqual(streamed(json.dumps(records)), records)
+
+
+if __name__ == "__main__":
+    unittest.main()
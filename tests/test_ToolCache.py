@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+import unittest
+from Auxiliars.ToolCache import cacheableTool, toolCacheStats
+
+
+class CacheableToolTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        @cacheableTool
+        def area(width: float, height: float = 1.0) -> float:
+            """Area of a rectangle."""
+            self.calls.append((width, height))
+            return width * height
+
+        self.area = area
+
+    def test_same_arguments_hit_in_any_form(self):
+        self.assertEqual(self.area(2, 3), 6)
+        self.assertEqual(self.area(width=2, height=3), 6)
+        self.assertEqual(self.area(4), 4)
+        self.assertEqual(self.area(4, height=1.0), 4)
+        self.assertEqual(self.calls, [(2, 3), (4, 1.0)])
+        self.assertEqual({k: self.area.cacheStats()[k] for k in ("hits", "misses")}, {"hits": 2, "misses": 2})
+
+    def test_signature_and_docstring_are_kept(self):
+        self.assertEqual(self.area.__name__, "area")
+        self.assertEqual(self.area.__doc__, "Area of a rectangle.")
+        self.assertEqual(list(toolCacheStats([self.area, len])), ["area"])
+
+    def test_clear_cache_invalidates(self):
+        self.area(2, 3)
+        self.area.clearCache()
+        self.area(2, 3)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_entries_expire_after_ttl(self):
+        calls = []
+
+        @cacheableTool(ttl=0.05)
+        def double(x: int) -> int:
+            calls.append(x)
+            return 2 * x
+
+        double(1)
+        time.sleep(0.1)
+        double(1)
+        self.assertEqual(calls, [1, 1])
+
+    def test_errors_are_not_cached(self):
+        calls = []
+
+        @cacheableTool
+        def flaky(x: int) -> int:
+            calls.append(x)
+            if len(calls) == 1:
+                raise ValueError("first call fails")
+            return x
+
+        with self.assertRaises(ValueError):
+            flaky(1)
+        self.assertEqual(flaky(1), 1)
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        calls = []
+
+        @cacheableTool
+        def slow(x: int) -> int:
+            calls.append(x)
+            time.sleep(0.05)
+            return x
+
+        threads = [threading.Thread(target=slow, args=(1,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, [1])
+
+    def test_async_tools_are_cached(self):
+        calls = []
+
+        @cacheableTool
+        async def fetch(x: int) -> int:
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return x
+
+        async def run():
+            return await asyncio.gather(fetch(1), fetch(1), fetch(2))
+
+        self.assertEqual(asyncio.run(run()), [1, 1, 2])
+        self.assertEqual(sorted(calls), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,17 @@
+import unittest
+from VectorStores.VectorStore import VectorStore
+
+
+class IncompleteStore(VectorStore):
+    def upsert(self, ids, embeddings, documents, metadatas):
+        pass
+
+
+class VectorStoreTest(unittest.TestCase):
+    def test_incomplete_backend_fails_on_construction(self):
+        with self.assertRaises(TypeError):
+            IncompleteStore()
+
+
+if __name__ == "__main__":
+    unittest.main()